@@ -0,0 +1,76 @@
+"""
+    benchmark of the excel exports: pandas' default workbook against the write-only
+    workbook of Converter.convert_to_excel(..., write_only=True).
+
+    Run from the root of the repository:
+
+        PYTHONPATH=src python3 benchmarks/bench_excel.py --rows 20000
+"""
+import argparse
+import copy
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from museum_api.utils import Converter, FLATTEN_KEYS, flatten
+
+# object response the benchmark records are copied from.
+OBJECT_PATH = os.path.join(os.path.dirname(__file__), '..', 'tests', 'tmp', 'object_resp.json')
+
+
+def generate_objects(rows):
+    """
+    :param rows: number of objects
+    :return: list of flattened objects, copies of the object response
+    """
+    with open(OBJECT_PATH, encoding='utf-8') as file_ptr:
+        obj = flatten(json.load(file_ptr), FLATTEN_KEYS)
+
+    objects = []
+    for object_id in range(1, rows + 1):
+        new_obj = copy.copy(obj)
+        new_obj['objectID'] = object_id
+        new_obj['title'] = f"{obj['title']} {object_id}"
+        objects.append(new_obj)
+    return objects
+
+
+def measure(function, *args, **kwargs):
+    """
+    calls function twice, the peak memory being traced on the second call only since
+    tracing slows it down.
+
+    :return: (seconds, peak MiB allocated) tuple of the call
+    """
+    start = time.perf_counter()
+    function(*args, **kwargs)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    function(*args, **kwargs)
+    peak = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+    tracemalloc.stop()
+    return seconds, peak
+
+
+def main():
+    """
+    prints the time and peak memory of both exports.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', maxsplit=1)[0])
+    parser.add_argument('--rows', type=int, default=20000, help='number of objects')
+    args = parser.parse_args()
+
+    objects = generate_objects(args.rows)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name, write_only in (('default', False), ('write-only', True)):
+            seconds, peak = measure(Converter.convert_to_excel, objects,
+                                    os.path.join(tmpdir, f'{name}.xlsx'),
+                                    write_only=write_only)
+            print(f'{name:>10}: {args.rows} rows in {seconds:.2f}s, peak {peak:.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,323 @@
+"""
+    benchmark suite of the fetching, flattening and exports, run against a local mock of
+    the museum api serving synthetic objects shaped like tests/correct_data/object_resp.json.
+    The results are saved as json, and compared with the results of a previous run to catch
+    performance regressions between versions.
+
+    Run from the root of the repository:
+
+        PYTHONPATH=src python3 benchmarks/bench_suite.py --output results-0.1.1.json
+        PYTHONPATH=src python3 benchmarks/bench_suite.py --compare results-0.1.1.json
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from importlib import metadata
+
+from museum_api.asyncmuseumapi import AsyncMuseumAPI
+from museum_api.museumapi import MuseumAPI
+from museum_api.ratelimit import RateLimiter, RetryPolicy
+from museum_api.utils import EXPORT_FORMATS, FLATTEN_KEYS, Converter, flatten, flatten_objects
+
+TESTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tests')
+sys.path.insert(0, TESTS_DIR)
+# pylint: disable=wrong-import-position
+from mock_server import MockMuseumServer, synthetic_object  # noqa: E402
+
+# numbers of objects each benchmark is run with.
+DEFAULT_SIZES = (1000, 10000, 100000)
+# the fetch benchmarks are only run up to this number of objects, as the serial client
+# fetches them one at a time.
+DEFAULT_MAX_FETCH = 10000
+# number of requests in flight for the concurrent clients.
+DEFAULT_WORKERS = 8
+# formats exported, pdf needing wkhtmltopdf.
+DEFAULT_FORMATS = ('csv', 'xlsx', 'html', 'xml', 'pdf', 'parquet', 'feather')
+# ratio of the time of a benchmark to its time in the compared run above which it is
+# reported as a regression.
+DEFAULT_THRESHOLD = 1.2
+# slowdowns of less than this many seconds are noise rather than regressions.
+MIN_REGRESSION_SECONDS = 0.01
+
+
+def serve(connection, options):
+    """
+    runs a mock server until anything is received on connection.
+
+    :param connection: end of a Pipe the base url of the server is sent to
+    :param options: keyword arguments of MockMuseumServer
+    """
+    with MockMuseumServer(**options) as server:
+        connection.send(server.base_url)
+        connection.recv()
+
+
+class ServerProcess:
+    """
+    Runs a MockMuseumServer in a process of its own, so that the server doesn't take the
+    GIL from the client being measured::
+
+        with ServerProcess(total=1000, latency=0.002) as base_url:
+            ...
+    """
+    def __init__(self, **options):
+        """
+        :param options: keyword arguments of MockMuseumServer
+        """
+        self.connection, child_connection = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=serve, args=(child_connection, options),
+                                               daemon=True)
+
+    def __enter__(self):
+        self.process.start()
+        return self.connection.recv()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.connection.send(None)
+        self.process.join()
+
+
+def measure(function, repeat):
+    """
+    :param function: function called without arguments
+    :param repeat: number of calls
+    :return: (list of the seconds of each call, result of the last call) tuple
+    """
+    runs = []
+    value = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = function()
+        runs.append(time.perf_counter() - start)
+    return runs, value
+
+
+def result(benchmark, name, size, runs, **details):
+    """
+    :return: result of a benchmark, its time being the fastest of its runs
+    """
+    seconds = min(runs)
+    return dict(benchmark=benchmark, name=name, size=size, seconds=seconds,
+                per_second=size / seconds if seconds else None, runs=runs, **details)
+
+
+def bench_fetch(base_url, size, workers, repeat):
+    """
+    fetches the objects 1 to size serially, with a pool of threads and with asyncio.
+
+    :return: list of results
+    """
+    object_ids = list(range(1, size + 1))
+    retry = RetryPolicy(max_retries=5, backoff_factor=0.01)
+
+    def client(client_class):
+        # the requests are not paced, so that only the client and the server are measured.
+        return client_class(base_url=base_url, rate_limiter=RateLimiter(rate=10 ** 9,
+                                                                        burst=10 ** 9),
+                            retry=retry, pool_maxsize=workers)
+
+    def fetch_sync():
+        with client(MuseumAPI) as museum_api:
+            return [museum_api.get_object_for_id(object_id) for object_id in object_ids]
+
+    def fetch_threads():
+        with client(MuseumAPI) as museum_api:
+            return [data for _, data in museum_api.get_objects_for_ids(object_ids,
+                                                                       max_workers=workers)]
+
+    async def fetch_objects():
+        async with client(AsyncMuseumAPI) as museum_api:
+            return [data async for _, data in museum_api.fetch_objects(object_ids,
+                                                                       concurrency=workers)]
+
+    results = []
+    for name, function in (('sync', fetch_sync), ('threads', fetch_threads),
+                           ('async', lambda: asyncio.run(fetch_objects()))):
+        runs, objects = measure(function, repeat)
+        failed = sum(not isinstance(data, dict) for data in objects)
+        results.append(result('fetch', name, size, runs, failed=failed))
+    return results
+
+
+def bench_flatten(objects, repeat):
+    """
+    flattens the objects one at a time with flatten, and into a DataFrame with
+    flatten_objects.
+
+    :return: list of results
+    """
+    runs = []
+    for _ in range(repeat):
+        # flatten modifies the objects, so each run flattens copies of them.
+        copies = [dict(obj) for obj in objects]
+        runs.extend(measure(lambda: [flatten(obj, FLATTEN_KEYS) for obj in copies], 1)[0])
+
+    return [result('flatten', 'flatten', len(objects), runs),
+            result('flatten', 'flatten_objects', len(objects),
+                   measure(lambda: flatten_objects(objects), repeat)[0])]
+
+
+def bench_exports(objects, formats, repeat):
+    """
+    exports the objects to each format from the same DataFrame, like Converter.export.
+
+    :return: list of results
+    """
+    dataframe = flatten_objects(objects)
+    results = []
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for file_format in formats:
+            path = os.path.join(tmpdir, f'museum_data.{file_format}')
+            convert = getattr(Converter, EXPORT_FORMATS[file_format])
+            try:
+                runs, _ = measure(lambda: convert(dataframe, path), repeat)
+            except (OSError, ImportError) as error:
+                # e.g. wkhtmltopdf or pyarrow is not installed.
+                results.append(dict(benchmark='export', name=file_format, size=len(objects),
+                                    error=str(error).splitlines()[0]))
+                continue
+            results.append(result('export', file_format, len(objects), runs,
+                                  output_bytes=directory_size(path)))
+    return results
+
+
+def directory_size(path):
+    """
+    :return: size in bytes of a file, or of the files of a directory
+    """
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(directory, name))
+               for directory, _, names in os.walk(path) for name in names)
+
+
+def environment():
+    """
+    :return: dictionary describing the version benchmarked and the machine
+    """
+    try:
+        version = metadata.version('museum-api-package')
+    except metadata.PackageNotFoundError:
+        version = None
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        'version': version,
+        'commit': commit,
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(previous, current, threshold):
+    """
+    prints the time of each benchmark against its time in a previous run.
+
+    :param previous: results of the previous run
+    :param current: results of this run
+    :param threshold: ratio of the times above which a benchmark is a regression
+    :return: list of the results which regressed
+    """
+    def key(item):
+        return item['benchmark'], item['name'], item['size']
+
+    times = {key(item): item['seconds'] for item in previous['results'] if 'seconds' in item}
+    regressions = []
+    for item in current['results']:
+        if 'seconds' not in item or key(item) not in times:
+            continue
+        ratio = item['seconds'] / times[key(item)]
+        flag = ''
+        if ratio > threshold and \
+                item['seconds'] - times[key(item)] > MIN_REGRESSION_SECONDS:
+            regressions.append(item)
+            flag = '  REGRESSION'
+        print(f"{'/'.join(map(str, key(item))):<30} {times[key(item)]:9.3f}s -> "
+              f"{item['seconds']:9.3f}s  x{ratio:.2f}{flag}")
+    return regressions
+
+
+def main():
+    """
+    runs the benchmarks, saves their results and compares them with a previous run.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n', maxsplit=1)[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='numbers of objects (default: 1000 10000 100000)')
+    parser.add_argument('--max-fetch', type=int, default=DEFAULT_MAX_FETCH,
+                        help='largest number of objects fetched (default: 10000)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help='requests in flight of the concurrent clients (default: 8)')
+    parser.add_argument('--latency', type=float, default=0.002,
+                        help='seconds each response of the server is delayed by')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='fraction of the requests answered with 503')
+    parser.add_argument('--formats', nargs='+', default=DEFAULT_FORMATS,
+                        choices=list(EXPORT_FORMATS), help='formats exported')
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='runs of each benchmark, the fastest being kept')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the server errors')
+    parser.add_argument('--output', default='benchmarks/results.json',
+                        help='path of the json results')
+    parser.add_argument('--compare', default=None,
+                        help='json results of a previous run, the benchmarks more than '
+                             '--threshold times slower being reported')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+
+    with open(os.path.join(TESTS_DIR, 'correct_data', 'object_resp.json'),
+              encoding='utf-8') as file_ptr:
+        template = json.load(file_ptr)
+
+    results = []
+    fetch_sizes = [size for size in args.sizes if size <= args.max_fetch]
+    if fetch_sizes:
+        with ServerProcess(total=max(fetch_sizes), latency=args.latency,
+                           error_rate=args.error_rate, synthetic=True,
+                           seed=args.seed) as base_url:
+            for size in fetch_sizes:
+                results.extend(bench_fetch(base_url, size, args.workers, args.repeat))
+                print(*(f"fetch/{item['name']}/{size}: {item['seconds']:.3f}s"
+                        for item in results[-3:]), sep='\n')
+
+    for size in args.sizes:
+        objects = [synthetic_object(template, object_id) for object_id in range(1, size + 1)]
+        for item in bench_flatten(objects, args.repeat) + \
+                bench_exports(objects, args.formats, args.repeat):
+            results.append(item)
+            print(f"{item['benchmark']}/{item['name']}/{size}: "
+                  + (f"{item['seconds']:.3f}s" if 'seconds' in item else item['error']))
+
+    report = {
+        'environment': environment(),
+        'parameters': {name: value for name, value in vars(args).items()
+                       if name not in ('output', 'compare', 'threshold')},
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as file_ptr:
+        json.dump(report, file_ptr, indent=2)
+    print(f'results saved to {args.output}')
+
+    if args.compare is not None:
+        with open(args.compare, encoding='utf-8') as file_ptr:
+            previous = json.load(file_ptr)
+        if compare(previous, report, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
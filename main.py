@@ -1,12 +1,23 @@
 """
     main module to get data from museum API and converting the data into various formats.
+
+    Objects are harvested into a local store which is checkpointed while fetching, so
+    running the module again after a failure resumes the harvest where it stopped::
+
+        python main.py --limit 1000 --shard 0/4 --since 2021-12-01
 """
+import argparse
 import logging
 import os
 import sys
+from datetime import datetime
+
 import requests
+from museum_api.cache import ResponseCache
+from museum_api.harvest import Harvester, HarvestStore, parse_shard
+from museum_api.metrics import default_metrics
 from museum_api.museumapi import MuseumAPI
-from museum_api.utils import Converter, flatten, setup_logger
+from museum_api.utils import Converter, flatten_objects, setup_logger
 from dotenv import load_dotenv
 from utils import send_email
 
@@ -16,39 +27,76 @@ load_dotenv()
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 
 # setting up logger for logging errors.
-error_logger = setup_logger('main', 'logs/main_error.log', level=logging.ERROR)
+error_logger = setup_logger('main', 'logs/main_error.log', level=logging.ERROR, queued=True)
+
+
+def parse_date(value):
+    """
+    parses a date given on the command line.
+
+    :param value: date in YYYY-MM-DD format
+    :return: datetime.date
+    """
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+def parse_args():
+    """
+    parses the command line arguments.
+
+    :return: argparse.Namespace
+    """
+    parser = argparse.ArgumentParser(description='Harvest objects from the museum api and '
+                                                 'generate reports from them.')
+    parser.add_argument('--limit', type=int, default=15,
+                        help='only harvest the first LIMIT objects (default: 15)')
+    parser.add_argument('--shard', type=parse_shard, default=None,
+                        help='only harvest the k-th of n shards of the objects, k from 0')
+    parser.add_argument('--since', type=parse_date, default=None,
+                        help='only harvest the objects updated since this YYYY-MM-DD date')
+    parser.add_argument('--store', default=os.path.join(BASE_DIR, 'harvest/harvest.sqlite'),
+                        help='path of the store the harvested objects are checkpointed to, '
+                             'the reports covering only the objects selected by this run')
+    parser.add_argument('--workers', type=int, default=8,
+                        help='number of objects fetched at the same time (default: 8)')
+    parser.add_argument('--metrics', default=None,
+                        help='path of the json summary of the run, written with its '
+                             'Prometheus .prom counterpart')
+    return parser.parse_args()
 
-if __name__ == '__main__':
-    m = MuseumAPI()
 
-    object_list = []
-    for i in range(3):
+if __name__ == '__main__':
+    args = parse_args()
+    # requests, latencies, cache hits, flattening and exports are only measured if asked.
+    default_metrics.enabled = args.metrics is not None
+
+    # responses are kept between runs, so unchanged objects are not downloaded again.
+    # The client, its cache and the store are closed on every path, sys.exit included.
+    with ResponseCache(os.path.join(BASE_DIR, 'cache/responses.sqlite')) as cache, \
+            MuseumAPI(cache=cache) as m, HarvestStore(args.store) as store:
+        harvester = Harvester(m, store, max_workers=args.workers)
         try:
-            # getting all the objects ids from the museum api.
-            object_ids = m.get_all_object_ids()['objectIDs'][0: 15]
-            # object_ids = list(range(1, 16))
-
-            keys = ('constituents', 'measurements', 'tags')
-            # getting list of detail of each object corresponding to their object ids.
-            object_list = list(
-                map(lambda object_id: flatten(m.get_object_for_id(object_id), keys), object_ids)
+            # Every request is retried by MuseumAPI itself, so a failure here means the
+            # retries are exhausted. Objects fetched so far are kept in the store.
+            object_ids = harvester.object_ids(limit=args.limit, shard=args.shard,
+                                              since=args.since)
+            summary = harvester.run(since=args.since, object_ids=object_ids)
+            if summary['failed']:
+                error_logger.error("%i objects could not be fetched, run again to retry "
+                                   "them", summary['failed'])
+
+        except (requests.ConnectionError, requests.ConnectTimeout, requests.Timeout,
+                ConnectionError) as connError:
+            error_logger.error(
+                "Maximum retires reached. Either server is not responding,"
+                " or client is not connected to internet"
             )
-
-            break
-
-        except (requests.ConnectionError, requests.ConnectTimeout, requests.Timeout) as connError:
-            error_logger.error("Connection error, Retrying (%i/3)", (i + 1))
-            if i == 3:
-                error_logger.error(
-                    "Maximum retires reached. Either server is not responding,"
-                    " or client is not connected to internet"
-                )
-                sys.exit(1)
-
-        except FileNotFoundError as e:
-            error_logger.error(str(e))
             sys.exit(1)
 
+        # flattening the objects selected by this run, not every object of the store,
+        # into the table every report is built from.
+        object_list = flatten_objects(store.records(object_ids))
+
     # directory in which reports will be generated.
     report_dir = os.path.join(BASE_DIR, 'reports/')
 
@@ -59,16 +107,15 @@ if __name__ == '__main__':
         os.mkdir('reports')
 
     try:
-        Converter.convert_to_csv(
-            object_list,
-            os.path.join(report_dir, 'museum_data.csv')
-        )
-        Converter.convert_to_excel(object_list, os.path.join(report_dir, 'museum_data.xlsx'))
-        Converter.convert_to_html(object_list, os.path.join(report_dir, 'museum_data.html'))
-        Converter.convert_to_xml(object_list, os.path.join(report_dir, 'museum_data.xml'))
-        Converter.convert_to_pdf(object_list, os.path.join(report_dir, 'museum_data.pdf'))
+        # the reports are written in parallel from the same table.
+        Converter.export(object_list, {
+            file_format: os.path.join(report_dir, f'museum_data.{file_format}')
+            for file_format in ('csv', 'xlsx', 'html', 'xml', 'pdf')
+        })
 
         EMAIL_REPORTS = os.getenv('EMAIL_REPORTS', 0)
+        # the reports are attached one by one, unless they are asked as a single zip.
+        BUNDLE_REPORTS = os.getenv('BUNDLE_REPORTS', 0)
         if EMAIL_REPORTS:
             email_body = 'Dear Krupa, \n\n' \
                        'Please take a look at the generated reports. \n\n' \
@@ -88,9 +135,14 @@ if __name__ == '__main__':
                        os.getenv('PASSWORD'),
                        'Museum API Reports',
                        email_body,
-                       REPORTS
+                       REPORTS,
+                       bundle=BUNDLE_REPORTS
                        )
 
     except FileNotFoundError as e:
         error_logger.error('Error occurred :%s', ({str(e)}))
         sys.exit(1)
+
+    if args.metrics is not None:
+        default_metrics.write_json(args.metrics)
+        default_metrics.write_prometheus(os.path.splitext(args.metrics)[0] + '.prom')
@@ -0,0 +1,406 @@
+"""
+    archive module provides zip archives whose members are compressed in parallel, with
+    a choice of codec and level, and read back one member at a time without extracting
+    the whole archive.
+"""
+import os
+import struct
+import tempfile
+import time
+import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from itertools import repeat
+
+# zip compression method of each codec. zstd members can only be read by this module,
+# and by zipfile from python 3.14.
+CODECS = {
+    'store': zipfile.ZIP_STORED,
+    'deflate': zipfile.ZIP_DEFLATED,
+    'bzip2': zipfile.ZIP_BZIP2,
+    'xz': zipfile.ZIP_LZMA,
+    'zstd': 93,
+}
+DEFAULT_CODEC = 'deflate'
+# extensions of files which are already compressed, stored as they are rather than
+# compressed again.
+COMPRESSED_EXTENSIONS = ('.xlsx', '.pdf', '.zip', '.gz', '.bz2', '.xz', '.zst', '.png',
+                         '.jpg', '.jpeg', '.parquet')
+# number of bytes read from a file at once.
+CHUNK_SIZE = 1024 * 1024
+# size of the fixed part of the local header of a member.
+LOCAL_HEADER_SIZE = 30
+# formats of the local header, the central directory header and the end of central
+# directory records of a zip archive, as described by the APPNOTE of PKWARE.
+LOCAL_HEADER = struct.Struct('<L5H3L2H')
+CENTRAL_HEADER = struct.Struct('<L6H3L5H2L')
+END_RECORD = struct.Struct('<L4H2LH')
+ZIP64_END_RECORD = struct.Struct('<LQ2H2L4Q')
+ZIP64_END_LOCATOR = struct.Struct('<2LQL')
+# sizes and offsets from which a member or the archive needs the zip64 extensions, and
+# number of members from which the archive does.
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP64_COUNT_LIMIT = 0xFFFF
+# values of the fields of the headers whose actual value is in the zip64 extensions.
+ZIP64_SIZE_MARKER = 0xFFFFFFFF
+ZIP64_COUNT_MARKER = 0xFFFF
+# version of the zip specification needed to extract a member, by compression method.
+EXTRACT_VERSIONS = {zipfile.ZIP_BZIP2: 46, zipfile.ZIP_LZMA: 63, CODECS['zstd']: 63}
+DEFAULT_EXTRACT_VERSION = 20
+ZIP64_EXTRACT_VERSION = 45
+# version of the specification the archives are written with, made on unix.
+CREATE_VERSION = (3 << 8) | 63
+
+
+def import_zstandard():
+    """
+    :return: zstandard module
+    """
+    try:
+        import zstandard  # pylint: disable=import-outside-toplevel
+    except ImportError as error:
+        raise ImportError("zstd archives need the zstandard package, install it with "
+                          "pip install zstandard") from error
+    return zstandard
+
+
+def read_chunks(file_ptr, size=None):
+    """
+    :param file_ptr: binary file
+    :param size: number of bytes to read, until the end of the file if None
+    :return: iterator of the chunks read
+    """
+    while size is None or size > 0:
+        chunk = file_ptr.read(CHUNK_SIZE if size is None else min(CHUNK_SIZE, size))
+        if not chunk:
+            return
+        if size is not None:
+            size -= len(chunk)
+        yield chunk
+
+
+class BoundedReader:
+    """
+    Reads the bytes of a file up to a size, e.g. the compressed data of a member.
+    """
+    def __init__(self, file_ptr, size):
+        """
+        :param file_ptr: binary file, at the position of the first byte
+        :param size: number of bytes which can be read
+        """
+        self.file_ptr = file_ptr
+        self.size = size
+
+    def read(self, size=-1):
+        """
+        :param size: maximum number of bytes, every remaining byte if negative
+        :return: bytes read, empty at the end
+        """
+        size = self.size if size < 0 else min(size, self.size)
+        data = self.file_ptr.read(size)
+        self.size -= len(data)
+        return data
+
+    def close(self):
+        """
+        closes the file.
+        """
+        self.file_ptr.close()
+
+
+def data_offset(file_ptr, info):
+    """
+    :param file_ptr: binary file of the archive
+    :param info: ZipInfo of a member
+    :return: offset of the compressed data of the member, after its local header
+    """
+    file_ptr.seek(info.header_offset)
+    header = file_ptr.read(LOCAL_HEADER_SIZE)
+    name_length, extra_length = struct.unpack('<2H', header[26:30])
+    return info.header_offset + LOCAL_HEADER_SIZE + name_length + extra_length
+
+
+def compress_member(path, codec, level, tmpdir):
+    """
+    compresses a file on its own, so that files can be compressed by several threads.
+    zlib, bz2, lzma and zstandard release the GIL while they compress.
+
+    :param path: path of the file
+    :param codec: name of the codec
+    :param level: compression level, the default of the codec if None
+    :param tmpdir: directory of the compressed data
+    :return: (data path, data offset, compression method, CRC, compressed size, flag
+        bits) tuple, the compressed data being at data offset of data path
+    """
+    if codec == 'store' or path.lower().endswith(COMPRESSED_EXTENSIONS):
+        crc = 0
+        with open(path, 'rb') as file_ptr:
+            for chunk in read_chunks(file_ptr):
+                crc = zlib.crc32(chunk, crc)
+        return path, 0, zipfile.ZIP_STORED, crc, os.path.getsize(path), 0
+
+    file_descriptor, data_path = tempfile.mkstemp(dir=tmpdir)
+    if codec == 'zstd':
+        zstandard = import_zstandard()
+        compressor = zstandard.ZstdCompressor(level=3 if level is None else level)
+        crc = 0
+        with open(path, 'rb') as file_ptr, open(file_descriptor, 'wb') as data_file:
+            # a single frame, so that the member can be read by a single decompressor.
+            with compressor.stream_writer(data_file, size=os.path.getsize(path),
+                                          closefd=False) as writer:
+                for chunk in read_chunks(file_ptr):
+                    crc = zlib.crc32(chunk, crc)
+                    writer.write(chunk)
+            compress_size = data_file.tell()
+        return data_path, 0, CODECS[codec], crc, compress_size, 0
+
+    # the file is written to an archive of its own, whose compressed data is copied.
+    os.close(file_descriptor)
+    with zipfile.ZipFile(data_path, 'w', CODECS[codec], compresslevel=level) as zip_file:
+        zip_file.write(path, 'member')
+    with zipfile.ZipFile(data_path) as zip_file:
+        info = zip_file.infolist()[0]
+    with open(data_path, 'rb') as file_ptr:
+        offset = data_offset(file_ptr, info)
+    # bits 1 and 2 are the options of the compression method.
+    return data_path, offset, info.compress_type, info.CRC, info.compress_size, \
+        info.flag_bits & 0x06
+
+
+def create_archive(source, target_path, codec=DEFAULT_CODEC, level=None, max_workers=None):
+    """
+    creates a zip archive, compressing its members in parallel. Files which are already
+    compressed, like .xlsx and .pdf, are stored as they are.
+
+    :param source: path of a directory, whose files are archived with their path
+        relative to it, or list of paths of files, archived with their name
+    :param target_path: path of the archive
+    :param codec: 'store', 'deflate', 'bzip2', 'xz' or 'zstd'. zstd needs the zstandard
+        package.
+    :param level: compression level, the default of the codec if None
+    :param max_workers: maximum number of files compressed at once
+    :return: list of the names of the members
+    """
+    if codec not in CODECS:
+        raise ValueError(f"unknown codec {codec}, expected one of {', '.join(CODECS)}")
+    if codec == 'zstd':
+        import_zstandard()
+
+    if isinstance(source, str):
+        paths = sorted(os.path.join(directory, name)
+                       for directory, _, names in os.walk(source) for name in names)
+        names = [os.path.relpath(path, source) for path in paths]
+    else:
+        paths = list(source)
+        names = [os.path.basename(path) for path in paths]
+
+    directory = os.path.dirname(os.path.abspath(target_path))
+    tmp_path = target_path + '.tmp'
+    try:
+        with tempfile.TemporaryDirectory(dir=directory) as tmpdir, \
+                ThreadPoolExecutor(max_workers=max_workers) as executor, \
+                ArchiveWriter(tmp_path) as writer:
+            members = executor.map(compress_member, paths, repeat(codec), repeat(level),
+                                   repeat(tmpdir))
+            for path, name, member in zip(paths, names, members):
+                writer.add(path, name, *member)
+                if member[0] != path:
+                    os.remove(member[0])
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, target_path)
+    return names
+
+
+def dos_date_time(timestamp):
+    """
+    :param timestamp: seconds since the epoch
+    :return: (date, time) tuple in the MS-DOS format of zip headers, the dates a zip
+        archive can't hold being clamped to 1980 - 2107
+    """
+    year, month, day, hour, minute, second = time.localtime(timestamp)[:6]
+    if year < 1980:
+        year, month, day, hour, minute, second = 1980, 1, 1, 0, 0, 0
+    elif year > 2107:
+        year, month, day, hour, minute, second = 2107, 12, 31, 23, 59, 58
+    return (year - 1980) << 9 | month << 5 | day, hour << 11 | minute << 5 | second // 2
+
+
+class ArchiveWriter:
+    """
+    Writes a zip archive from data which is already compressed, one member after the
+    other, and its central directory when it is closed. The zip64 extensions are used
+    for the members and the archives which need them.
+    """
+    def __init__(self, path):
+        """
+        :param path: path of the archive
+        """
+        self.file_ptr = open(path, 'wb')
+        # (name, header fields, size, compressed size, header offset, mode) of each
+        # member.
+        self.__members = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add(self, path, name, data_path, offset, compress_type, crc, compress_size,
+            flag_bits):
+        """
+        appends a member whose data was compressed by compress_member.
+
+        :param path: path of the file
+        :param name: name of the member
+        :param data_path: path of the file holding the compressed data
+        :param offset: offset of the compressed data in data_path
+        :param compress_type: zip compression method of the data
+        :param crc: CRC-32 of the file
+        :param compress_size: size of the compressed data
+        :param flag_bits: options of the compression method
+        """
+        stat = os.stat(path)
+        name = name.replace(os.sep, '/')
+        try:
+            encoded_name = name.encode('ascii')
+        except UnicodeEncodeError:
+            # bit 11 tells that the name is encoded in utf-8.
+            encoded_name = name.encode('utf-8')
+            flag_bits |= 0x800
+
+        header_offset = self.file_ptr.tell()
+        zip64 = max(stat.st_size, compress_size) >= ZIP64_LIMIT
+        extract_version = max(EXTRACT_VERSIONS.get(compress_type, DEFAULT_EXTRACT_VERSION),
+                              ZIP64_EXTRACT_VERSION if zip64 else 0)
+        fields = (extract_version, flag_bits, compress_type,
+                  *reversed(dos_date_time(stat.st_mtime)), crc)
+        # the local header holds both sizes in its zip64 extra field if either is too big.
+        extra = struct.pack('<2H2Q', 1, 16, stat.st_size, compress_size) if zip64 else b''
+        sizes = (ZIP64_SIZE_MARKER,) * 2 if zip64 else (compress_size, stat.st_size)
+        self.file_ptr.write(LOCAL_HEADER.pack(0x04034b50, *fields, *sizes, len(encoded_name),
+                                              len(extra)))
+        self.file_ptr.write(encoded_name + extra)
+        with open(data_path, 'rb') as file_ptr:
+            file_ptr.seek(offset)
+            for chunk in read_chunks(file_ptr, compress_size):
+                self.file_ptr.write(chunk)
+
+        self.__members.append((encoded_name, fields, stat.st_size, compress_size,
+                               header_offset, stat.st_mode))
+
+    def close(self):
+        """
+        writes the central directory and closes the archive.
+        """
+        if self.file_ptr.closed:
+            return
+        try:
+            self.__write_central_directory()
+        finally:
+            self.file_ptr.close()
+
+    def __write_central_directory(self):
+        """
+        writes the header of each member, then the end of central directory records.
+        """
+        start = self.file_ptr.tell()
+        for encoded_name, fields, size, compress_size, header_offset, mode in self.__members:
+            # the central header only holds the values which are too big in its zip64
+            # extra field, in this order.
+            values = (size, compress_size, header_offset)
+            big_values = [value for value in values if value >= ZIP64_LIMIT]
+            extra = struct.pack(f'<2H{len(big_values)}Q', 1, 8 * len(big_values),
+                                *big_values) if big_values else b''
+            size, compress_size, header_offset = (
+                ZIP64_SIZE_MARKER if value >= ZIP64_LIMIT else value for value in values
+            )
+            if big_values:
+                fields = (max(fields[0], ZIP64_EXTRACT_VERSION), *fields[1:])
+            self.file_ptr.write(CENTRAL_HEADER.pack(
+                0x02014b50, CREATE_VERSION, *fields, compress_size, size,
+                len(encoded_name), len(extra), 0, 0, 0, (mode & 0xFFFF) << 16, header_offset
+            ))
+            self.file_ptr.write(encoded_name + extra)
+
+        end = self.file_ptr.tell()
+        count = len(self.__members)
+        if count >= ZIP64_COUNT_LIMIT or max(start, end - start) >= ZIP64_LIMIT:
+            self.file_ptr.write(ZIP64_END_RECORD.pack(
+                0x06064b50, ZIP64_END_RECORD.size - 12, CREATE_VERSION,
+                ZIP64_EXTRACT_VERSION, 0, 0, count, count, end - start, start
+            ))
+            self.file_ptr.write(ZIP64_END_LOCATOR.pack(0x07064b50, 0, end, 1))
+            count, size, start = ZIP64_COUNT_MARKER, ZIP64_SIZE_MARKER, ZIP64_SIZE_MARKER
+        else:
+            size = end - start
+        self.file_ptr.write(END_RECORD.pack(0x06054b50, 0, 0, count, count, size, start, 0))
+
+
+def list_members(archive_path):
+    """
+    :param archive_path: path of the archive
+    :return: list of the names of the members
+    """
+    with zipfile.ZipFile(archive_path) as zip_file:
+        return zip_file.namelist()
+
+
+def open_member(archive_path, name):
+    """
+    opens a member of an archive for reading, its data being decompressed as it is read.
+
+    :param archive_path: path of the archive
+    :param name: name of the member
+    :return: binary file object, to be closed
+    """
+    with zipfile.ZipFile(archive_path) as zip_file:
+        info = zip_file.getinfo(name)
+        if info.compress_type != CODECS['zstd']:
+            # the member keeps the archive open until it is closed.
+            return zip_file.open(info)
+
+    zstandard = import_zstandard()
+    file_ptr = open(archive_path, 'rb')
+    file_ptr.seek(data_offset(file_ptr, info))
+    return zstandard.ZstdDecompressor().stream_reader(
+        BoundedReader(file_ptr, info.compress_size)
+    )
+
+
+def extract_member(archive_path, name, target_dir):
+    """
+    extracts a member of an archive, streaming it to its file.
+
+    :param archive_path: path of the archive
+    :param name: name of the member
+    :param target_dir: directory the member is extracted to
+    :return: path of the extracted file
+    """
+    target_dir = os.path.abspath(target_dir)
+    path = os.path.abspath(os.path.join(target_dir, name))
+    if os.path.commonpath([target_dir, path]) != target_dir:
+        raise ValueError(f"member {name} would be extracted out of {target_dir}")
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open_member(archive_path, name) as member, open(path, 'wb') as file_ptr:
+        for chunk in read_chunks(member):
+            file_ptr.write(chunk)
+    return path
+
+
+def extract_members(archive_path, target_dir, names=None):
+    """
+    extracts members of an archive, one at a time.
+
+    :param archive_path: path of the archive
+    :param target_dir: directory the members are extracted to
+    :param names: names of the members, every member if None
+    :return: list of the paths of the extracted files
+    """
+    if names is None:
+        names = list_members(archive_path)
+    return [extract_member(archive_path, name, target_dir) for name in names]
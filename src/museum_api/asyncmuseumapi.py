@@ -0,0 +1,204 @@
+"""
+    This module provides AsyncMuseumAPI class, the asyncio counterpart of MuseumAPI.
+    It fetches many objects concurrently over a single pooled aiohttp session.
+"""
+import asyncio
+import json
+import time
+
+import aiohttp
+
+from museum_api.metrics import default_metrics
+from museum_api.museumapi import BASE_URL, DEFAULT_TIMEOUT, DEFAULT_POOL_MAXSIZE, \
+    object_ids_endpoint
+from museum_api.objectids import ObjectIDs
+from museum_api.ratelimit import RateLimiter, RetryPolicy
+
+# number of objects fetched at the same time by fetch_objects.
+DEFAULT_CONCURRENCY = 10
+
+
+class AsyncMuseumAPI:
+    """
+        AsyncMuseumAPI class exposes the same endpoints as MuseumAPI as coroutines, and
+        returns the same dictionaries::
+
+            async with AsyncMuseumAPI() as m:
+                async for object_id, data in m.fetch_objects(object_ids, concurrency=20):
+                    ...
+    """
+    def __init__(self,
+                 base_url=BASE_URL,
+                 timeout=DEFAULT_TIMEOUT,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 session=None,
+                 rate_limiter=None,
+                 retry=None,
+                 metrics=None):
+        """
+        :param base_url: base url of the museum api
+        :param timeout: timeout of each request in seconds, either a single number or a
+            (connect, read) tuple
+        :param pool_maxsize: maximum number of keep-alive connections kept open
+        :param session: an existing aiohttp.ClientSession to use. It is not closed by
+            :meth:`close`, as it is owned by the caller.
+        :param rate_limiter: RateLimiter pacing the requests, it can be shared with a
+            MuseumAPI instance. Defaults to the rate allowed by the api.
+        :param retry: RetryPolicy of the requests failing with a connection error or a
+            retryable status such as 429 or 503
+        :param metrics: Metrics the requests, bytes, latencies and retries are recorded
+            to, default_metrics by default
+        """
+        self.base_url = base_url
+        self.timeout = timeout
+        self.pool_maxsize = pool_maxsize
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter()
+        self.retry = retry if retry is not None else RetryPolicy()
+        self.metrics = metrics if metrics is not None else default_metrics
+
+        self.__owns_session = session is None
+        self.__session = session
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def close(self):
+        """
+        closes all the pooled connections of the session owned by this instance.
+        """
+        if self.__owns_session and self.__session is not None:
+            await self.__session.close()
+            self.__session = None
+
+    @property
+    def session(self):
+        """
+        aiohttp session used for the requests, created on first use as it must be
+        bound to the running event loop.
+        """
+        if self.__session is None:
+            if isinstance(self.timeout, tuple):
+                connect_timeout, read_timeout = self.timeout
+                client_timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout,
+                                                       sock_read=read_timeout)
+            else:
+                client_timeout = aiohttp.ClientTimeout(total=self.timeout)
+
+            self.__session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_maxsize),
+                timeout=client_timeout,
+            )
+        return self.__session
+
+    async def __fetch_json(self, endpoint, headers=None):
+        """
+        :param endpoint: api endpoint
+        :param headers: headers to be sent in request
+        :return: decoded json body of the response, None if response is not ok.
+        """
+        url = self.base_url + endpoint
+
+        attempt = 0
+        while True:
+            await self.rate_limiter.acquire_async()
+            started = time.perf_counter()
+            try:
+                async with self.session.get(url, headers=headers) as response:
+                    body = await response.read()
+                    self.metrics.increment('requests', status=response.status)
+                    self.metrics.observe('request_seconds', time.perf_counter() - started)
+                    self.metrics.increment('bytes_received', len(body))
+                    if not self.retry.should_retry_status(response.status, attempt):
+                        return json.loads(body) if response.ok else None
+                    delay = self.retry.backoff(attempt, response.headers.get('Retry-After'))
+                    if response.status == 429:
+                        # the whole client is being throttled, not only this request.
+                        self.rate_limiter.pause(delay)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as error:
+                self.metrics.increment('request_errors', error=type(error).__name__)
+                if not self.retry.can_retry(attempt):
+                    raise
+                delay = self.retry.backoff(attempt)
+
+            self.metrics.increment('retries')
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def get_all_object_ids(self, headers=None, metadata_date=None, department_ids=None,
+                                 compact=False):
+        """
+        fetches all the object ids from the museum api.
+
+        :param headers: headers to be sent in request
+        :param metadata_date: only fetch the ids of objects updated since this date
+        :param department_ids: only fetch the ids of objects of these departments
+        :param compact: return objectIDs as ObjectIDs instead of a list
+        :return: a dictionary with keys total and objectIDs, same as
+            MuseumAPI.get_all_object_ids
+        """
+        endpoint = object_ids_endpoint(metadata_date, department_ids)
+        response = await self.__fetch_json(endpoint, headers)
+        if compact and response is not None:
+            response['objectIDs'] = ObjectIDs(response.get('objectIDs') or ())
+        return response
+
+    async def get_object_for_id(self, object_id, headers=None):
+        """
+        fetches an object with specified object_id from museum api.
+
+        :param object_id: object_id of the object to fetch data from museum api
+        :param headers: headers to be sent in request
+        :return: dictionary containing detail of the object.
+        """
+        endpoint = f'/public/collection/v1/objects/{str(object_id)}'
+        return await self.__fetch_json(endpoint, headers)
+
+    async def fetch_objects(self, object_ids, concurrency=DEFAULT_CONCURRENCY, headers=None):
+        """
+        fetches the objects for all the given object ids, keeping at most `concurrency`
+        requests in flight. Results are yielded in the order they complete.
+
+        :param object_ids: iterable of object ids, consumed lazily
+        :param concurrency: maximum number of requests in flight
+        :param headers: headers to be sent in request
+        :return: async iterator of (object_id, data) tuples, data being None when the
+            response is not ok. The first request error is raised to the caller.
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+
+        ids = iter(object_ids)
+        queue = asyncio.Queue(maxsize=concurrency)
+        done = object()
+
+        async def worker():
+            for object_id in ids:
+                try:
+                    data = await self.get_object_for_id(object_id, headers)
+                except Exception as error:  # pylint: disable=broad-except
+                    await queue.put((object_id, None, error))
+                    return
+                await queue.put((object_id, data, None))
+
+        async def run_workers():
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            await queue.put((None, None, done))
+
+        runner = asyncio.ensure_future(run_workers())
+        try:
+            while True:
+                object_id, data, error = await queue.get()
+                if error is done:
+                    break
+                if error is not None:
+                    raise error
+                yield object_id, data
+        finally:
+            runner.cancel()
+            try:
+                await runner
+            except asyncio.CancelledError:
+                pass
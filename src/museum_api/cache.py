@@ -0,0 +1,348 @@
+"""
+    cache module provides the caches MuseumAPI can keep the api responses in, so repeated
+    harvests do not download records which have not changed.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# responses younger than this many seconds are served without asking the api.
+DEFAULT_TTL = 24 * 60 * 60
+
+# size of the stored response bodies after which least recently used ones are evicted.
+DEFAULT_MAX_SIZE = 1024 ** 3
+
+# bounds of the in-memory cache.
+DEFAULT_MEMORY_TTL = 60 * 60
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_MAX_BYTES = 64 * 1024 ** 2
+
+
+class CacheEntry:
+    """
+    A response stored in the cache, with the validators needed to revalidate it.
+    """
+    def __init__(self, body, etag=None, last_modified=None, stored_at=None):
+        """
+        :param body: raw body of the response
+        :param etag: value of the ETag header of the response
+        :param last_modified: value of the Last-Modified header of the response
+        :param stored_at: time the response was downloaded or last revalidated
+        """
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = stored_at if stored_at is not None else time.time()
+
+    def is_fresh(self, ttl):
+        """
+        :param ttl: time to live in seconds, None if entries never expire
+        :return: True if the entry can be used without revalidating it
+        """
+        return ttl is None or time.time() - self.stored_at < ttl
+
+    def validators(self):
+        """
+        :return: headers making the request conditional on the entry being outdated
+        """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class ResponseCache:
+    """
+    Persistent cache of api responses, stored in a SQLite database. Fresh responses are
+    read locally, stale ones are revalidated with If-None-Match / If-Modified-Since, and
+    the least recently used responses are evicted once max_size is exceeded.
+
+    The counters hits, revalidations and misses tell how many responses were read
+    locally, confirmed unchanged by a 304 response and downloaded in full.
+    """
+    def __init__(self, path, ttl=DEFAULT_TTL, max_size=DEFAULT_MAX_SIZE):
+        """
+        :param path: path of the SQLite database, created if it doesn't exist
+        :param ttl: seconds a response is used without revalidating it, None if
+            responses never expire
+        :param max_size: maximum size in bytes of the stored response bodies
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_size = max_size
+
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(path, check_same_thread=False,
+                                            isolation_level=None)
+        self.__connection.execute('PRAGMA journal_mode=WAL')
+        self.__connection.execute('PRAGMA synchronous=NORMAL')
+        self.__connection.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            ' url TEXT PRIMARY KEY,'
+            ' body BLOB NOT NULL,'
+            ' etag TEXT,'
+            ' last_modified TEXT,'
+            ' stored_at REAL NOT NULL,'
+            ' accessed_at REAL NOT NULL,'
+            ' size INTEGER NOT NULL)'
+        )
+        self.__connection.execute(
+            'CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)'
+        )
+        self.__size = self.__connection.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM responses'
+        ).fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        closes the database.
+        """
+        with self.__lock:
+            self.__connection.close()
+
+    def get(self, url):
+        """
+        looks up the stored response of an url. Reading a fresh response counts as a hit.
+
+        :param url: url of the request
+        :return: CacheEntry, None if no response is stored for the url
+        """
+        with self.__lock:
+            row = self.__connection.execute(
+                'SELECT body, etag, last_modified, stored_at FROM responses WHERE url = ?',
+                (url,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            self.__connection.execute('UPDATE responses SET accessed_at = ? WHERE url = ?',
+                                      (time.time(), url))
+            entry = CacheEntry(*row)
+            if entry.is_fresh(self.ttl):
+                self.hits += 1
+            return entry
+
+    def set(self, url, body, etag=None, last_modified=None):
+        """
+        stores a downloaded response, which counts as a miss.
+
+        :param url: url of the request
+        :param body: raw body of the response
+        :param etag: value of the ETag header of the response
+        :param last_modified: value of the Last-Modified header of the response
+        """
+        now = time.time()
+        with self.__lock:
+            self.misses += 1
+            old_size = self.__connection.execute(
+                'SELECT size FROM responses WHERE url = ?', (url,)
+            ).fetchone()
+            self.__connection.execute(
+                'INSERT OR REPLACE INTO responses'
+                ' (url, body, etag, last_modified, stored_at, accessed_at, size)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (url, sqlite3.Binary(body), etag, last_modified, now, now, len(body))
+            )
+            self.__size += len(body) - (old_size[0] if old_size else 0)
+            self.__evict()
+
+    def revalidated(self, url):
+        """
+        marks the stored response of an url as confirmed unchanged by the api.
+
+        :param url: url of the request
+        """
+        with self.__lock:
+            self.revalidations += 1
+            self.__connection.execute('UPDATE responses SET stored_at = ? WHERE url = ?',
+                                      (time.time(), url))
+
+    def invalidate(self, url=None):
+        """
+        removes the stored response of an url, or every stored response.
+
+        :param url: url of the request, None to clear the whole cache
+        """
+        with self.__lock:
+            if url is None:
+                self.__connection.execute('DELETE FROM responses')
+            else:
+                self.__connection.execute('DELETE FROM responses WHERE url = ?', (url,))
+            self.__size = self.__connection.execute(
+                'SELECT COALESCE(SUM(size), 0) FROM responses'
+            ).fetchone()[0]
+
+    def stats(self):
+        """
+        :return: dictionary with the counters hits, revalidations and misses, the number
+            of stored responses and their size in bytes
+        """
+        with self.__lock:
+            entries = self.__connection.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+            return {
+                'hits': self.hits,
+                'revalidations': self.revalidations,
+                'misses': self.misses,
+                'entries': entries,
+                'size': self.__size,
+            }
+
+    def __evict(self):
+        """
+        deletes least recently used responses until the cache fits in max_size.
+        """
+        while self.__size > self.max_size:
+            rows = self.__connection.execute(
+                'SELECT url, size FROM responses ORDER BY accessed_at LIMIT 100'
+            ).fetchall()
+            if not rows:
+                break
+            for url, size in rows:
+                if self.__size <= self.max_size:
+                    break
+                self.__connection.execute('DELETE FROM responses WHERE url = ?', (url,))
+                self.__size -= size
+
+
+class MemoryCache:
+    """
+    Thread safe in-process LRU cache of decoded api responses, bounded by number of
+    entries and by their encoded size.
+
+    Values are kept json encoded, so every caller gets its own copy and can modify it
+    (as flatten does) without corrupting the cache. Concurrent loads of the same key are
+    de-duplicated: only the first caller runs the loader, the others wait for its result.
+    """
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES,
+                 ttl=DEFAULT_MEMORY_TTL):
+        """
+        :param max_entries: maximum number of values kept
+        :param max_bytes: maximum size in bytes of the json encoded values kept
+        :param ttl: seconds a value is kept, None if values never expire
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+        self.__lock = threading.Lock()
+        # key -> (encoded value, time it was loaded), least recently used first.
+        self.__entries = OrderedDict()
+        self.__size = 0
+        # key -> Future of the encoded value, for the loads in progress.
+        self.__loading = {}
+
+    def get_or_load(self, key, loader):
+        """
+        returns the value cached for a key, calling loader to get it on a miss. None
+        returned by the loader is passed on but not cached.
+
+        :param key: key of the value
+        :param loader: function without arguments returning a json serializable value
+        :return: a copy of the value
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None:
+                data, loaded_at = entry
+                if self.ttl is None or time.monotonic() - loaded_at < self.ttl:
+                    self.__entries.move_to_end(key)
+                    self.hits += 1
+                    return json.loads(data)
+                self.__remove(key)
+
+            future = self.__loading.get(key)
+            if future is None:
+                future = self.__loading[key] = Future()
+                self.misses += 1
+                is_loader = True
+            else:
+                self.coalesced += 1
+                is_loader = False
+
+        if not is_loader:
+            data = future.result()
+            return None if data is None else json.loads(data)
+
+        try:
+            value = loader()
+        except BaseException as error:
+            with self.__lock:
+                del self.__loading[key]
+            future.set_exception(error)
+            raise
+
+        data = None if value is None else json.dumps(value)
+        with self.__lock:
+            del self.__loading[key]
+            if data is not None:
+                self.__entries[key] = (data, time.monotonic())
+                self.__size += len(data)
+                self.__evict()
+        future.set_result(data)
+        return value
+
+    def invalidate(self, key=None):
+        """
+        removes the value of a key, or every value.
+
+        :param key: key of the value, None to clear the whole cache
+        """
+        with self.__lock:
+            if key is None:
+                self.__entries.clear()
+                self.__size = 0
+            elif key in self.__entries:
+                self.__remove(key)
+
+    def stats(self):
+        """
+        :return: dictionary with the counters hits, misses, coalesced (callers which
+            waited for a load already in progress) and evictions, the number of values
+            kept and their size in bytes
+        """
+        with self.__lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'evictions': self.evictions,
+                'entries': len(self.__entries),
+                'size': self.__size,
+            }
+
+    def __remove(self, key):
+        data, _ = self.__entries.pop(key)
+        self.__size -= len(data)
+
+    def __evict(self):
+        """
+        drops least recently used values until the cache fits in its bounds.
+        """
+        while self.__entries and (len(self.__entries) > self.max_entries
+                                  or self.__size > self.max_bytes):
+            self.__remove(next(iter(self.__entries)))
+            self.evictions += 1
@@ -0,0 +1,225 @@
+"""
+    flattener module provides Flattener, which flattens objects without losing any value,
+    unlike flatten which lets the values of the nested lists overwrite each other.
+"""
+from itertools import chain, islice
+
+import pandas as pd
+
+from museum_api.utils import FLATTEN_KEYS
+
+# ways of flattening the lists of dictionaries of an object.
+MODES = ('path', 'aggregate', 'explode')
+# separator of the keys making up the name of a column, e.g. constituents.0.name
+DEFAULT_SEPARATOR = '.'
+# separator of the values of a list aggregated into one column.
+DEFAULT_DELIMITER = '|'
+
+
+class Flattener:
+    """
+    Flattens batches of objects into DataFrames whose columns are named after the path of
+    their value in the objects. Nested dictionaries such as elementMeasurements always
+    become columns of their own, and the lists of dictionaries of keys are flattened
+    according to mode:
+
+    - 'path' gives a column per position, e.g. constituents.0.name, constituents.1.name
+    - 'aggregate' gives a column per key, e.g. constituents.name, holding the values of
+      every constituent joined by delimiter
+    - 'explode' gives a table per list, with a row per dictionary keyed by objectID and
+      its position in the list, besides the objects table
+
+    The values are copied a column of the whole batch at a time rather than an object at a
+    time, and the columns are worked out once per batch. A schema compiled once with
+    :meth:`compile` gives every batch the same columns. A path holds either dictionaries
+    or values, values found where other objects have dictionaries are left out::
+
+        flattener = Flattener(mode='explode')
+        tables = flattener.flatten(store.records())
+        tables['constituents']  # objectID, position, constituentID, role, name, ...
+    """
+    def __init__(self, mode='path', keys=FLATTEN_KEYS, separator=DEFAULT_SEPARATOR,
+                 delimiter=DEFAULT_DELIMITER, key='objectID'):
+        """
+        :param mode: 'path', 'aggregate' or 'explode'
+        :param keys: list of keys whose lists of dictionaries are flattened
+        :param separator: separator of the keys making up the name of a column
+        :param delimiter: separator of the values aggregated into one column
+        :param key: name of the key identifying an object, copied to the exploded tables
+        """
+        if mode not in MODES:
+            raise ValueError(f"unknown mode {mode}, expected one of {', '.join(MODES)}")
+
+        self.mode = mode
+        self.keys = keys
+        self.separator = separator
+        self.delimiter = delimiter
+        self.key = key
+
+    def compile(self, objects):
+        """
+        works out the columns the objects flatten to. Pass the schema to :meth:`flatten`
+        to give later batches the same columns.
+
+        :param objects: list of objects
+        :return: dictionary of table name to the list of paths of its columns, a path
+            being a tuple of keys and list positions
+        """
+        schema = {'objects': self.__table(objects, self.keys)[0]}
+        if self.mode == 'explode':
+            for key in self.keys:
+                schema[key] = self.__table(list(self.__elements(objects, key)), ())[0]
+        return schema
+
+    def flatten(self, objects, schema=None):
+        """
+        flattens a batch of objects. The objects are not modified.
+
+        :param objects: iterable of objects to be flattened
+        :param schema: schema returned by :meth:`compile`, to give the DataFrames the
+            same columns whatever the objects of the batch. Values which are not in the
+            schema are left out. By default the columns are worked out from the batch.
+        :return: DataFrame with a row for each object, or with mode 'explode', dictionary
+            of table name to DataFrame with the objects table and a table for each key
+        """
+        if not isinstance(objects, list):
+            objects = list(objects)
+
+        paths = None if schema is None else schema['objects']
+        dataframe = self.__table(objects, self.keys, paths)[1]
+        if self.mode != 'explode':
+            return dataframe
+
+        tables = {'objects': dataframe}
+        for key in self.keys:
+            if schema is not None and key not in schema:
+                continue
+            paths = None if schema is None else schema[key]
+            table = self.__table(list(self.__elements(objects, key)), (), paths)[1]
+            table.insert(0, 'position', list(chain.from_iterable(
+                range(len(obj.get(key) or ())) for obj in objects
+            )))
+            table.insert(0, self.key, [obj.get(self.key) for obj in objects
+                                       for _ in obj.get(key) or ()])
+            tables[key] = table
+        return tables
+
+    @staticmethod
+    def __elements(objects, key):
+        """
+        :return: iterator of the dictionaries in the key list of every object
+        """
+        return chain.from_iterable(obj.get(key) or () for obj in objects)
+
+    @staticmethod
+    def __columns(values, names, dtype=None):
+        """
+        copies the values of names out of every dictionary or list, letting pandas do
+        the copy a whole column at a time.
+
+        :param values: list of dictionaries, or of lists if names are list positions
+        :param names: list of keys, or of list positions
+        :param dtype: dtype of the columns, inferred by pandas by default
+        :return: list of a Series of values per name, NaN where a value has no name
+        """
+        kind = list if isinstance(names[0], int) else dict
+        if set(map(type, values)) - {kind}:
+            # strings can be indexed as well, only lists hold list positions.
+            values = [value if isinstance(value, kind) else kind() for value in values]
+
+        if kind is list:
+            frame = pd.DataFrame(values, dtype=dtype).reindex(columns=names)
+        else:
+            frame = pd.DataFrame(values, columns=names, dtype=dtype)
+        frame.index = pd.RangeIndex(len(values))
+        return [frame.iloc[:, index] for index in range(len(names))]
+
+    @staticmethod
+    def __nested(column):
+        """
+        :return: True if column holds dictionaries, whose values have columns of their own
+        """
+        return column.dtype == object and dict in set(map(type, column))
+
+    def __table(self, rows, lists, paths=None):
+        """
+        copies the values of rows into the columns of a DataFrame, a column per path.
+        The values of a nested dictionary are copied out of every row at once.
+
+        :param rows: list of dictionaries, a row each
+        :param lists: keys of the lists of dictionaries to be flattened
+        :param paths: list of the paths of the columns, worked out from the rows if None
+        :return: (paths, DataFrame) tuple
+        """
+        tree = None
+        if paths is not None:
+            # keys under each path given.
+            tree = {}
+            for path in paths:
+                for depth in range(len(path)):
+                    tree.setdefault(path[:depth], {}).setdefault(path[depth])
+
+        columns = {}
+
+        def names_of(values, prefix):
+            if tree is not None:
+                return list(tree.get(prefix, ()))
+            if len(prefix) == 1 and prefix[0] in lists and self.mode == 'path':
+                return list(range(max(map(len, values), default=0)))
+            if set(map(type, values)) - {dict}:
+                values = [value for value in values if isinstance(value, dict)]
+            return list(dict.fromkeys(chain.from_iterable(values)))
+
+        def has_columns(path, column):
+            if tree is not None:
+                return path in tree
+            return self.__nested(column)
+
+        def join(values, lengths):
+            values = iter(values)
+            # NaN is the only value which is not equal to itself.
+            return [self.delimiter.join('' if value is None or value != value else str(value)
+                                        for value in islice(values, length))
+                    if length else None for length in lengths]
+
+        def fill(values, prefix, in_list=False):
+            names = names_of(values, prefix)
+            if not names:
+                return
+
+            # values joined together are kept as they are, e.g. ints stay ints rather
+            # than becoming floats because some dictionaries don't have them.
+            dtype = object if in_list else None
+            for name, column in zip(names, self.__columns(values, names, dtype)):
+                path = prefix + (name,)
+                if prefix or name not in lists:
+                    if has_columns(path, column):
+                        fill(column.tolist(), path, in_list)
+                    else:
+                        columns[path] = column
+                    continue
+
+                children = [child if isinstance(child, list) else [] for child in column]
+                if self.mode == 'path':
+                    fill(children, path)
+                elif self.mode == 'aggregate':
+                    # the values of every dictionary of the lists are copied out
+                    # together, then joined back into a value per row.
+                    lengths = list(map(len, children))
+                    elements = list(chain.from_iterable(children))
+                    if tree is not None and path in tree or \
+                            tree is None and dict in set(map(type, elements)):
+                        start = len(columns)
+                        fill(elements, path, True)
+                        for column_path in list(columns)[start:]:
+                            columns[column_path] = join(columns[column_path], lengths)
+                    elif path in paths if tree is not None else elements:
+                        columns[path] = join(elements, lengths)
+
+        fill(rows, ())
+        if paths is not None:
+            columns = {path: columns[path] for path in paths if path in columns}
+        dataframe = pd.DataFrame({self.separator.join(str(part) for part in path): values
+                                  for path, values in columns.items()},
+                                 index=pd.RangeIndex(len(rows)))
+        return list(columns), dataframe
@@ -0,0 +1,212 @@
+"""
+    harvest module provides Harvester, which fetches objects from the museum api into a
+    local store, checkpointing its progress so an interrupted harvest resumes where it
+    stopped instead of starting over.
+"""
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+from museum_api.museumapi import DEFAULT_POOL_MAXSIZE
+
+# number of fetched objects written to the store at once.
+DEFAULT_CHECKPOINT_EVERY = 500
+# number of object ids looked up in the store by a query, below SQLite's limit of 999
+# parameters.
+RECORDS_CHUNK_SIZE = 500
+
+
+class HarvestStore:
+    """
+    SQLite store of the raw object records fetched by a harvest. Objects which no longer
+    exist are stored without data, so they are not requested again.
+    """
+    def __init__(self, path):
+        """
+        :param path: path of the SQLite database, created if it doesn't exist
+        """
+        self.path = path
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self.__connection = sqlite3.connect(path)
+        self.__connection.execute('PRAGMA journal_mode=WAL')
+        self.__connection.execute(
+            'CREATE TABLE IF NOT EXISTS records ('
+            ' object_id INTEGER PRIMARY KEY,'
+            ' data TEXT,'
+            ' fetched_at REAL NOT NULL)'
+        )
+        self.__connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        closes the database.
+        """
+        self.__connection.close()
+
+    def completed_ids(self, since=None):
+        """
+        :param since: only count the objects fetched since this datetime
+        :return: list of ids of the objects already fetched
+        """
+        query = 'SELECT object_id FROM records'
+        params = ()
+        if since is not None:
+            query += ' WHERE fetched_at >= ?'
+            params = (since.timestamp(),)
+        return [row[0] for row in self.__connection.execute(query, params)]
+
+    def save(self, records):
+        """
+        writes fetched objects in a single transaction.
+
+        :param records: list of (object_id, data) tuples, data being None for objects
+            which no longer exist
+        """
+        now = time.time()
+        with self.__connection:
+            self.__connection.executemany(
+                'INSERT OR REPLACE INTO records (object_id, data, fetched_at) VALUES (?, ?, ?)',
+                [(object_id, None if data is None else json.dumps(data), now)
+                 for object_id, data in records]
+            )
+
+    def records(self, object_ids=None):
+        """
+        :param object_ids: ids of the objects returned, e.g. the ObjectIDs of a harvest,
+            every stored object if None
+        :return: iterator of the stored object records, in object id order
+        """
+        if object_ids is None:
+            cursor = self.__connection.execute(
+                'SELECT data FROM records WHERE data IS NOT NULL ORDER BY object_id'
+            )
+            for (data,) in cursor:
+                yield json.loads(data)
+            return
+
+        object_ids = sorted({int(object_id) for object_id in object_ids})
+        for start in range(0, len(object_ids), RECORDS_CHUNK_SIZE):
+            chunk = object_ids[start:start + RECORDS_CHUNK_SIZE]
+            cursor = self.__connection.execute(
+                'SELECT data FROM records WHERE data IS NOT NULL AND object_id IN '
+                f'({", ".join("?" * len(chunk))}) ORDER BY object_id', chunk
+            )
+            for (data,) in cursor:
+                yield json.loads(data)
+
+    def __len__(self):
+        return self.__connection.execute(
+            'SELECT COUNT(*) FROM records WHERE data IS NOT NULL'
+        ).fetchone()[0]
+
+
+class Harvester:
+    """
+    Fetches objects from the museum api into a HarvestStore. Completed objects are
+    checkpointed every checkpoint_every objects, and skipped when the harvest is run
+    again, so a harvest which died halfway resumes exactly where it stopped::
+
+        with MuseumAPI() as m, HarvestStore('harvest/harvest.sqlite') as store:
+            Harvester(m, store).run(limit=1000, shard=(0, 4))
+            object_list = list(store.records())
+    """
+    def __init__(self, museum_api, store, max_workers=DEFAULT_POOL_MAXSIZE,
+                 checkpoint_every=DEFAULT_CHECKPOINT_EVERY):
+        """
+        :param museum_api: MuseumAPI used to fetch the objects
+        :param store: HarvestStore the objects are written to
+        :param max_workers: number of threads fetching objects at the same time
+        :param checkpoint_every: number of fetched objects written to the store at once
+        """
+        self.museum_api = museum_api
+        self.store = store
+        self.max_workers = max_workers
+        self.checkpoint_every = checkpoint_every
+
+    def object_ids(self, limit=None, shard=None, since=None):
+        """
+        :param limit: only harvest the first limit objects
+        :param shard: (index, count) tuple, to only harvest the index-th of count shards
+        :param since: only harvest the objects updated since this date
+        :return: ObjectIDs of the objects to harvest
+        """
+        response = self.museum_api.get_all_object_ids(metadata_date=since, compact=True)
+        if response is None:
+            raise ConnectionError("could not fetch the object ids")
+
+        object_ids = response['objectIDs']
+        if shard is not None:
+            object_ids = object_ids.shard(*shard)
+        if limit is not None:
+            object_ids = object_ids[0: limit]
+        return object_ids
+
+    def run(self, limit=None, shard=None, since=None, object_ids=None):
+        """
+        fetches the objects which are not in the store yet. With since, objects fetched
+        before that date are fetched again as they may have changed.
+
+        :param limit: only harvest the first limit objects
+        :param shard: (index, count) tuple, to only harvest the index-th of count shards
+        :param since: only harvest the objects updated since this date
+        :param object_ids: ObjectIDs to harvest, as returned by :meth:`object_ids`, so
+            that they are not fetched again. limit and shard are then ignored, since still
+            tells which stored objects are fetched again.
+        :return: dictionary with the number of objects fetched, missing (which no longer
+            exist), failed (to be retried by the next run) and skipped (already fetched)
+        """
+        if object_ids is None:
+            object_ids = self.object_ids(limit, shard, since)
+        since_datetime = None
+        if since is not None:
+            since_datetime = datetime(since.year, since.month, since.day)
+        pending = object_ids.difference(self.store.completed_ids(since_datetime))
+
+        summary = {'fetched': 0, 'missing': 0, 'failed': 0,
+                   'skipped': len(object_ids) - len(pending)}
+        batch = []
+        try:
+            for object_id, data in self.museum_api.get_objects_for_ids(
+                    pending, max_workers=self.max_workers, ordered=False):
+                if isinstance(data, Exception):
+                    summary['failed'] += 1
+                    continue
+
+                summary['fetched' if data is not None else 'missing'] += 1
+                batch.append((object_id, data))
+                if len(batch) >= self.checkpoint_every:
+                    self.store.save(batch)
+                    batch = []
+        finally:
+            # checkpoint what was fetched before stopping, even on an error.
+            self.store.save(batch)
+
+        return summary
+
+
+def parse_shard(value):
+    """
+    parses a shard given on the command line.
+
+    :param value: string k/n, k being the 0-based index of the shard and n the number of
+        shards
+    :return: (k, n) tuple
+    """
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError as error:
+        raise ValueError(f"invalid shard {value}, expected k/n") from error
+    if not 0 <= index < count:
+        raise ValueError(f"invalid shard {value}, k must be between 0 and n - 1")
+    return index, count
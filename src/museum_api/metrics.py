@@ -0,0 +1,353 @@
+"""
+    metrics module provides Metrics, a registry of counters, gauges and histograms telling
+    where a run spends its time: requests issued, bytes received, request latencies,
+    retries, cache hits, objects flattened and the time of each export. A run summary is
+    written as json, or in the Prometheus text format.
+
+    The clients and the converters record to default_metrics, which is disabled until
+    it is enabled, recording nothing and costing a check of a flag per call meanwhile::
+
+        default_metrics.enabled = True
+        ...
+        default_metrics.write_json('reports/metrics.json')
+"""
+import bisect
+import contextlib
+import functools
+import json
+import random
+import threading
+import time
+
+# upper bounds of the buckets of the histograms, in seconds.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# number of values a histogram keeps to work out its percentiles.
+RESERVOIR_SIZE = 10000
+# percentiles of the histograms in the run summary.
+PERCENTILES = (50, 90, 95, 99)
+# prefix of the names of the metrics in the Prometheus text format.
+PROMETHEUS_PREFIX = 'museum_api_'
+
+
+class Histogram:
+    """
+    Distribution of the values observed, e.g. the latencies of the requests. The values
+    are counted in buckets, and a uniform sample of RESERVOIR_SIZE of them is kept, so
+    the percentiles are exact up to RESERVOIR_SIZE values and estimated beyond.
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS, reservoir_size=RESERVOIR_SIZE):
+        """
+        :param buckets: sorted upper bounds of the buckets
+        :param reservoir_size: number of values kept for the percentiles
+        """
+        self.buckets = tuple(buckets)
+        # number of values of each bucket, the last one holding the values above the
+        # highest bound.
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+        self.reservoir_size = reservoir_size
+        self.samples = []
+        self.__random = random.Random(0)
+
+    def observe(self, value):
+        """
+        :param value: value observed
+        """
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+        if len(self.samples) < self.reservoir_size:
+            self.samples.append(value)
+        else:
+            # each value has the same chance of being in the sample.
+            position = self.__random.randrange(self.count)
+            if position < self.reservoir_size:
+                self.samples[position] = value
+
+    def percentile(self, percent):
+        """
+        :param percent: percentile between 0 and 100, e.g. 99
+        :return: smallest value greater than or equal to percent % of the values, None
+            if no value was observed
+        """
+        if not self.samples:
+            return None
+        samples = sorted(self.samples)
+        rank = max(1, -(-percent * len(samples) // 100))
+        return samples[min(int(rank), len(samples)) - 1]
+
+    def summary(self):
+        """
+        :return: dictionary of the count, sum, min, mean, max and percentiles
+        """
+        summary = {
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min,
+            'mean': self.sum / self.count if self.count else None,
+            'max': self.max,
+        }
+        summary.update((f'p{percent}', self.percentile(percent)) for percent in PERCENTILES)
+        return summary
+
+
+class Timer:
+    """
+    Context manager observing the seconds its block takes in a histogram.
+    """
+    def __init__(self, metrics, name, labels):
+        """
+        :param metrics: Metrics the time is recorded to
+        :param name: name of the histogram
+        :param labels: labels of the histogram
+        """
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.started = None
+        self.elapsed = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.elapsed = time.perf_counter() - self.started
+        self.metrics.observe(self.name, self.elapsed, **self.labels)
+
+
+class Metrics:
+    """
+    Registry of counters, gauges and histograms, each named and optionally labelled,
+    e.g. ``increment('requests', status=200)``. It can be shared between threads.
+
+    While disabled, nothing is recorded and timer returns a context manager doing
+    nothing.
+    """
+    def __init__(self, enabled=True, buckets=DEFAULT_BUCKETS):
+        """
+        :param enabled: if False, nothing is recorded until enabled is set
+        :param buckets: upper bounds of the buckets of the histograms
+        """
+        self.enabled = enabled
+        self.buckets = buckets
+        self.started_at = time.time()
+
+        self.__lock = threading.Lock()
+        # values of each series, keyed by (name, sorted tuple of the labels).
+        self.__counters = {}
+        self.__gauges = {}
+        self.__histograms = {}
+
+    def reset(self):
+        """
+        forgets every value recorded, starting a new run.
+        """
+        with self.__lock:
+            self.started_at = time.time()
+            self.__counters.clear()
+            self.__gauges.clear()
+            self.__histograms.clear()
+
+    def increment(self, name, value=1, **labels):
+        """
+        :param name: name of the counter
+        :param value: value added to the counter
+        :param labels: labels of the counter
+        """
+        if not self.enabled:
+            return
+        key = self.__key(name, labels)
+        with self.__lock:
+            self.__counters[key] = self.__counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        """
+        :param name: name of the gauge
+        :param value: current value of the gauge
+        :param labels: labels of the gauge
+        """
+        if not self.enabled:
+            return
+        with self.__lock:
+            self.__gauges[self.__key(name, labels)] = value
+
+    def observe(self, name, value, **labels):
+        """
+        :param name: name of the histogram
+        :param value: value observed, in seconds for timings
+        :param labels: labels of the histogram
+        """
+        if not self.enabled:
+            return
+        key = self.__key(name, labels)
+        with self.__lock:
+            histogram = self.__histograms.get(key)
+            if histogram is None:
+                histogram = self.__histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def timer(self, name, **labels):
+        """
+        times a block of code::
+
+            with metrics.timer('export_seconds', format='csv'):
+                ...
+
+        :param name: name of the histogram the seconds are observed in
+        :param labels: labels of the histogram
+        :return: context manager
+        """
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return Timer(self, name, labels)
+
+    def counter(self, name, **labels):
+        """
+        :return: value of a counter, 0 if it was never incremented
+        """
+        with self.__lock:
+            return self.__counters.get(self.__key(name, labels), 0)
+
+    def gauge(self, name, **labels):
+        """
+        :return: value of a gauge, None if it was never set
+        """
+        with self.__lock:
+            return self.__gauges.get(self.__key(name, labels))
+
+    def histogram(self, name, **labels):
+        """
+        :return: Histogram of the values observed, None if no value was observed
+        """
+        with self.__lock:
+            return self.__histograms.get(self.__key(name, labels))
+
+    def summary(self):
+        """
+        :return: dictionary of the run, holding the value of each counter and gauge and
+            the summary of each histogram, keyed by series, e.g. 'requests{status="200"}'
+        """
+        with self.__lock:
+            return {
+                'started_at': self.started_at,
+                'duration': time.time() - self.started_at,
+                'counters': {self.__series(*key): value
+                             for key, value in sorted(self.__counters.items())},
+                'gauges': {self.__series(*key): value
+                           for key, value in sorted(self.__gauges.items())},
+                'histograms': {self.__series(*key): histogram.summary()
+                               for key, histogram in sorted(self.__histograms.items())},
+            }
+
+    def write_json(self, path):
+        """
+        writes the summary of the run to a json file.
+
+        :param path: path of the json file
+        """
+        with open(path, 'w', encoding='utf-8') as file_ptr:
+            json.dump(self.summary(), file_ptr, indent=2)
+
+    def to_prometheus(self, prefix=PROMETHEUS_PREFIX):
+        """
+        :param prefix: prefix of the names of the metrics
+        :return: the metrics in the Prometheus text exposition format, counters being
+            suffixed with _total
+        """
+        lines = []
+        with self.__lock:
+            for suffix, kind, values in (('_total', 'counter', self.__counters),
+                                         ('', 'gauge', self.__gauges)):
+                for name, series in self.__by_name(values):
+                    lines.append(f'# TYPE {prefix}{name}{suffix} {kind}')
+                    lines.extend(f'{self.__series(prefix + name + suffix, labels)} {value}'
+                                 for labels, value in series)
+
+            for name, series in self.__by_name(self.__histograms):
+                name = prefix + name
+                lines.append(f'# TYPE {name} histogram')
+                for labels, histogram in series:
+                    cumulative = 0
+                    bounds = [*histogram.buckets, '+Inf']
+                    for bound, count in zip(bounds, histogram.bucket_counts):
+                        cumulative += count
+                        bucket_labels = labels + (('le', str(bound)),)
+                        lines.append(f'{self.__series(name + "_bucket", bucket_labels)} '
+                                     f'{cumulative}')
+                    lines.append(f'{self.__series(name + "_sum", labels)} {histogram.sum}')
+                    lines.append(f'{self.__series(name + "_count", labels)} '
+                                 f'{histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path, prefix=PROMETHEUS_PREFIX):
+        """
+        writes the metrics in the Prometheus text format, e.g. for the textfile
+        collector of the node exporter.
+
+        :param path: path of the file
+        :param prefix: prefix of the names of the metrics
+        """
+        with open(path, 'w', encoding='utf-8') as file_ptr:
+            file_ptr.write(self.to_prometheus(prefix))
+
+    @staticmethod
+    def __key(name, labels):
+        """
+        :return: (name, labels) key of a series, the labels being sorted and their values
+            strings, so that status=200 and status='200' are the same series
+        """
+        return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+    @staticmethod
+    def __by_name(values):
+        """
+        :param values: dictionary of (name, labels) to value
+        :return: list of (name, list of (labels, value)) tuples, sorted by name
+        """
+        names = {}
+        for (name, labels), value in sorted(values.items()):
+            names.setdefault(name, []).append((labels, value))
+        return list(names.items())
+
+    @staticmethod
+    def __series(name, labels):
+        """
+        :return: name of a series, e.g. requests{status="200"}
+        """
+        if not labels:
+            return name
+        escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+                   for _, value in labels)
+        return name + '{' + ','.join(f'{label}="{value}"'
+                                     for (label, _), value in zip(labels, escaped)) + '}'
+
+
+# registry the clients and the converters record to, disabled until it is enabled.
+default_metrics = Metrics(enabled=False)
+
+
+def timed(name, **labels):
+    """
+    decorator observing the seconds each call of a function takes in a histogram of
+    default_metrics, e.g. ``@timed('export_seconds', format='csv')``.
+
+    :param name: name of the histogram
+    :param labels: labels of the histogram
+    :return: decorator
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not default_metrics.enabled:
+                return function(*args, **kwargs)
+            with Timer(default_metrics, name, labels):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
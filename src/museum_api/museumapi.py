@@ -2,51 +2,283 @@
     This module provides MuseumAPI class, which allows the user to fetch the data from
     Museum api through methods. The user doesn't need to know the urls of Museum API.
 """
+import json
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date
+from urllib.parse import urlencode
+
 import requests
+from requests.adapters import HTTPAdapter
+
+from museum_api.metrics import default_metrics
+from museum_api.objectids import ObjectIDs, iter_object_ids
+from museum_api.ratelimit import RateLimiter, RetryPolicy
+
+BASE_URL = 'https://collectionapi.metmuseum.org'
+
+# (connect timeout, read timeout) in seconds used for every request.
+DEFAULT_TIMEOUT = (3.05, 30)
+
+# number of host pools and number of connections kept alive per host pool.
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+
+
+def object_ids_endpoint(metadata_date=None, department_ids=None):
+    """
+    builds the endpoint listing object ids, optionally filtered.
+
+    :param metadata_date: only list the objects updated since this date, a date,
+        datetime or YYYY-MM-DD string
+    :param department_ids: only list the objects of these departments
+    :return: endpoint with its query string
+    """
+    query = {}
+    if metadata_date is not None:
+        if isinstance(metadata_date, date):
+            metadata_date = metadata_date.strftime('%Y-%m-%d')
+        query['metadataDate'] = metadata_date
+    if department_ids:
+        query['departmentIds'] = '|'.join(str(department_id) for department_id in department_ids)
+
+    endpoint = '/public/collection/v1/objects'
+    if query:
+        endpoint += '?' + urlencode(query)
+    return endpoint
 
 
 class MuseumAPI:
     """
         MuseumAPI class allows you to easily get the objects from museum API through
         objects without knowing much details of the endpoints.
+
+        All requests go through a single keep-alive ``requests.Session`` owned by the
+        instance, so repeated calls reuse the same TCP/TLS connections. Use the
+        instance as a context manager (or call :meth:`close`) to release them::
+
+            with MuseumAPI(pool_maxsize=20) as m:
+                m.get_object_for_id(45734)
     """
-    def __init__(self):
-        self.base_url = 'https://collectionapi.metmuseum.org'
+    def __init__(self,
+                 base_url=BASE_URL,
+                 timeout=DEFAULT_TIMEOUT,
+                 pool_connections=DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 pool_block=False,
+                 session=None,
+                 rate_limiter=None,
+                 retry=None,
+                 cache=None,
+                 memory_cache=None,
+                 metrics=None):
+        """
+        :param base_url: base url of the museum api
+        :param timeout: timeout of each request in seconds, either a single number or a
+            (connect, read) tuple
+        :param pool_connections: number of host connection pools to cache
+        :param pool_maxsize: maximum number of keep-alive connections per host pool
+        :param pool_block: whether to block when the pool has no free connection instead
+            of opening a throwaway one
+        :param session: an existing requests.Session to use. It is not closed by
+            :meth:`close`, as it is owned by the caller.
+        :param rate_limiter: RateLimiter pacing the requests, pass the same instance to
+            several clients to share one budget. Defaults to the rate allowed by the api.
+        :param retry: RetryPolicy of the requests failing with a connection error or a
+            retryable status such as 429 or 503
+        :param cache: ResponseCache keeping the responses between runs. Stale responses
+            are revalidated, so unchanged records are not downloaded again.
+        :param memory_cache: MemoryCache memoizing get_object_for_id and
+            get_all_object_ids in process. Requests are cached by endpoint, regardless
+            of their headers.
+        :param metrics: Metrics the requests, bytes, latencies, retries and cache hits
+            are recorded to, default_metrics by default
+        """
+        self.base_url = base_url
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter()
+        self.retry = retry if retry is not None else RetryPolicy()
+        self.cache = cache
+        self.memory_cache = memory_cache
+        self.metrics = metrics if metrics is not None else default_metrics
 
-    def __fetch_response(self, endpoint, headers=None):
+        self.__owns_session = session is None
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_connections,
+                                  pool_maxsize=pool_maxsize,
+                                  pool_block=pool_block)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+        self.session = session
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        closes all the pooled connections of the session owned by this instance.
+        """
+        if self.__owns_session:
+            self.session.close()
+
+    def __fetch_response(self, endpoint, headers=None, stream=False):
         """
         :param endpoint: api endpoint
         :param headers: headers to be sent in request
+        :param stream: if True, the body is downloaded as it is read
         :return: Response object
         """
         url = self.base_url + endpoint
 
-        try:
-            response = requests.get(url, headers=headers)
-        except (requests.ConnectionError, requests.Timeout, requests.ConnectTimeout) as conn_error:
-            raise conn_error
-        except requests.HTTPError as http_error:
-            raise http_error
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            started = time.perf_counter()
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout,
+                                            stream=stream)
+            except (requests.ConnectionError, requests.Timeout) as error:
+                self.metrics.increment('request_errors', error=type(error).__name__)
+                if not self.retry.can_retry(attempt):
+                    raise
+                delay = self.retry.backoff(attempt)
+            else:
+                self.metrics.increment('requests', status=response.status_code)
+                # a body which is not streamed has been downloaded by now.
+                self.metrics.observe('request_seconds', time.perf_counter() - started)
+                if self.metrics.enabled and not stream:
+                    self.metrics.increment('bytes_received', len(response.content))
+                if not self.retry.should_retry_status(response.status_code, attempt):
+                    return response
+                delay = self.retry.backoff(attempt, response.headers.get('Retry-After'))
+                if response.status_code == 429:
+                    # the whole client is being throttled, not only this request.
+                    self.rate_limiter.pause(delay)
+                # releases the connection to the pool while waiting to retry.
+                response.close()
 
-        return response
+            self.metrics.increment('retries')
+            time.sleep(delay)
+            attempt += 1
 
-    def get_all_object_ids(self, headers=None):
+    def __fetch_json(self, endpoint, headers=None):
+        """
+        :param endpoint: api endpoint
+        :param headers: headers to be sent in request
+        :return: decoded json body of the response, None if response is not ok.
+        """
+        if self.memory_cache is None:
+            return self.__load_json(endpoint, headers)
+
+        loaded = []
+
+        def load():
+            loaded.append(endpoint)
+            return self.__load_json(endpoint, headers)
+
+        data = self.memory_cache.get_or_load(endpoint, load)
+        self.metrics.increment('cache_lookups', cache='memory',
+                               result='miss' if loaded else 'hit')
+        return data
+
+    def __load_json(self, endpoint, headers=None):
+        """
+        :param endpoint: api endpoint
+        :param headers: headers to be sent in request
+        :return: decoded json body of the response read from the response cache or
+            downloaded, None if response is not ok.
+        """
+        if self.cache is None:
+            response = self.__fetch_response(endpoint, headers)
+            if response.ok:
+                return response.json()
+            return None
+
+        url = self.base_url + endpoint
+        entry = self.cache.get(url)
+        if entry is not None:
+            if entry.is_fresh(self.cache.ttl):
+                self.metrics.increment('cache_lookups', cache='response', result='hit')
+                return json.loads(entry.body)
+            headers = dict(headers or {}, **entry.validators())
+
+        response = self.__fetch_response(endpoint, headers)
+        if response.status_code == 304 and entry is not None:
+            self.metrics.increment('cache_lookups', cache='response', result='revalidated')
+            self.cache.revalidated(url)
+            return json.loads(entry.body)
+        self.metrics.increment('cache_lookups', cache='response', result='miss')
+        if response.ok:
+            self.cache.set(url, response.content,
+                           response.headers.get('ETag'), response.headers.get('Last-Modified'))
+            return response.json()
+
+        return None
+
+    def get_all_object_ids(self, headers=None, metadata_date=None, department_ids=None,
+                           compact=False):
         """
         fetches all the object ids from the museum api.
 
         :param headers: headers to be sent in request
+        :param metadata_date: only fetch the ids of objects updated since this date, a
+            date, datetime or YYYY-MM-DD string
+        :param department_ids: only fetch the ids of objects of these departments
+        :param compact: return objectIDs as ObjectIDs, a numpy uint32 array taking about
+            8 times less memory than a list
         :return: a dictionary with following keys -:
         * total: int
             count of number of objects fetched from museum api
         * objectIds: list
             list of all the object ids fetched from in museum
         """
-        endpoint = '/public/collection/v1/objects'
-        response = self.__fetch_response(endpoint, headers)
-        if response.ok:
-            return response.json()
+        endpoint = object_ids_endpoint(metadata_date, department_ids)
+        response = self.__fetch_json(endpoint, headers)
+        if compact and response is not None:
+            response['objectIDs'] = ObjectIDs(response.get('objectIDs') or ())
+        return response
 
-        return None
+    def iter_all_object_ids(self, chunk_size=10000, headers=None, metadata_date=None,
+                            department_ids=None):
+        """
+        streams the object ids from the museum api, parsing them while the response is
+        still downloading. Memory stays flat whatever the size of the collection, and
+        the first ids can be fetched before the last ones arrive::
+
+            object_ids = itertools.chain.from_iterable(m.iter_all_object_ids())
+            for object_id, object_data in m.get_objects_for_ids(object_ids):
+                ...
+
+        The response is not stored in the caches.
+
+        :param chunk_size: number of ids per yielded chunk
+        :param headers: headers to be sent in request
+        :param metadata_date: only fetch the ids of objects updated since this date
+        :param department_ids: only fetch the ids of objects of these departments
+        :return: iterator of ObjectIDs of at most chunk_size ids, empty if the response
+            is not ok
+        """
+        endpoint = object_ids_endpoint(metadata_date, department_ids)
+        with self.__fetch_response(endpoint, headers, stream=True) as response:
+            if response.ok:
+                chunks = response.iter_content(chunk_size=64 * 1024)
+                if self.metrics.enabled:
+                    chunks = self.__count_bytes(chunks)
+                yield from iter_object_ids(chunks, chunk_size)
+
+    def __count_bytes(self, chunks):
+        """
+        :param chunks: iterator of the chunks of a streamed body
+        :return: iterator of the same chunks, their size being recorded as bytes received
+        """
+        for chunk in chunks:
+            self.metrics.increment('bytes_received', len(chunk))
+            yield chunk
 
     def get_object_for_id(self, object_id, headers=None):
         """
@@ -58,8 +290,72 @@ class MuseumAPI:
         """
 
         endpoint = f'/public/collection/v1/objects/{str(object_id)}'
-        response = self.__fetch_response(endpoint, headers)
-        if response.ok:
-            return response.json()
+        return self.__fetch_json(endpoint, headers)
 
-        return None
+    def invalidate(self, object_id=None):
+        """
+        forgets the cached copy of an object, or of every response, so it is downloaded
+        again on its next request.
+
+        :param object_id: object_id of the object, None to clear the caches
+        """
+        endpoint = None if object_id is None else f'/public/collection/v1/objects/{object_id}'
+        if self.memory_cache is not None:
+            self.memory_cache.invalidate(endpoint)
+        if self.cache is not None:
+            self.cache.invalidate(None if endpoint is None else self.base_url + endpoint)
+
+    def get_objects_for_ids(self, object_ids, max_workers=DEFAULT_POOL_MAXSIZE, ordered=True,
+                            headers=None):
+        """
+        fetches the objects for all the given object ids over a pool of threads. Results
+        are streamed back while the remaining ids are still being fetched, and a failed
+        request does not abort the rest of the batch.
+
+        :param object_ids: iterable of object ids, consumed lazily
+        :param max_workers: number of threads fetching objects at the same time. Keep it
+            at most pool_maxsize, so every thread can reuse a pooled connection.
+        :param ordered: if True, results are yielded in the order of object_ids,
+            otherwise in the order they complete
+        :param headers: headers to be sent in request
+        :return: iterator of (object_id, data) tuples. data is the dictionary returned by
+            get_object_for_id, or the exception raised while fetching that object.
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+
+        ids = iter(object_ids)
+        # ids submitted ahead of the consumer, bounded so huge id lists are not queued
+        # all at once.
+        window = max_workers * 2
+
+        def result_of(object_id, future):
+            error = future.exception()
+            return object_id, future.result() if error is None else error
+
+        def next_results():
+            if ordered:
+                return [result_of(*pending.popleft())]
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            return [result_of(pending.pop(future), future) for future in done]
+
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        pending = deque() if ordered else {}
+        try:
+            for object_id in ids:
+                future = executor.submit(self.get_object_for_id, object_id, headers)
+                if ordered:
+                    pending.append((object_id, future))
+                else:
+                    pending[future] = object_id
+
+                if len(pending) >= window:
+                    yield from next_results()
+
+            while pending:
+                yield from next_results()
+        finally:
+            futures = [future for _, future in pending] if ordered else list(pending)
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
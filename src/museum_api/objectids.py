@@ -0,0 +1,187 @@
+"""
+    objectids module provides ObjectIDs, a compact representation of the list of object
+    ids returned by the museum api, backed by a numpy uint32 array.
+"""
+from array import array
+
+import numpy as np
+
+# number of ids converted to python ints at once while iterating.
+ITER_CHUNK_SIZE = 4096
+
+
+class ObjectIDs:
+    """
+    Sequence of object ids stored in 4 bytes each, instead of a list of python ints
+    which takes about 8 times as much memory. Slicing returns views, and the set
+    operations used to compare harvests are vectorized::
+
+        object_ids = m.get_all_object_ids(compact=True)['objectIDs']
+        added, removed = object_ids.diff(ObjectIDs.load('ids.npy'))
+        my_share = object_ids.shard(0, 4)
+    """
+    def __init__(self, object_ids=()):
+        """
+        :param object_ids: iterable of object ids, or an existing numpy array
+        """
+        if isinstance(object_ids, np.ndarray):
+            self.array = object_ids.astype(np.uint32, copy=False)
+        elif isinstance(object_ids, ObjectIDs):
+            self.array = object_ids.array
+        else:
+            self.array = np.fromiter(object_ids, dtype=np.uint32)
+
+    @classmethod
+    def load(cls, path):
+        """
+        loads ids saved with :meth:`save`.
+
+        :param path: path of the .npy file
+        :return: ObjectIDs
+        """
+        return cls(np.load(path))
+
+    def save(self, path):
+        """
+        saves the ids to a .npy file, to compare them with a later harvest.
+
+        :param path: path of the .npy file
+        """
+        with open(path, 'wb') as file_ptr:
+            np.save(file_ptr, self.array)
+
+    @property
+    def nbytes(self):
+        """
+        number of bytes taken by the ids.
+        """
+        return self.array.nbytes
+
+    def __len__(self):
+        return len(self.array)
+
+    def __iter__(self):
+        # a chunk at a time, so that iterating doesn't hold a list of every id.
+        for start in range(0, len(self.array), ITER_CHUNK_SIZE):
+            yield from self.array[start:start + ITER_CHUNK_SIZE].tolist()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return ObjectIDs(self.array[index])
+        return int(self.array[index])
+
+    def __contains__(self, object_id):
+        return bool(np.any(self.array == object_id))
+
+    def __eq__(self, other):
+        if isinstance(other, ObjectIDs):
+            return np.array_equal(self.array, other.array)
+        return NotImplemented
+
+    def __repr__(self):
+        return f'ObjectIDs({len(self)} ids)'
+
+    def tolist(self):
+        """
+        :return: list of python ints
+        """
+        return self.array.tolist()
+
+    def to_array(self):
+        """
+        :return: the ids as an array('I') of the standard library
+        """
+        return array('I', self.array.astype(np.uintc, copy=False).tobytes())
+
+    def difference(self, other):
+        """
+        :param other: ObjectIDs or iterable of object ids
+        :return: sorted ObjectIDs of the ids which are not in other
+        """
+        return ObjectIDs(np.setdiff1d(self.array, ObjectIDs(other).array))
+
+    def diff(self, previous):
+        """
+        compares the ids with the ids of a previous harvest.
+
+        :param previous: ObjectIDs or iterable of object ids of the previous harvest
+        :return: (added, removed) tuple of sorted ObjectIDs
+        """
+        previous = ObjectIDs(previous)
+        return self.difference(previous), previous.difference(self)
+
+    def shard(self, index, count, method='modulo'):
+        """
+        splits the ids between workers.
+
+        :param index: index of the shard, from 0 to count - 1
+        :param count: number of shards
+        :param method: 'modulo' to take the ids equal to index modulo count, which
+            stays stable as ids are added, or 'range' to take a contiguous slice
+        :return: ObjectIDs of the shard
+        """
+        if not 0 <= index < count:
+            raise ValueError("index must be between 0 and count - 1")
+
+        if method == 'modulo':
+            return ObjectIDs(self.array[self.array % count == index])
+        if method == 'range':
+            return ObjectIDs(np.array_split(self.array, count)[index])
+
+        raise ValueError(f"unknown shard method {method}")
+
+
+def iter_object_ids(chunks, chunk_size=10000):
+    """
+    parses the objectIDs array of an object ids response incrementally, as its body is
+    being downloaded, so the ids can be used before the last byte arrives and the whole
+    body is never held in memory.
+
+    :param chunks: iterable of bytes making up the json body of the response
+    :param chunk_size: number of ids per yielded chunk
+    :return: iterator of ObjectIDs of at most chunk_size ids
+    """
+    key = b'"objectIDs"'
+    buffer = b''
+    state = 'key'
+    object_ids = []
+
+    for chunk in chunks:
+        buffer += chunk
+
+        if state == 'key':
+            index = buffer.find(key)
+            if index < 0:
+                # keep what could be the beginning of the key.
+                buffer = buffer[-(len(key) - 1):]
+                continue
+            buffer = buffer[index + len(key):]
+            state = 'value'
+
+        if state == 'value':
+            buffer = buffer.lstrip(b' \t\r\n:')
+            if not buffer:
+                continue
+            if not buffer.startswith(b'['):
+                # "objectIDs": null when no object matches.
+                return
+            buffer = buffer[1:]
+            state = 'array'
+
+        end = buffer.find(b']')
+        if end < 0:
+            # the last number may continue in the next chunk.
+            text, _, buffer = buffer.rpartition(b',')
+        else:
+            text, buffer = buffer[:end], b''
+
+        object_ids.extend(int(object_id) for object_id in text.split(b',') if object_id.strip())
+        while len(object_ids) >= chunk_size:
+            yield ObjectIDs(object_ids[:chunk_size])
+            del object_ids[:chunk_size]
+
+        if end >= 0:
+            break
+
+    if object_ids:
+        yield ObjectIDs(object_ids)
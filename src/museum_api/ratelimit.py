@@ -0,0 +1,166 @@
+"""
+    ratelimit module provides the client side throttling used by MuseumAPI and
+    AsyncMuseumAPI: a token bucket rate limiter shared by all the requests of a client,
+    and a retry policy with exponential backoff which honours Retry-After.
+"""
+import asyncio
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+# the museum api asks clients to stay under 80 requests per second.
+DEFAULT_RATE = 80
+DEFAULT_BURST = 80
+
+# http status codes worth retrying, 429 and 503 being the ones the api throttles with.
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class RateLimiter:
+    """
+    Token bucket allowing `rate` requests per second on average and up to `burst`
+    requests at once. It is thread safe and can be awaited from asyncio, so the same
+    instance can pace the sync, threaded and async fetch paths together.
+    """
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        """
+        :param rate: number of requests allowed per second
+        :param burst: number of requests allowed at once after being idle
+        """
+        if rate <= 0:
+            raise ValueError("rate must be greater than 0")
+        if burst < 1:
+            raise ValueError("burst must be at least 1")
+
+        self.rate = rate
+        self.burst = burst
+
+        self.__lock = threading.Lock()
+        self.__tokens = burst
+        # time the bucket was last refilled, in the future while the limiter is paused.
+        self.__updated = time.monotonic()
+
+    def __reserve(self):
+        """
+        takes a token, possibly from the future.
+
+        :return: seconds to wait before the reserved request may be sent
+        """
+        with self.__lock:
+            now = time.monotonic()
+            if now > self.__updated:
+                self.__tokens = min(self.burst,
+                                    self.__tokens + (now - self.__updated) * self.rate)
+                self.__updated = now
+            self.__tokens -= 1
+
+            wait = self.__updated - now
+            if self.__tokens < 0:
+                wait += -self.__tokens / self.rate
+            return wait
+
+    def acquire(self):
+        """
+        blocks the calling thread until a request may be sent.
+        """
+        wait = self.__reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """
+        waits, without blocking the event loop, until a request may be sent.
+        """
+        wait = self.__reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds):
+        """
+        holds back every request for the given time, used when the server reports
+        that the client is being throttled.
+
+        :param seconds: seconds from now during which no request is sent
+        """
+        with self.__lock:
+            # empty the bucket and only start refilling it once the pause is over, so
+            # the waiting requests resume at `rate` instead of all at once.
+            self.__tokens = min(self.__tokens, 0)
+            self.__updated = max(self.__updated, time.monotonic() + seconds)
+
+
+class RetryPolicy:
+    """
+    Decides whether a failed request is retried and how long to wait before it.
+    Backoff grows exponentially with full jitter, and a Retry-After header sent by the
+    server always takes precedence.
+    """
+    def __init__(self, max_retries=3, backoff_factor=0.5, max_backoff=60,
+                 statuses=RETRY_STATUSES):
+        """
+        :param max_retries: number of retries after the first attempt
+        :param backoff_factor: backoff of the first retry in seconds, doubled on every
+            following retry
+        :param max_backoff: upper bound of the backoff in seconds, Retry-After included
+        :param statuses: http status codes which are retried
+        """
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.statuses = tuple(statuses)
+
+    def can_retry(self, attempt):
+        """
+        :param attempt: number of attempts already retried
+        :return: True if another retry is allowed
+        """
+        return attempt < self.max_retries
+
+    def should_retry_status(self, status, attempt):
+        """
+        :param status: http status code of the response
+        :param attempt: number of attempts already retried
+        :return: True if the response must be retried
+        """
+        return status in self.statuses and self.can_retry(attempt)
+
+    def backoff(self, attempt, retry_after=None):
+        """
+        :param attempt: number of attempts already retried
+        :param retry_after: value of the Retry-After header of the response, if any
+        :return: seconds to wait before the next attempt, at most max_backoff even when
+            the server asks for longer
+        """
+        delay = parse_retry_after(retry_after)
+        if delay is not None:
+            return min(self.max_backoff, delay + random.uniform(0, self.backoff_factor))
+
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * 2 ** attempt))
+
+
+def parse_retry_after(value):
+    """
+    parses the value of a Retry-After header.
+
+    :param value: delay in seconds or an http date
+    :return: seconds to wait, None if the value is missing or invalid
+    """
+    if value is None:
+        return None
+
+    value = str(value).strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if retry_at is None:
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
@@ -0,0 +1,283 @@
+"""
+    report module provides HTMLReportWriter, which writes a report browsable page by page
+    instead of one html table holding every row: the rows are written to compact json
+    shards, and a small static page fetches and renders the pages of rows it shows.
+"""
+import errno
+import html
+import json
+import os
+import shutil
+
+from museum_api.streaming import StreamWriter
+
+# number of rows of each shard, which is also the number of rows of a page of the report.
+DEFAULT_PAGE_SIZE = 500
+# columns whose values are indexed, to filter and sort the rows without loading them.
+INDEX_COLUMNS = ('department', 'classification')
+
+# page of the report, which renders the rows of manifest.json with plain javascript.
+INDEX_TEMPLATE = '''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+  body {{ font-family: sans-serif; margin: 1em; }}
+  #controls > * {{ margin-right: 1em; }}
+  table {{ border-collapse: collapse; margin-top: 1em; font-size: 0.85em; }}
+  th, td {{ border: 1px solid #ccc; padding: 2px 6px; text-align: left; vertical-align: top; }}
+  th {{ background: #eee; position: sticky; top: 0; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+<div id="controls"></div>
+<table><thead></thead><tbody></tbody></table>
+<script>
+"use strict";
+const state = {{manifest: null, ids: [], page: 0, filters: {{}}, sort: '', descending: false,
+               shards: {{}}}};
+
+function element(tag, text) {{
+  const node = document.createElement(tag);
+  if (text !== undefined) node.textContent = text;
+  return node;
+}}
+
+function text(value) {{
+  if (value === null || value === undefined) return '';
+  return typeof value === 'object' ? JSON.stringify(value) : String(value);
+}}
+
+async function shard(number) {{
+  if (!(number in state.shards)) {{
+    state.shards[number] = fetch(state.manifest.shards[number]).then(response => response.json());
+  }}
+  return state.shards[number];
+}}
+
+// row numbers selected by the filters, in the order of the sort column, worked out from
+// the indexes without loading any row.
+function select() {{
+  const manifest = state.manifest;
+  let ids = null;
+  for (const [column, value] of Object.entries(state.filters)) {{
+    // null is "all", '' being the key of the rows without a value.
+    if (value === null) continue;
+    const matching = new Set(manifest.indexes[column][value] || []);
+    ids = ids === null ? matching : new Set([...ids].filter(id => matching.has(id)));
+  }}
+  if (state.sort === '') {{
+    ids = ids === null ? [...Array(manifest.count).keys()] : [...ids].sort((a, b) => a - b);
+  }} else {{
+    const keys = Object.keys(manifest.indexes[state.sort]).sort();
+    if (state.descending) keys.reverse();
+    const order = keys.flatMap(key => manifest.indexes[state.sort][key]);
+    ids = ids === null ? order : order.filter(id => ids.has(id));
+  }}
+  state.ids = ids;
+  state.page = 0;
+}}
+
+async function render() {{
+  const manifest = state.manifest;
+  const pageSize = manifest.pageSize;
+  const pages = Math.max(1, Math.ceil(state.ids.length / pageSize));
+  const ids = state.ids.slice(state.page * pageSize, (state.page + 1) * pageSize);
+  const shards = await Promise.all(ids.map(id => shard(Math.floor(id / pageSize))));
+  const tbody = document.querySelector('tbody');
+  tbody.replaceChildren(...ids.map((id, index) => {{
+    const row = shards[index][id % pageSize];
+    const tr = element('tr');
+    manifest.columns.forEach((column, number) => tr.appendChild(element('td', text(row[number]))));
+    return tr;
+  }}));
+  document.getElementById('position').textContent =
+    `page ${{state.page + 1}} of ${{pages}}, ${{state.ids.length}} rows`;
+}}
+
+function controls() {{
+  const manifest = state.manifest;
+  const div = document.getElementById('controls');
+  const update = () => {{ select(); render(); }};
+  for (const column of Object.keys(manifest.indexes)) {{
+    const menu = element('select');
+    menu.appendChild(new Option(`all ${{column}}`, ''));
+    for (const [key, ids] of Object.entries(manifest.indexes[column]).sort()) {{
+      menu.appendChild(new Option(`${{key || '(none)'}} (${{ids.length}})`, key));
+    }}
+    menu.onchange = () => {{
+      state.filters[column] = menu.selectedIndex === 0 ? null : menu.value;
+      update();
+    }};
+    div.appendChild(menu);
+  }}
+  const sort = element('select');
+  sort.appendChild(new Option('unsorted', ''));
+  for (const column of Object.keys(manifest.indexes)) {{
+    sort.appendChild(new Option(`by ${{column}}`, column));
+  }}
+  sort.onchange = () => {{ state.sort = sort.value; update(); }};
+  const descending = element('button', 'reverse');
+  descending.onclick = () => {{ state.descending = !state.descending; update(); }};
+  const previous = element('button', 'previous');
+  previous.onclick = () => {{ if (state.page > 0) {{ state.page -= 1; render(); }} }};
+  const next = element('button', 'next');
+  next.onclick = () => {{
+    if ((state.page + 1) * manifest.pageSize < state.ids.length) {{ state.page += 1; render(); }}
+  }};
+  const position = element('span');
+  position.id = 'position';
+  div.append(sort, descending, previous, next, position);
+
+  const tr = element('tr');
+  manifest.columns.forEach(column => tr.appendChild(element('th', column)));
+  document.querySelector('thead').appendChild(tr);
+}}
+
+fetch('manifest.json').then(response => response.json()).then(manifest => {{
+  state.manifest = manifest;
+  controls();
+  select();
+  render();
+}});
+</script>
+</body>
+</html>
+'''
+
+
+class HTMLReportWriter(StreamWriter):
+    """
+    Writes records to a report directory holding:
+
+    - shards/00000.json, ... a json array of the rows of each page, a row being the array
+      of its values in the order of the columns, so the keys are not repeated
+    - manifest.json, the columns, the shards and the indexes of INDEX_COLUMNS, which map
+      each value to the numbers of the rows holding it
+    - index.html, which fetches the shards of the rows it shows, filtering and sorting
+      them through the indexes
+
+    A shard is written as soon as it is full, only the indexes are kept in memory. The
+    report is fetched with javascript, so browsers only open it through http, e.g.
+    ``python3 -m http.server -d reports/museum_data``::
+
+        with HTMLReportWriter('reports/museum_data') as writer:
+            writer.write(flatten(obj, FLATTEN_KEYS) for obj in store.records())
+    """
+    def __init__(self, path, fieldnames=None, page_size=DEFAULT_PAGE_SIZE,
+                 index_columns=INDEX_COLUMNS, title='Museum API Report'):
+        """
+        :param path: output directory of the report, replaced if it exists. It can't be
+            an existing file.
+        :param fieldnames: names of the first columns
+        :param page_size: number of rows of each shard and page
+        :param index_columns: names of the columns whose values are indexed
+        :param title: title of the page
+        """
+        # the temporary and the previous reports are siblings of the report, even when
+        # path ends with a slash.
+        path = os.path.normpath(path)
+        if os.path.exists(path) and not os.path.isdir(path):
+            raise NotADirectoryError(errno.ENOTDIR, 'report path exists and is not a directory',
+                                     path)
+        super().__init__(path, fieldnames, None, page_size)
+        self.index_columns = index_columns
+        self.title = title
+        self.shards = []
+        # rows waiting for their shard to be full, as lists of values.
+        self.__rows = []
+        # row numbers of each value of the index columns.
+        self.indexes = {column: {} for column in index_columns}
+
+        if os.path.exists(self.tmp_path):
+            shutil.rmtree(self.tmp_path)
+        os.makedirs(os.path.join(self.tmp_path, 'shards'))
+
+    def write_chunk(self, chunk):
+        names = list(self.fieldnames)
+        for number, record in enumerate(chunk, self.count):
+            for column, index in self.indexes.items():
+                value = record.get(column)
+                # NaN is the only value which is not equal to itself.
+                key = '' if value is None or value != value else str(value)
+                index.setdefault(key, []).append(number)
+
+        self.__rows.extend([self.__value(record.get(name)) for name in names]
+                           for record in chunk)
+        # the rows of a page are always in the same shard, whatever the chunks written.
+        while len(self.__rows) >= self.chunk_size:
+            self.__write_shard(self.__rows[:self.chunk_size])
+            del self.__rows[:self.chunk_size]
+
+    def __write_shard(self, rows):
+        """
+        writes the next shard.
+
+        :param rows: list of rows, a list of values each
+        """
+        shard = f'shards/{len(self.shards):05d}.json'
+        with open(os.path.join(self.tmp_path, shard), 'w', encoding='utf-8') as file_ptr:
+            json.dump(rows, file_ptr, ensure_ascii=False, separators=(',', ':'), default=str)
+        self.shards.append(shard)
+
+    @staticmethod
+    def __value(value):
+        """
+        :return: value as json can hold it, NaN being null
+        """
+        if isinstance(value, float) and value != value:
+            return None
+        return value
+
+    def close(self):
+        if self.__rows:
+            self.__write_shard(self.__rows)
+            self.__rows = []
+
+        manifest = {
+            'columns': list(self.fieldnames),
+            'count': self.count,
+            'pageSize': self.chunk_size,
+            'shards': self.shards,
+            'indexes': self.indexes,
+        }
+        with open(os.path.join(self.tmp_path, 'manifest.json'), 'w',
+                  encoding='utf-8') as file_ptr:
+            json.dump(manifest, file_ptr, ensure_ascii=False, separators=(',', ':'))
+        with open(os.path.join(self.tmp_path, 'index.html'), 'w', encoding='utf-8') as file_ptr:
+            file_ptr.write(INDEX_TEMPLATE.format(title=html.escape(self.title)))
+
+        # the previous report is only removed once the new one is in place.
+        old_path = self.path + '.old'
+        if os.path.exists(old_path):
+            shutil.rmtree(old_path)
+        if os.path.exists(self.path):
+            os.replace(self.path, old_path)
+        try:
+            os.replace(self.tmp_path, self.path)
+        except OSError:
+            if os.path.exists(old_path):
+                os.replace(old_path, self.path)
+            raise
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    def abort(self):
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+
+
+def write_html_report(records, path, fieldnames=None, page_size=DEFAULT_PAGE_SIZE,
+                      index_columns=INDEX_COLUMNS):
+    """
+    writes records to a paginated html report without holding them in memory.
+
+    :param records: iterable of dictionaries, e.g. a generator
+    :param path: output directory of the report
+    :param fieldnames: names of the first columns
+    :param page_size: number of rows of each shard and page
+    :param index_columns: names of the columns whose values are indexed
+    :return: number of records written
+    """
+    with HTMLReportWriter(path, fieldnames, page_size, index_columns) as writer:
+        return writer.write(records)
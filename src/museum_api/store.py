@@ -0,0 +1,235 @@
+"""
+    store module provides ObjectStore, a local SQLite store of objects which answers
+    queries on their department, classification, dates, ... offline, through secondary
+    indexes, instead of downloading the objects again.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from itertools import islice
+
+from museum_api.utils import flatten_objects
+
+# fields of the objects stored in indexed columns of their own, with their SQLite types.
+INDEXED_FIELDS = {
+    'department': 'TEXT',
+    'classification': 'TEXT',
+    'culture': 'TEXT',
+    'objectBeginDate': 'INTEGER',
+    'objectEndDate': 'INTEGER',
+    'isPublicDomain': 'INTEGER',
+    'artistDisplayName': 'TEXT',
+}
+# number of objects upserted in a transaction.
+DEFAULT_BATCH_SIZE = 1000
+
+
+class ObjectStore:
+    """
+    SQLite store of objects, as returned by get_object_for_id or flattened. The whole
+    object is kept as json, and the fields of INDEXED_FIELDS are copied to indexed
+    columns, so that queries only read the objects they return::
+
+        with ObjectStore('store/objects.sqlite') as store:
+            store.upsert(object_data for _, object_data in m.get_objects_for_ids(ids))
+            paintings = store.dataframe(department='Asian Art', classification='Paintings',
+                                        isPublicDomain=True, date_range=(1600, 1700))
+            Converter.convert_to_csv(paintings, 'reports/paintings.csv')
+
+    A store can be shared between threads. Upserts are written a batch per transaction,
+    and with the database in WAL mode, other connections keep reading while they are.
+    """
+    def __init__(self, path, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        :param path: path of the SQLite database, created if it doesn't exist
+        :param batch_size: number of objects upserted in a transaction
+        """
+        self.path = path
+        self.batch_size = batch_size
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self.__lock = threading.Lock()
+        self.__connection = sqlite3.connect(path, check_same_thread=False)
+        self.__connection.execute('PRAGMA journal_mode=WAL')
+        self.__connection.execute('PRAGMA synchronous=NORMAL')
+        with self.__connection:
+            self.__connection.execute(
+                'CREATE TABLE IF NOT EXISTS objects ('
+                ' object_id INTEGER PRIMARY KEY,'
+                + ''.join(f' {field} {kind},' for field, kind in INDEXED_FIELDS.items()) +
+                ' data TEXT NOT NULL,'
+                ' updated_at REAL NOT NULL)'
+            )
+            for field in INDEXED_FIELDS:
+                self.__connection.execute(
+                    f'CREATE INDEX IF NOT EXISTS objects_{field} ON objects ({field})'
+                )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        closes the database.
+        """
+        with self.__lock:
+            self.__connection.close()
+
+    def upsert(self, objects):
+        """
+        inserts objects, replacing the stored objects with the same objectID. The objects
+        are written batch_size at a time, each batch in a single transaction.
+
+        :param objects: iterable of objects, e.g. a generator. What isn't an object, like
+            the None or the exceptions get_objects_for_ids yields for the objects it could
+            not fetch, is skipped.
+        :return: number of objects written
+        """
+        count = 0
+        objects = (obj for obj in objects if isinstance(obj, dict))
+        while True:
+            batch = list(islice(objects, self.batch_size))
+            if not batch:
+                return count
+
+            now = time.time()
+            rows = [(obj['objectID'],
+                     *(self.__column(obj.get(field)) for field in INDEXED_FIELDS),
+                     json.dumps(obj), now) for obj in batch]
+            with self.__lock, self.__connection:
+                self.__connection.executemany(
+                    f'INSERT INTO objects (object_id, {", ".join(INDEXED_FIELDS)}, data,'
+                    f' updated_at) VALUES ({", ".join("?" * (len(INDEXED_FIELDS) + 3))})'
+                    ' ON CONFLICT (object_id) DO UPDATE SET '
+                    + ', '.join(f'{name} = excluded.{name}'
+                                for name in (*INDEXED_FIELDS, 'data', 'updated_at')),
+                    rows
+                )
+            count += len(batch)
+
+    def delete(self, object_ids):
+        """
+        removes objects, e.g. the ones removed from the museum api.
+
+        :param object_ids: iterable of the ids of the objects
+        """
+        with self.__lock, self.__connection:
+            self.__connection.executemany('DELETE FROM objects WHERE object_id = ?',
+                                          [(int(object_id),) for object_id in object_ids])
+
+    def get(self, object_id):
+        """
+        :param object_id: id of the object
+        :return: the stored object, None if there is none
+        """
+        with self.__lock:
+            row = self.__connection.execute('SELECT data FROM objects WHERE object_id = ?',
+                                            (int(object_id),)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def query(self, date_range=None, limit=None, **fields):
+        """
+        returns the objects matching every condition, e.g.
+        ``query(department='Asian Art', isPublicDomain=True, date_range=(1600, 1700))``
+
+        :param date_range: (start, end) tuple, to only return the objects made between
+            start and end, i.e. objectBeginDate >= start and objectEndDate <= end. Either
+            can be None.
+        :param limit: maximum number of objects returned
+        :param fields: values of the fields of INDEXED_FIELDS the objects must have. A list
+            or tuple of values matches any of them, None matches missing values.
+        :return: iterator of the objects, in object id order
+        """
+        where, params = self.__where(date_range, fields)
+        query = f'SELECT data FROM objects{where} ORDER BY object_id'
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(limit)
+
+        with self.__lock:
+            cursor = self.__connection.execute(query, params)
+        return self.__fetch(cursor)
+
+    def __fetch(self, cursor):
+        """
+        :return: iterator of the objects of the rows of cursor, fetched batch_size at a time
+        """
+        while True:
+            with self.__lock:
+                rows = cursor.fetchmany(self.batch_size)
+            if not rows:
+                return
+            for (data,) in rows:
+                yield json.loads(data)
+
+    def count(self, date_range=None, **fields):
+        """
+        :param date_range: (start, end) tuple of the dates the objects were made between
+        :param fields: values of the fields of INDEXED_FIELDS the objects must have
+        :return: number of objects matching every condition, counted from the indexes
+        """
+        where, params = self.__where(date_range, fields)
+        with self.__lock:
+            return self.__connection.execute(f'SELECT COUNT(*) FROM objects{where}',
+                                             params).fetchone()[0]
+
+    def dataframe(self, date_range=None, limit=None, **fields):
+        """
+        :return: DataFrame of the objects matching every condition, flattened with
+            flatten_objects so that it can be passed to the Converter exports
+        """
+        return flatten_objects(self.query(date_range, limit, **fields))
+
+    def __len__(self):
+        return self.count()
+
+    @staticmethod
+    def __column(value):
+        """
+        :return: value as stored in its column, empty strings being missing values
+        """
+        if value == '':
+            return None
+        if isinstance(value, bool):
+            return int(value)
+        return value
+
+    def __where(self, date_range, fields):
+        """
+        :return: (WHERE clause, list of parameters) tuple of the conditions
+        """
+        conditions = []
+        params = []
+        for field, value in fields.items():
+            if field not in INDEXED_FIELDS:
+                raise ValueError(f"{field} is not indexed, expected one of "
+                                 f"{', '.join(INDEXED_FIELDS)}")
+            values = [self.__column(value)
+                      for value in (value if isinstance(value, (list, tuple)) else [value])]
+            placeholders = ', '.join('?' * len(values))
+            if None in values:
+                values = [value for value in values if value is not None]
+                placeholders = ', '.join('?' * len(values))
+                conditions.append(f'({field} IS NULL OR {field} IN ({placeholders}))')
+            else:
+                conditions.append(f'{field} IN ({placeholders})')
+            params.extend(values)
+
+        if date_range is not None:
+            start, end = date_range
+            if start is not None:
+                conditions.append('objectBeginDate >= ?')
+                params.append(start)
+            if end is not None:
+                conditions.append('objectEndDate <= ?')
+                params.append(end)
+
+        where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+        return where, params
@@ -0,0 +1,509 @@
+"""
+    streaming module provides writers which export records to csv, newline-delimited
+    json, xlsx and xml as they are produced, a chunk at a time, so memory stays flat whatever
+    the size of the collection.
+"""
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from itertools import islice
+
+from lxml import etree
+
+# number of records formatted and written at once.
+DEFAULT_CHUNK_SIZE = 10000
+COMPRESSIONS = (None, 'gzip', 'zstd')
+# maximum number of rows of an excel sheet, header included.
+EXCEL_MAX_ROWS = 1048576
+# types of the values of a column which pandas reads as floats if a value is missing.
+NUMERIC_TYPES = {'int', 'float'}
+
+
+def open_output(path, compression=None, binary=False):
+    """
+    opens a text file for writing, compressing what is written to it.
+
+    :param path: path of the file
+    :param compression: None, 'gzip' or 'zstd'. zstd needs the zstandard package.
+    :param binary: if True, the file is opened for writing bytes
+    :return: file object
+    """
+    if binary:
+        if compression is None:
+            return open(path, 'wb')
+        if compression == 'gzip':
+            return gzip.open(path, 'wb')
+    if compression is None:
+        return open(path, 'w', encoding='utf-8', newline='')
+    if compression == 'gzip':
+        return gzip.open(path, 'wt', encoding='utf-8', newline='')
+    if compression == 'zstd':
+        try:
+            import zstandard  # pylint: disable=import-outside-toplevel
+        except ImportError as error:
+            raise ImportError("zstd compression needs the zstandard package, install it "
+                              "with pip install zstandard") from error
+        if binary:
+            return zstandard.open(path, 'wb')
+        return zstandard.open(path, 'w', encoding='utf-8', newline='')
+
+    raise ValueError(f"unknown compression {compression}, expected gzip or zstd")
+
+
+def iter_chunks(records, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    :param records: iterable of records, consumed lazily
+    :param chunk_size: number of records per chunk
+    :return: iterator of lists of at most chunk_size records
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class StreamWriter:
+    """
+    Base class of the streaming writers. The columns are the keys of the records in the
+    order they first appear: a key seen for the first time adds a column after the
+    existing ones, so the columns of the records already written never move.
+
+    The file is written next to path and moved in place once complete, so an export
+    which dies halfway doesn't leave a truncated file behind::
+
+        with CSVStreamWriter('reports/museum_data.csv.gz', compression='gzip') as writer:
+            writer.write(flatten(obj, FLATTEN_KEYS) for obj in store.records())
+    """
+    def __init__(self, path, fieldnames=None, compression=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        :param path: output path of the file
+        :param fieldnames: names of the first columns, the other keys of the records
+            being added after them
+        :param compression: None, 'gzip' or 'zstd'
+        :param chunk_size: number of records formatted and written at once
+        """
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"unknown compression {compression}, expected gzip or zstd")
+
+        self.path = path
+        self.compression = compression
+        self.chunk_size = chunk_size
+        # ordered set of the column names.
+        self.fieldnames = dict.fromkeys(fieldnames or ())
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    @property
+    def tmp_path(self):
+        """
+        path of the file being written, until it is complete.
+        """
+        return self.path + '.tmp'
+
+    def write(self, records):
+        """
+        writes records, chunk_size at a time. Can be called several times.
+
+        :param records: iterable of dictionaries, e.g. a generator
+        :return: number of records written so far
+        """
+        for chunk in iter_chunks(records, self.chunk_size):
+            for record in chunk:
+                self.fieldnames.update(dict.fromkeys(record))
+            self.write_chunk(chunk)
+            self.count += len(chunk)
+        return self.count
+
+    def write_chunk(self, chunk):
+        """
+        writes a list of records, implemented by the subclasses.
+
+        :param chunk: list of dictionaries
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        completes the file and moves it to path.
+        """
+        raise NotImplementedError
+
+    def abort(self):
+        """
+        removes the incomplete file.
+        """
+        raise NotImplementedError
+
+
+class CSVStreamWriter(StreamWriter):
+    """
+    Writes records to a csv file. The rows are written to a temporary file while the
+    header may still grow, and copied after the header when the writer is closed.
+    """
+    def __init__(self, path, fieldnames=None, compression=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+        super().__init__(path, fieldnames, compression, chunk_size)
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.__rows = tempfile.TemporaryFile('w+', encoding='utf-8', newline='',
+                                             dir=directory)
+        self.__writer = csv.writer(self.__rows)
+        # number of columns of the last rows written, and whether the header grew after
+        # rows were written, which leaves these rows short of its last columns.
+        self.__width = None
+        self.__grown = False
+
+    def write_chunk(self, chunk):
+        names = list(self.fieldnames)
+        if self.__width is not None and self.__width < len(names):
+            self.__grown = True
+        self.__width = len(names)
+        self.__writer.writerows([[record.get(name) for name in names] for record in chunk])
+
+    def close(self):
+        names = list(self.fieldnames)
+        self.__rows.seek(0)
+        with open_output(self.tmp_path, self.compression) as file_ptr:
+            writer = csv.writer(file_ptr)
+            writer.writerow(names)
+            if not self.__grown:
+                shutil.copyfileobj(self.__rows, file_ptr)
+            else:
+                # the short rows are padded with empty columns.
+                for chunk in iter_chunks(csv.reader(self.__rows), self.chunk_size):
+                    writer.writerows([row + [''] * (len(names) - len(row)) for row in chunk])
+        self.__rows.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self.__rows.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class JSONLStreamWriter(StreamWriter):
+    """
+    Writes records to a newline-delimited json file, a record per line. The keys of a
+    record are written in the order of the columns, the keys it doesn't have being null.
+    """
+    def __init__(self, path, fieldnames=None, compression=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+        super().__init__(path, fieldnames, compression, chunk_size)
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.__file = open_output(self.tmp_path, compression)
+
+    def write_chunk(self, chunk):
+        names = list(self.fieldnames)
+        self.__file.write(''.join(
+            json.dumps({name: record.get(name) for name in names}, ensure_ascii=False,
+                       default=str) + '\n'
+            for record in chunk
+        ))
+
+    def close(self):
+        self.__file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self.__file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class XLSXStreamWriter(StreamWriter):
+    """
+    Writes records to an xlsx workbook with openpyxl's write-only mode, which writes the
+    rows out as they are added instead of keeping every cell of the workbook in memory.
+    Like the csv writer, the rows wait in a temporary file while the header may still
+    grow. A sheet full at max_rows is continued on a new sheet, Sheet2, Sheet3, ...
+    with the header repeated.
+
+    Lists and dictionaries are written as their text, NaN as an empty cell.
+    """
+    def __init__(self, path, fieldnames=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                 max_rows=EXCEL_MAX_ROWS, styled=False):
+        """
+        :param path: output path of the workbook
+        :param fieldnames: names of the first columns
+        :param chunk_size: number of records formatted and written at once
+        :param max_rows: number of rows of a sheet, header included, after which the
+            rows are continued on a new sheet
+        :param styled: if True, the header cells are bold like pandas writes them.
+            Styling every cell is slower, so by default the values are written as they are.
+        """
+        if max_rows < 2:
+            raise ValueError("max_rows must be at least 2")
+
+        super().__init__(path, fieldnames, None, chunk_size)
+        self.max_rows = max_rows
+        self.styled = styled
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # rows are kept as json arrays, which keep numbers and booleans as they are.
+        self.__rows = tempfile.TemporaryFile('w+', encoding='utf-8', dir=directory)
+
+    @staticmethod
+    def __cell(value):
+        """
+        :return: value as openpyxl can write it
+        """
+        if isinstance(value, (list, dict)):
+            return str(value)
+        # NaN is the only value which is not equal to itself.
+        if isinstance(value, float) and value != value:
+            return None
+        return value
+
+    def write_chunk(self, chunk):
+        names = list(self.fieldnames)
+        self.__rows.write(''.join(
+            json.dumps([self.__cell(record.get(name)) for name in names],
+                       ensure_ascii=False, default=str) + '\n'
+            for record in chunk
+        ))
+
+    def close(self):
+        # imported here so that openpyxl is only needed by the excel exports.
+        from openpyxl import Workbook  # pylint: disable=import-outside-toplevel
+        from openpyxl.cell import WriteOnlyCell  # pylint: disable=import-outside-toplevel
+        from openpyxl.styles import Font  # pylint: disable=import-outside-toplevel
+
+        names = list(self.fieldnames)
+        workbook = Workbook(write_only=True)
+        font = Font(bold=True)
+
+        def new_sheet():
+            sheet = workbook.create_sheet(f'Sheet{len(workbook.worksheets) + 1}')
+            if not self.styled:
+                sheet.append(names)
+                return sheet
+            header = []
+            for name in names:
+                # styled cells belong to a sheet.
+                cell = WriteOnlyCell(sheet, value=name)
+                cell.font = font
+                header.append(cell)
+            sheet.append(header)
+            return sheet
+
+        sheet = None
+        sheet_rows = self.max_rows
+        self.__rows.seek(0)
+        for line in self.__rows:
+            if sheet_rows == self.max_rows:
+                sheet = new_sheet()
+                sheet_rows = 1
+            row = json.loads(line)
+            # rows written before the header grew are short of its last columns.
+            sheet.append(row + [None] * (len(names) - len(row)))
+            sheet_rows += 1
+        if sheet is None:
+            new_sheet()
+
+        workbook.save(self.tmp_path)
+        self.__rows.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self.__rows.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class XMLStreamWriter(StreamWriter):
+    """
+    Writes records to an xml file with the layout of DataFrame.to_xml, a row element per
+    record with an element per column, serializing a record at a time with lxml's
+    incremental writer instead of building the tree of the whole file. Missing values are
+    empty elements, and like pandas, the integers of a column with missing values or
+    floats are written as floats.
+
+    The columns are only known once every record has been seen, so the records wait in a
+    temporary file until the writer is closed.
+
+    With nested, dictionaries and lists are written as child elements rather than as
+    their text, a list item being named after the singular of its list, e.g.::
+
+        <constituents>
+          <constituent>
+            <constituentID>164292</constituentID>
+            ...
+    """
+    def __init__(self, path, fieldnames=None, compression=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE, nested=False, root_name='data',
+                 row_name='row'):
+        """
+        :param path: output path of the xml file
+        :param fieldnames: names of the first columns
+        :param compression: None, 'gzip' or 'zstd'
+        :param chunk_size: number of records formatted and written at once
+        :param nested: if True, dictionaries and lists are written as child elements
+        :param root_name: name of the root element
+        :param row_name: name of the element of each record
+        """
+        super().__init__(path, fieldnames, compression, chunk_size)
+        self.nested = nested
+        self.root_name = root_name
+        self.row_name = row_name
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.__records = tempfile.TemporaryFile('w+', encoding='utf-8', dir=directory)
+        # names of the types of the values of each column, and number of values of each
+        # column, which is short of the number of records if some don't have a value.
+        self.__types = {}
+        self.__values = {}
+
+    @staticmethod
+    def __is_missing(value):
+        # NaN is the only value which is not equal to itself.
+        return value is None or isinstance(value, float) and value != value
+
+    def write_chunk(self, chunk):
+        for record in chunk:
+            for name, value in record.items():
+                if not self.__is_missing(value):
+                    self.__types.setdefault(name, set()).add(type(value).__name__)
+                    self.__values[name] = self.__values.get(name, 0) + 1
+        self.__records.write(''.join(
+            json.dumps(record, ensure_ascii=False, default=str) + '\n' for record in chunk
+        ))
+
+    def __text(self, value, as_float):
+        """
+        :return: text of value as pandas writes it, None if it is missing or empty
+        """
+        if self.__is_missing(value) or value == '':
+            return None
+        if as_float and isinstance(value, int) and not isinstance(value, bool):
+            return str(float(value))
+        return str(value)
+
+    def __element(self, parent, name, value, as_float=False):
+        """
+        adds the element of value to parent.
+        """
+        element = etree.SubElement(parent, name)
+        if self.nested and isinstance(value, dict):
+            for key, child in value.items():
+                self.__element(element, key, child)
+        elif self.nested and isinstance(value, list):
+            item_name = name[:-1] if len(name) > 1 and name.endswith('s') else 'item'
+            for child in value:
+                self.__element(element, item_name, child)
+        else:
+            element.text = self.__text(value, as_float)
+
+    def close(self):
+        names = list(self.fieldnames)
+        as_float = {name for name, types in self.__types.items() if types <= NUMERIC_TYPES
+                    and ('float' in types or self.__values[name] < self.count)}
+
+        self.__records.seek(0)
+        with open_output(self.tmp_path, self.compression, binary=True) as file_ptr:
+            file_ptr.write(b"<?xml version='1.0' encoding='utf-8'?>\n")
+            with etree.xmlfile(file_ptr, encoding='utf-8') as xml_file:
+                with xml_file.element(self.root_name):
+                    for line in self.__records:
+                        record = json.loads(line)
+                        row = etree.Element(self.row_name)
+                        for name in names:
+                            self.__element(row, name, record.get(name), name in as_float)
+                        etree.indent(row, space='  ', level=1)
+                        xml_file.write('\n  ', row)
+                    xml_file.write('\n')
+            file_ptr.write(b'\n')
+        self.__records.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self.__records.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def write_csv(records, path, fieldnames=None, compression=None,
+              chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    writes records to a csv file without holding them in memory.
+
+    :param records: iterable of dictionaries, e.g. a generator
+    :param path: output path of the csv
+    :param fieldnames: names of the first columns
+    :param compression: None, 'gzip' or 'zstd'
+    :param chunk_size: number of records formatted and written at once
+    :return: number of records written
+    """
+    with CSVStreamWriter(path, fieldnames, compression, chunk_size) as writer:
+        return writer.write(records)
+
+
+def write_jsonl(records, path, fieldnames=None, compression=None,
+                chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    writes records to a newline-delimited json file without holding them in memory.
+
+    :param records: iterable of dictionaries, e.g. a generator
+    :param path: output path of the json file
+    :param fieldnames: names of the first keys of each record
+    :param compression: None, 'gzip' or 'zstd'
+    :param chunk_size: number of records formatted and written at once
+    :return: number of records written
+    """
+    with JSONLStreamWriter(path, fieldnames, compression, chunk_size) as writer:
+        return writer.write(records)
+
+
+def write_xlsx(records, path, fieldnames=None, chunk_size=DEFAULT_CHUNK_SIZE,
+               max_rows=EXCEL_MAX_ROWS, styled=False):
+    """
+    writes records to an xlsx workbook without holding them in memory.
+
+    :param records: iterable of dictionaries, e.g. a generator
+    :param path: output path of the workbook
+    :param fieldnames: names of the first columns
+    :param chunk_size: number of records formatted and written at once
+    :param max_rows: number of rows of a sheet, header included
+    :param styled: if True, the header cells are bold
+    :return: number of records written
+    """
+    with XLSXStreamWriter(path, fieldnames, chunk_size, max_rows, styled) as writer:
+        return writer.write(records)
+
+
+def write_xml(records, path, fieldnames=None, compression=None,
+              chunk_size=DEFAULT_CHUNK_SIZE, nested=False):
+    """
+    writes records to an xml file without holding them in memory.
+
+    :param records: iterable of dictionaries, e.g. a generator
+    :param path: output path of the xml file
+    :param fieldnames: names of the first columns
+    :param compression: None, 'gzip' or 'zstd'
+    :param chunk_size: number of records formatted and written at once
+    :param nested: if True, dictionaries and lists are written as child elements
+    :return: number of records written
+    """
+    with XMLStreamWriter(path, fieldnames, compression, chunk_size, nested) as writer:
+        return writer.write(records)
@@ -0,0 +1,113 @@
+"""
+    sync module provides IncrementalSync, which only fetches the objects updated since the
+    previous run by filtering the object ids on their metadataDate.
+"""
+import json
+import os
+from datetime import date, datetime
+
+from museum_api.museumapi import DEFAULT_POOL_MAXSIZE
+
+
+class SyncState:
+    """
+    Watermark of the last successful sync, persisted in a json file.
+    """
+    def __init__(self, path):
+        """
+        :param path: path of the json file, created on first save
+        """
+        self.path = path
+
+    def load(self):
+        """
+        :return: date of the last successful sync, None if there was none
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file_ptr:
+                state = json.load(file_ptr)
+        except FileNotFoundError:
+            return None
+
+        return datetime.strptime(state['last_sync'], '%Y-%m-%d').date()
+
+    def save(self, last_sync):
+        """
+        atomically replaces the stored watermark.
+
+        :param last_sync: date of the sync which just completed
+        """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file_ptr:
+            json.dump({'last_sync': last_sync.strftime('%Y-%m-%d')}, file_ptr)
+        os.replace(tmp_path, self.path)
+
+
+class IncrementalSync:
+    """
+    Fetches the objects updated since the watermark of the previous sync, or every
+    object on the first sync. The watermark only moves forward once all the changed
+    objects have been fetched, so an interrupted sync is simply run again.
+
+    ::
+
+        with MuseumAPI() as m:
+            sync = IncrementalSync(m, 'state/sync.json')
+            changes = list(sync.run())
+            dataset = merge_objects(dataset, changes)
+    """
+    def __init__(self, museum_api, state_path, department_ids=None):
+        """
+        :param museum_api: MuseumAPI used to fetch the objects
+        :param state_path: path of the json file keeping the watermark
+        :param department_ids: only sync the objects of these departments
+        """
+        self.museum_api = museum_api
+        self.state = SyncState(state_path)
+        self.department_ids = department_ids
+
+    def changed_object_ids(self, since=None):
+        """
+        :param since: date to list the changes from, defaults to the stored watermark
+        :return: ObjectIDs of the objects updated since the date, or of every object if
+            there was no previous sync
+        """
+        if since is None:
+            since = self.state.load()
+
+        response = self.museum_api.get_all_object_ids(metadata_date=since,
+                                                      department_ids=self.department_ids,
+                                                      compact=True)
+        if response is None:
+            return None
+
+        return response['objectIDs']
+
+    def run(self, since=None, max_workers=DEFAULT_POOL_MAXSIZE):
+        """
+        fetches the objects updated since the previous sync, and moves the watermark to
+        the day this sync started once every object has been fetched.
+
+        :param since: date to sync the changes from, defaults to the stored watermark
+        :param max_workers: number of threads fetching objects at the same time
+        :return: iterator of (object_id, data) tuples as yielded by
+            MuseumAPI.get_objects_for_ids. data is None for objects which no longer exist.
+        """
+        # changes made while this sync runs are picked up again by the next one.
+        started_on = date.today()
+
+        object_ids = self.changed_object_ids(since)
+        if object_ids is None:
+            raise ConnectionError("could not fetch the changed object ids")
+
+        failed = False
+        for object_id, data in self.museum_api.get_objects_for_ids(object_ids,
+                                                                   max_workers=max_workers):
+            failed = failed or isinstance(data, Exception)
+            yield object_id, data
+
+        if not failed:
+            self.state.save(started_on)
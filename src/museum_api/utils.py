@@ -3,11 +3,75 @@
     form to another.
 """
 
+import atexit
+import datetime
+import errno
+import io
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import chain, islice, repeat
 
 import pandas as pd
 import pdfkit
+from pypdf import PdfWriter
+
+from museum_api.metrics import default_metrics, timed
+from museum_api.report import DEFAULT_PAGE_SIZE, write_html_report
+from museum_api.streaming import write_xlsx, write_xml
+
+# keys of the lists of dictionaries of an object which are flattened by default.
+FLATTEN_KEYS = ('constituents', 'measurements', 'tags')
+# number of objects converted to a DataFrame at once by flatten_objects.
+DEFAULT_CHUNK_SIZE = 10000
+# formats Converter.export writes, and the Converter method writing each of them.
+EXPORT_FORMATS = {
+    'csv': 'convert_to_csv',
+    'xlsx': 'convert_to_excel',
+    'html': 'convert_to_html',
+    'xml': 'convert_to_xml',
+    'pdf': 'convert_to_pdf',
+    'parquet': 'convert_to_parquet',
+    'feather': 'convert_to_feather',
+}
+# dtypes of the fields written to the columnar formats, so that they don't depend on
+# the values of a particular harvest.
+COLUMN_TYPES = {
+    'objectID': 'Int64',
+    'isHighlight': 'boolean',
+    'isPublicDomain': 'boolean',
+    'isTimelineWork': 'boolean',
+    'objectBeginDate': 'Int64',
+    'objectEndDate': 'Int64',
+    'constituentID': 'Int64',
+}
+# fields holding dates, stored as UTC timestamps.
+DATE_COLUMNS = ('metadataDate',)
+# low-cardinality fields, stored dictionary encoded.
+DICTIONARY_COLUMNS = ('department', 'classification', 'culture', 'objectName', 'repository')
+# number of rows of the table rendered on each page of the pdf.
+PDF_ROWS_PER_PAGE = 25
+# wkhtmltopdf options of the pages of the pdf, in millimetres. The pages are as wide as
+# the table of every column, only its rows being split across pages.
+PDF_OPTIONS = {
+    'page-height': '2500',
+    'page-width': '1270',
+    'encoding': 'UTF-8',
+    'quiet': '',
+}
+# number of rotated log files kept, when the logs are rotated.
+LOG_BACKUP_COUNT = 5
+# attributes every log record has, the other ones being the extra fields of a record.
+LOG_RECORD_ATTRIBUTES = frozenset(logging.makeLogRecord({}).__dict__) | {'message', 'asctime'}
+
+# handler and queue listener setup_logger registered for each logger, and the settings
+# they were registered with.
+log_handlers = {}
+log_handlers_lock = threading.Lock()
 
 
 class Converter:
@@ -16,108 +80,219 @@ class Converter:
     """
 
     @staticmethod
-    def convert_to_pdf(list_of_dicts, path):
+    def export(list_of_dicts, paths, max_workers=None, use_processes=False):
         """
-        Converts list of dictionary objects to pdf
+        Converts list of dictionary objects to several formats at once. The DataFrame is
+        built once and shared by the writers, which run in parallel.
+
+        :param list_of_dicts: list containing dictionary objects, or a DataFrame built
+            with flatten_objects
+        :param paths: dictionary of format to output path, the formats being the keys
+            of EXPORT_FORMATS, e.g. {'csv': 'reports/museum_data.csv'}
+        :param max_workers: number of formats written at the same time, all of them by
+            default
+        :param use_processes: if True, the writers run in worker processes instead of
+            threads. Writers such as excel and xml spend most of their time in python
+            code, which threads run one at a time.
+            The export times are then recorded to the metrics of the worker processes.
+        """
+        if list_of_dicts is None:
+            raise TypeError("list_of_dicts cannot be None")
+
+        if not isinstance(list_of_dicts, pd.DataFrame) and \
+                (not isinstance(list_of_dicts, list) or not isinstance(list_of_dicts[0], dict)):
+            raise TypeError("list_of_dicts must be a list of dictionaries or a DataFrame")
+
+        unknown = set(paths) - set(EXPORT_FORMATS)
+        if unknown:
+            raise ValueError(f"unknown formats {', '.join(sorted(unknown))}, expected "
+                             f"{', '.join(EXPORT_FORMATS)}")
+
+        dataframe = pd.DataFrame(data=list_of_dicts)
+        executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        with executor_class(max_workers=max_workers or max(len(paths), 1)) as executor:
+            futures = [executor.submit(getattr(Converter, EXPORT_FORMATS[file_format]),
+                                       dataframe, path)
+                       for file_format, path in paths.items()]
+
+        # every writer has finished, the first error is raised.
+        for future in futures:
+            future.result()
+
+    @staticmethod
+    @timed('export_seconds', format='pdf')
+    def convert_to_pdf(list_of_dicts, path, rows_per_page=PDF_ROWS_PER_PAGE, max_workers=None,
+                       options=None):
+        """
+        Converts list of dictionary objects to pdf. The rows are split into pages which
+        wkhtmltopdf renders in parallel from memory, and the pages are merged into the pdf.
 
-        :param list_of_dicts: list containing dictionary objects
+        :param list_of_dicts: list containing dictionary objects, or a DataFrame built
+            once with flatten_objects and shared between the conversions
         :param path: output path of the generated pdf
+        :param rows_per_page: number of rows of the table rendered on each page
+        :param max_workers: maximum number of pages rendered at once, wkhtmltopdf
+            running in a process of its own for each of them
+        :param options: wkhtmltopdf options overriding PDF_OPTIONS
         """
         if list_of_dicts is None:
             raise TypeError("list_of_dicts cannot be None")
 
-        if not isinstance(list_of_dicts, list) or not isinstance(list_of_dicts[0], dict):
-            raise TypeError("list_of_dicts must be a list of dictionaries")
+        if not isinstance(list_of_dicts, pd.DataFrame) and \
+                (not isinstance(list_of_dicts, list) or not isinstance(list_of_dicts[0], dict)):
+            raise TypeError("list_of_dicts must be a list of dictionaries or a DataFrame")
 
         if path is None:
             raise TypeError("path cannot be None")
 
-        if not os.path.exists(path):
-            raise FileNotFoundError(f'File {path} not found')
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.isdir(directory):
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), directory)
+
+        if rows_per_page < 1:
+            raise ValueError("rows_per_page must be at least 1")
 
         dataframe = pd.DataFrame(data=list_of_dicts)
-        tmp_html_filename = 'tmp.html'
-        dataframe.to_html(tmp_html_filename)
-        pdfkit.from_file(tmp_html_filename, output_path=path, options={
-            'page-height': '2500',
-            'page-width': '1270',
-        })
-        os.remove(tmp_html_filename)
+        pages = [dataframe.iloc[start:start + rows_per_page]
+                 for start in range(0, max(len(dataframe), 1), rows_per_page)]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            documents = list(executor.map(Converter.__render_pdf, pages,
+                                          repeat({**PDF_OPTIONS, **(options or {})})))
+
+        writer = PdfWriter()
+        for document in documents:
+            writer.append(io.BytesIO(document))
+        with open(path, 'wb') as file_ptr:
+            writer.write(file_ptr)
+
+    @staticmethod
+    def __render_pdf(dataframe, options):
+        """
+        renders a table to pdf, the html being passed to wkhtmltopdf through its standard
+        input rather than through a file shared with the other renderings.
+
+        :param dataframe: rows of a page
+        :param options: wkhtmltopdf options
+        :return: pdf bytes
+        """
+        return pdfkit.from_string(dataframe.to_html(), False, options=options)
 
     @staticmethod
-    def convert_to_xml(list_of_dicts, path):
+    @timed('export_seconds', format='xml')
+    def convert_to_xml(list_of_dicts, path, nested=False):
         """
         Converts list of dictionary objects to xml
 
-        :param list_of_dicts: list containing dictionary objects
+        :param list_of_dicts: list containing dictionary objects, or a DataFrame built
+            once with flatten_objects and shared between the conversions
         :param path: output path of the generated xml
+        :param nested: if True, nested dictionaries and lists are written as child
+            elements rather than as their text
         """
         if list_of_dicts is None:
             raise TypeError("list_of_dicts cannot be None")
 
-        if not isinstance(list_of_dicts, list) or not isinstance(list_of_dicts[0], dict):
-            raise TypeError("list_of_dicts must be a list of dictionaries")
+        if not isinstance(list_of_dicts, pd.DataFrame) and \
+                (not isinstance(list_of_dicts, list) or not isinstance(list_of_dicts[0], dict)):
+            raise TypeError("list_of_dicts must be a list of dictionaries or a DataFrame")
 
         if path is None:
             raise TypeError("path cannot be None")
 
-        dataframe = pd.DataFrame(data=list_of_dicts)
-        dataframe.to_xml(path, index=False)
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.isdir(directory):
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), directory)
+
+        # the records are serialized one at a time rather than building the tree of the
+        # whole document like DataFrame.to_xml does.
+        if isinstance(list_of_dicts, pd.DataFrame):
+            write_xml(Converter.__records(list_of_dicts), path,
+                      fieldnames=list(list_of_dicts.columns), nested=nested)
+        else:
+            write_xml(list_of_dicts, path, nested=nested)
 
     @staticmethod
-    def convert_to_html(list_of_dicts, path):
+    @timed('export_seconds', format='html')
+    def convert_to_html(list_of_dicts, path, paginated=False, page_size=DEFAULT_PAGE_SIZE):
         """
         Converts list of dictionary objects to html
 
-        :param list_of_dicts: list containing dictionary objects
-        :param path: output path of the generated html
+        :param list_of_dicts: list containing dictionary objects, or a DataFrame built
+            once with flatten_objects and shared between the conversions
+        :param path: output path of the generated html, or with paginated, of the
+            directory of the report
+        :param paginated: if True, writes a report whose page loads the rows a page at a
+            time from json shards, instead of a table of every row, see HTMLReportWriter
+        :param page_size: number of rows of a page of the paginated report
         """
         if list_of_dicts is None:
             raise TypeError("list_of_dicts cannot be None")
 
-        if not isinstance(list_of_dicts, list) or not isinstance(list_of_dicts[0], dict):
-            raise TypeError("list_of_dicts must be a list of dictionaries")
+        if not isinstance(list_of_dicts, pd.DataFrame) and \
+                (not isinstance(list_of_dicts, list) or not isinstance(list_of_dicts[0], dict)):
+            raise TypeError("list_of_dicts must be a list of dictionaries or a DataFrame")
 
         if path is None:
             raise TypeError("path cannot be None")
 
+        if paginated:
+            if isinstance(list_of_dicts, pd.DataFrame):
+                write_html_report(Converter.__records(list_of_dicts), path,
+                                  fieldnames=list(list_of_dicts.columns), page_size=page_size)
+            else:
+                write_html_report(list_of_dicts, path, page_size=page_size)
+            return
+
         dataframe = pd.DataFrame(data=list_of_dicts)
         dataframe.to_html(path, index=False)
 
     @staticmethod
-    def convert_to_excel(list_of_dicts, path):
+    @timed('export_seconds', format='xlsx')
+    def convert_to_excel(list_of_dicts, path, write_only=False):
         """
         Converts list of dictionary objects to excel
 
-        :param list_of_dicts: list containing dictionary objects
+        :param list_of_dicts: list containing dictionary objects, or a DataFrame built
+            once with flatten_objects and shared between the conversions
         :param path: output path of the generated excel
+        :param write_only: if True, the rows are written with openpyxl's write-only mode
+            in constant memory, and continued on a new sheet past the row limit of excel.
+            Much faster for large exports, the header is not styled.
         """
         if list_of_dicts is None:
             raise TypeError("list_of_dicts cannot be None")
 
-        if not isinstance(list_of_dicts, list) or not isinstance(list_of_dicts[0], dict):
-            raise TypeError("list_of_dicts must be a list of dictionaries")
+        if not isinstance(list_of_dicts, pd.DataFrame) and \
+                (not isinstance(list_of_dicts, list) or not isinstance(list_of_dicts[0], dict)):
+            raise TypeError("list_of_dicts must be a list of dictionaries or a DataFrame")
 
         if path is None:
             raise TypeError("path cannot be None")
 
         dataframe = pd.DataFrame(data=list_of_dicts)
+        if write_only:
+            write_xlsx(Converter.__records(dataframe), path,
+                       fieldnames=list(dataframe.columns))
+            return
         dataframe.to_excel(path, index=False)
 
     @staticmethod
+    @timed('export_seconds', format='csv')
     def convert_to_csv(list_of_dicts, path):
         """
         Converts list of dictionary objects to csv
 
-        :param list_of_dicts: list containing dictionary objects
+        :param list_of_dicts: list containing dictionary objects, or a DataFrame built
+            once with flatten_objects and shared between the conversions
         :param field_names: list of names of the fields
         :param path: output path of the generated csv
         """
         if list_of_dicts is None:
             raise TypeError("list_of_dicts cannot be None")
 
-        if not isinstance(list_of_dicts, list) or not isinstance(list_of_dicts[0], dict):
-            raise TypeError("list_of_dicts must be a list of dictionaries")
+        if not isinstance(list_of_dicts, pd.DataFrame) and \
+                (not isinstance(list_of_dicts, list) or not isinstance(list_of_dicts[0], dict)):
+            raise TypeError("list_of_dicts must be a list of dictionaries or a DataFrame")
 
         if path is None:
             raise TypeError("path cannot be None")
@@ -131,6 +306,90 @@ class Converter:
         #         d = {key: value for key, value in obj.items() if key in field_names}
         #         writer.writerow(d)
 
+    @staticmethod
+    @timed('export_seconds', format='parquet')
+    def convert_to_parquet(list_of_dicts, path, partition_cols=None):
+        """
+        Converts list of dictionary objects to parquet, a columnar format which reloads
+        and filters much faster than the text formats. Needs the pyarrow package.
+
+        :param list_of_dicts: list containing dictionary objects, or a DataFrame built
+            once with flatten_objects and shared between the conversions
+        :param path: output path of the generated parquet file, or directory when the
+            data is partitioned
+        :param partition_cols: names of the columns to partition the data by, e.g.
+            ['department'] to write a file per department
+        """
+        if list_of_dicts is None:
+            raise TypeError("list_of_dicts cannot be None")
+
+        if not isinstance(list_of_dicts, pd.DataFrame) and \
+                (not isinstance(list_of_dicts, list) or not isinstance(list_of_dicts[0], dict)):
+            raise TypeError("list_of_dicts must be a list of dictionaries or a DataFrame")
+
+        if path is None:
+            raise TypeError("path cannot be None")
+
+        dataframe = Converter.typed_dataframe(list_of_dicts)
+        dataframe.to_parquet(path, index=False, partition_cols=partition_cols)
+
+    @staticmethod
+    @timed('export_seconds', format='feather')
+    def convert_to_feather(list_of_dicts, path):
+        """
+        Converts list of dictionary objects to feather, the arrow ipc file format, which
+        can be memory mapped when reloaded. Needs the pyarrow package.
+
+        :param list_of_dicts: list containing dictionary objects, or a DataFrame built
+            once with flatten_objects and shared between the conversions
+        :param path: output path of the generated feather file
+        """
+        if list_of_dicts is None:
+            raise TypeError("list_of_dicts cannot be None")
+
+        if not isinstance(list_of_dicts, pd.DataFrame) and \
+                (not isinstance(list_of_dicts, list) or not isinstance(list_of_dicts[0], dict)):
+            raise TypeError("list_of_dicts must be a list of dictionaries or a DataFrame")
+
+        if path is None:
+            raise TypeError("path cannot be None")
+
+        dataframe = Converter.typed_dataframe(list_of_dicts)
+        dataframe.to_feather(path)
+
+    @staticmethod
+    def __records(dataframe):
+        """
+        :param dataframe: DataFrame
+        :return: iterator of the rows of dataframe as dictionaries of python values
+            rather than numpy ones, converted a chunk at a time
+        """
+        return chain.from_iterable(
+            dataframe.iloc[start:start + DEFAULT_CHUNK_SIZE].to_dict('records')
+            for start in range(0, len(dataframe), DEFAULT_CHUNK_SIZE)
+        )
+
+    @staticmethod
+    def typed_dataframe(list_of_dicts):
+        """
+        builds a DataFrame with the types of COLUMN_TYPES, DATE_COLUMNS as timestamps and
+        DICTIONARY_COLUMNS as categoricals, which the columnar formats store dictionary
+        encoded.
+
+        :param list_of_dicts: list containing dictionary objects, or a DataFrame
+        :return: DataFrame
+        """
+        dataframe = pd.DataFrame(data=list_of_dicts)
+        types = {name: dtype for name, dtype in COLUMN_TYPES.items()
+                 if name in dataframe.columns}
+        types.update({name: 'category' for name in DICTIONARY_COLUMNS
+                      if name in dataframe.columns})
+        dataframe = dataframe.astype(types)
+        for name in DATE_COLUMNS:
+            if name in dataframe.columns:
+                dataframe[name] = pd.to_datetime(dataframe[name], utc=True, errors='coerce')
+        return dataframe
+
 
 def flatten(obj, keys):
     """
@@ -150,25 +409,302 @@ def flatten(obj, keys):
     return obj
 
 
+def flatten_objects(objects, keys=FLATTEN_KEYS, dtypes=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    flattens a batch of objects the same way as flatten, straight into the columns of a
+    DataFrame. The objects are not modified and no flattened copy of them is made. They
+    are consumed chunk_size at a time, so once a chunk is in the DataFrame its objects
+    can be freed, and a harvest of 100k+ objects never has to be held as a list.
+
+    :param objects: iterable of objects to be flattened, e.g. HarvestStore.records()
+    :param keys: list of keys whose lists of dictionaries are flattened
+    :param dtypes: dictionary of column name to dtype, so columns keep the same dtype
+        across batches even when a batch has no value for them
+    :param chunk_size: number of objects converted at once
+    :return: DataFrame with a row for each object, its columns in the same order as
+        pandas would put them for the list of flattened objects
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+
+    # ordered set of the column names, in the order they appear in the objects.
+    names = {}
+    # shapes of the objects already seen, as tuples of their keys and of the keys of
+    # the dictionaries their lists flatten to.
+    shapes = set()
+
+    def merge(values):
+        if not values:
+            return None
+        if len(values) == 1:
+            return values[0]
+        # later values overwrite the previous ones, like flatten.
+        merged = {}
+        for value in values:
+            merged.update(value)
+        return merged
+
+    def add_names(chunk, groups):
+        # objects returned by the api share a handful of shapes, so the column order is
+        # only worked out once per shape. The shapes are listed in the order they appear.
+        group_shapes = [[group if group is None else tuple(group) for group in row_groups]
+                        for row_groups in groups]
+        chunk_shapes = dict.fromkeys(zip(map(tuple, chunk), *group_shapes))
+
+        top_names = {}
+        group_names = [{} for _ in keys]
+        for obj_names, *row_groups in chunk_shapes:
+            top_names.update(dict.fromkeys(obj_names))
+            for row_group, sub_names in zip(row_groups, group_names):
+                sub_names.update(dict.fromkeys(row_group or ()))
+
+            if (obj_names, *row_groups) in shapes:
+                continue
+            shapes.add((obj_names, *row_groups))
+
+            flattened = [key for key, group in zip(keys, row_groups) if group is not None]
+            for name in obj_names:
+                if name not in flattened:
+                    names.setdefault(name)
+            for row_group in row_groups:
+                for name in row_group or ():
+                    names.setdefault(name)
+
+        return list(top_names), [list(sub_names) for sub_names in group_names]
+
+    def flatten_chunk(chunk):
+        # for each key, the dictionary its list flattens to in each object, None when
+        # the list is empty and the key is kept as is.
+        groups = [[merge(obj.get(key)) for obj in chunk] for key in keys]
+        top_names, group_names = add_names(chunk, groups)
+
+        # naming the columns saves pandas from collecting the keys of every object.
+        frame = pd.DataFrame(chunk, columns=top_names)
+        for key, group, sub_names in zip(keys, groups, group_names):
+            if key in frame.columns:
+                frame[key] = frame[key].mask([row_group is not None for row_group in group])
+
+            group_frame = pd.DataFrame([row_group or {} for row_group in group],
+                                       columns=sub_names)
+            for name in sub_names:
+                if name in frame.columns:
+                    present = [row_group is not None and name in row_group
+                               for row_group in group]
+                    frame[name] = group_frame[name].where(present, frame[name])
+                else:
+                    frame[name] = group_frame[name]
+        return frame
+
+    objects = iter(objects)
+    frames = []
+    while True:
+        chunk = list(islice(objects, chunk_size))
+        if not chunk:
+            break
+        # only the flattening is timed, not the time the objects take to be read.
+        with default_metrics.timer('flatten_seconds'):
+            frames.append(flatten_chunk(chunk))
+        default_metrics.increment('objects_flattened', len(chunk))
+
+    if not frames:
+        return pd.DataFrame()
+
+    histogram = default_metrics.histogram('flatten_seconds')
+    if default_metrics.enabled and histogram is not None and histogram.sum:
+        default_metrics.set_gauge('objects_flattened_per_second',
+                                  default_metrics.counter('objects_flattened') / histogram.sum)
+
+    dataframe = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+    # chunks may have inferred different dtypes for a column, e.g. int64 and object.
+    dataframe = dataframe.reindex(columns=list(names)).infer_objects()
+    if dtypes:
+        dataframe = dataframe.astype({name: dtype for name, dtype in dtypes.items()
+                                      if name in dataframe.columns})
+    return dataframe
+
+
+def merge_objects(list_of_dicts, changes, key='objectID'):
+    """
+    updates an existing dataset with the objects fetched by an incremental sync, instead
+    of rebuilding it from scratch.
+
+    :param list_of_dicts: existing list of dictionary objects
+    :param changes: iterable of (object_id, obj) tuples, as yielded by
+        IncrementalSync.run. obj replaces the object with the same key, is appended if
+        it is new, and removes it if it is None. Exceptions are ignored, so the
+        existing object is kept.
+    :param key: name of the key identifying an object
+    :return: new list of dictionary objects, in the order of the existing dataset
+    """
+    merged = {obj[key]: obj for obj in list_of_dicts}
+    for object_id, obj in changes:
+        if isinstance(obj, Exception):
+            continue
+        if obj is None:
+            merged.pop(object_id, None)
+        else:
+            merged[object_id] = obj
+    return list(merged.values())
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formats log records as json lines, with their extra fields::
+
+        logger.error('fetch failed', extra={'objectID': 436535})
+        {"time": "2026-10-18T10:15:03.120+00:00", "level": "ERROR", "logger": "main",
+         "message": "fetch failed", "objectID": 436535}
+    """
+    def format(self, record):
+        data = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        data.update((key, value) for key, value in record.__dict__.items()
+                    if key not in LOG_RECORD_ATTRIBUTES)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exception'] = record.exc_text
+        if record.stack_info:
+            data['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+    def formatTime(self, record, datefmt=None):
+        if datefmt is not None:
+            return super().formatTime(record, datefmt)
+        return datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc) \
+            .isoformat(timespec='milliseconds')
+
+
+class LogQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler which leaves the formatting to the handler of the listener, instead of
+    formatting records in the thread logging them. Only the message and the traceback are
+    rendered beforehand, as their arguments may change or be gone by the time the
+    listener handles the record. The record is not copied, which takes a good part of the
+    time of a call: the other handlers format it the same way from the rendered message
+    and traceback.
+    """
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(
+                record.exc_info
+            )
+            record.exc_info = None
+        return record
+
+
+def stop_loggers():
+    """
+    removes the handlers setup_logger added, stopping their queue listeners once the
+    records queued are written, and closes their files. Called when the interpreter exits.
+    """
+    with log_handlers_lock:
+        for name in list(log_handlers):
+            remove_handler(name)
+
+
+def stop_logger(module_name):
+    """
+    removes the handler setup_logger added for a module, stopping its queue listener once
+    the records queued are written, and closes its file. The handlers of the other
+    modules are left as they are.
+
+    :param module_name: name of the module the logger was set up for
+    """
+    with log_handlers_lock:
+        if module_name in log_handlers:
+            remove_handler(module_name)
+
+
+def remove_handler(name):
+    """
+    removes the handler setup_logger registered for a logger, log_handlers_lock being held.
+
+    :param name: name of the logger
+    """
+    _, handler, listener = log_handlers.pop(name)
+    logging.getLogger(name).removeHandler(handler)
+    if listener is None:
+        handler.close()
+    else:
+        listener.stop()
+        for file_handler in listener.handlers:
+            file_handler.close()
+
+
+atexit.register(stop_loggers)
+
+
 def setup_logger(module_name,
                  log_file,
                  log_format=logging.Formatter('%(asctime)s %(levelname)s %(message)s'),
-                 level=logging.INFO):
+                 level=logging.INFO,
+                 queued=False,
+                 max_bytes=None,
+                 when=None,
+                 backup_count=LOG_BACKUP_COUNT,
+                 json_format=False):
     """
-    for setting up multiple loggers easily
+    for setting up multiple loggers easily. Calling it again for the same module replaces
+    the handler it added, so records are never written twice.
+
+    With queued, logging a record only puts it on a queue, and a QueueListener thread
+    writes the records to the file, so that threads logging at the same time don't wait
+    for each other's writes.
 
     :param module_name: name of the module to generate logs for
-    :param log_file: path of the file to generate the logs
+    :param log_file: path of the file to generate the logs, its directory being created
+        if it doesn't exist
     :param log_format: format of the log
     :param level: log level
+    :param queued: if True, the records are written by a listener thread
+    :param max_bytes: size in bytes the file is rotated at
+    :param when: interval the file is rotated at, e.g. 'midnight' or 'H', see
+        TimedRotatingFileHandler
+    :param backup_count: number of rotated files kept
+    :param json_format: if True, the records are written as json lines, with their extra
+        fields, instead of with log_format
     :return:
     """
+    if max_bytes is not None and when is not None:
+        raise ValueError('the logs are rotated either at max_bytes or when, not both')
 
-    handler = logging.FileHandler(log_file)
-    handler.setFormatter(log_format)
-
+    log_file = os.path.abspath(log_file)
+    settings = (log_file, log_format, queued, max_bytes, when, backup_count, json_format)
     logger = logging.getLogger(module_name)
     logger.setLevel(level)
-    logger.addHandler(handler)
+
+    with log_handlers_lock:
+        if module_name in log_handlers:
+            if log_handlers[module_name][0] == settings:
+                return logger
+            remove_handler(module_name)
+
+        # the directory of the logs is created, as it isn't part of the tree.
+        os.makedirs(os.path.dirname(log_file), exist_ok=True)
+        if max_bytes is not None:
+            handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=max_bytes,
+                                                           backupCount=backup_count)
+        elif when is not None:
+            handler = logging.handlers.TimedRotatingFileHandler(log_file, when=when,
+                                                                backupCount=backup_count)
+        else:
+            handler = logging.FileHandler(log_file)
+        handler.setFormatter(JSONFormatter() if json_format else log_format)
+
+        listener = None
+        if queued:
+            listener = logging.handlers.QueueListener(queue.SimpleQueue(), handler)
+            handler = LogQueueHandler(listener.queue)
+            listener.start()
+
+        logger.addHandler(handler)
+        log_handlers[module_name] = (settings, handler, listener)
 
     return logger
@@ -0,0 +1,228 @@
+"""
+    Local stand-in for the museum api, used by the tests which need a real http server.
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+OBJECT_RESP_PATH = os.path.join(os.path.abspath(os.path.dirname(__file__)),
+                                'correct_data/object_resp.json')
+
+# values the fields of the synthetic objects are picked from.
+DEPARTMENTS = ('The American Wing', 'Asian Art', 'Egyptian Art', 'European Paintings',
+               'Drawings and Prints', 'Arms and Armor', 'Greek and Roman Art')
+CLASSIFICATIONS = ('', 'Paintings', 'Prints', 'Ceramics', 'Sculpture', 'Textiles', 'Metalwork')
+CULTURES = ('', 'American', 'China', 'Japan', 'French', 'Egyptian', 'Roman')
+# connections waiting to be accepted, well above the default of 5, as connections
+# beyond it may stall for a second on SYN retransmits when many clients connect at once.
+REQUEST_QUEUE_SIZE = 128
+TAGS = ('Birds', 'Flowers', 'Portraits', 'Landscapes', 'Men', 'Women', 'Horses')
+
+
+def synthetic_object(template, object_id):
+    """
+    builds an object shaped like the template, whose department, classification, dates,
+    constituents, measurements and tags vary with its id, the same way on every call.
+
+    :param template: object record, e.g. correct_data/object_resp.json
+    :param object_id: id of the object
+    :return: object record
+    """
+    rng = random.Random(object_id)
+    begin_date = rng.randint(-2000, 1950)
+    constituents = [dict(constituent, constituentID=rng.randint(1, 10 ** 6),
+                         name=f"{constituent['name']} {rng.randint(1, 1000)}")
+                    for constituent in (template['constituents'] or ()) * rng.randint(0, 2)]
+    measurements = None
+    if rng.random() < 0.5:
+        measurements = [{'elementName': 'Overall', 'elementDescription': None,
+                         'elementMeasurements': {'Height': round(rng.uniform(1, 200), 1),
+                                                 'Width': round(rng.uniform(1, 200), 1)}}]
+    tags = [{'term': term, 'AAT_URL': None, 'Wikidata_URL': None}
+            for term in rng.sample(TAGS, rng.randint(0, 3))] or None
+
+    return dict(template,
+                objectID=object_id,
+                title=f"{template['title']} {object_id}",
+                isHighlight=rng.random() < 0.05,
+                isPublicDomain=rng.random() < 0.7,
+                department=rng.choice(DEPARTMENTS),
+                classification=rng.choice(CLASSIFICATIONS),
+                culture=rng.choice(CULTURES),
+                objectDate=str(begin_date),
+                objectBeginDate=begin_date,
+                objectEndDate=begin_date + rng.randint(0, 100),
+                constituents=constituents or None,
+                measurements=measurements,
+                tags=tags,
+                objectURL=f'https://www.metmuseum.org/art/collection/search/{object_id}')
+
+
+class MockHTTPServer(ThreadingHTTPServer):
+    """
+    ThreadingHTTPServer with a larger queue of pending connections.
+    """
+    request_queue_size = REQUEST_QUEUE_SIZE
+    daemon_threads = True
+
+
+class MockMuseumServer:
+    """
+    Serves /public/collection/v1/objects and /public/collection/v1/objects/<id> on
+    localhost. Every object record is a copy of correct_data/object_resp.json with its
+    objectID replaced. Object records carry an ETag and are answered with 304 Not
+    Modified when it matches If-None-Match.
+    """
+    def __init__(self, total=100, latency=0.0, error_responses=(), changed_ids=None,
+                 error_rate=0.0, synthetic=False, seed=0):
+        """
+        :param total: number of objects in the collection, ids are 1..total
+        :param latency: seconds each response is delayed by
+        :param error_responses: (status, headers) tuples answered, in order, to the first
+            requests instead of their data
+        :param changed_ids: ids listed when the object ids are filtered by metadataDate,
+            defaults to every id
+        :param error_rate: fraction of the requests answered with 503 Service Unavailable,
+            picked at random
+        :param synthetic: if True, the object records are built by synthetic_object, so
+            that they vary like the objects of the api
+        :param seed: seed of the requests answered with errors
+        """
+        self.total = total
+        self.latency = latency
+        self.request_count = 0
+        # requests being answered, and the highest number of them at the same time.
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.error_responses = deque(error_responses)
+        self.changed_ids = changed_ids
+        self.queries = []
+        self.error_rate = error_rate
+        self.synthetic = synthetic
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+        with open(OBJECT_RESP_PATH, 'r', encoding='utf-8') as file_ptr:
+            self.template = json.load(file_ptr)
+
+        self.httpd = MockHTTPServer(('127.0.0.1', 0), self.__handler_class())
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        """
+        base url to be passed to MuseumAPI.
+        """
+        host, port = self.httpd.server_address
+        return f'http://{host}:{port}'
+
+    def object_for_id(self, object_id):
+        """
+        :param object_id: id of the object
+        :return: object record served for the id
+        """
+        if self.synthetic:
+            return synthetic_object(self.template, object_id)
+        return dict(self.template, objectID=object_id)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            """
+            request handler of the mock server.
+            """
+            protocol_version = 'HTTP/1.1'
+            # the headers and the body are written separately, which Nagle's algorithm
+            # would hold back until the client acknowledges the headers.
+            disable_nagle_algorithm = True
+
+            def do_GET(self):  # pylint: disable=invalid-name
+                """
+                handles GET requests.
+                """
+                with server.lock:
+                    server.request_count += 1
+                    server.in_flight += 1
+                    server.peak_in_flight = max(server.peak_in_flight, server.in_flight)
+                try:
+                    self.__respond()
+                finally:
+                    with server.lock:
+                        server.in_flight -= 1
+
+            def __respond(self):
+                if server.latency:
+                    time.sleep(server.latency)
+
+                try:
+                    status, headers = server.error_responses.popleft()
+                except IndexError:
+                    pass
+                else:
+                    self.__send(status, {'message': 'error'}, headers)
+                    return
+
+                if server.error_rate:
+                    with server.lock:
+                        failed = server.random.random() < server.error_rate
+                    if failed:
+                        self.__send(503, {'message': 'Service Unavailable'})
+                        return
+
+                url = urlsplit(self.path)
+                query = parse_qs(url.query)
+                server.queries.append(query)
+                match = re.fullmatch(r'/public/collection/v1/objects(?:/(\d+))?', url.path)
+                if match is None:
+                    self.__send(404, {'message': 'Not Found'})
+                elif match.group(1) is None:
+                    object_ids = list(range(1, server.total + 1))
+                    if 'metadataDate' in query and server.changed_ids is not None:
+                        object_ids = list(server.changed_ids)
+                    self.__send(200, {'total': len(object_ids), 'objectIDs': object_ids})
+                elif 1 <= int(match.group(1)) <= server.total:
+                    self.__send_object(server.object_for_id(int(match.group(1))))
+                else:
+                    self.__send(404, {'message': 'ObjectID not found'})
+
+            def __send_object(self, body):
+                etag = '"' + hashlib.md5(json.dumps(body).encode('utf-8')).hexdigest() + '"'
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                else:
+                    self.__send(200, body, {'ETag': etag})
+
+            def __send(self, status, body, headers=None):
+                payload = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):  # pylint: disable=arguments-differ
+                pass
+
+        return Handler
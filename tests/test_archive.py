@@ -0,0 +1,150 @@
+"""
+    Tests for archive module.
+"""
+
+import os
+import tempfile
+import time
+import unittest
+import zipfile
+from unittest.mock import patch
+
+from museum_api.archive import (CODECS, create_archive, extract_member, extract_members,
+                                list_members, open_member)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class TestArchive(unittest.TestCase):
+    """
+    Tests functionality of the archive functions.
+    """
+    def setUp(self) -> None:
+        """
+        creates a reports directory in a temporary directory.
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.source = os.path.join(self.tmpdir.name, 'reports')
+        self.files = {
+            'museum_data.csv': b'objectID,title\n1,One-dollar Liberty Head Coin\n' * 5000,
+            'museum_data.xlsx': os.urandom(20000),
+            'museum_data.pdf': b'%PDF-1.4\n' + b'stream\n' * 5000,
+            os.path.join('museum_data', 'manifest.json'): b'{"count": 15}' * 1000,
+        }
+        for name, content in self.files.items():
+            path = os.path.join(self.source, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as file_ptr:
+                file_ptr.write(content)
+        self.files = {name.replace(os.sep, '/'): content for name, content in self.files.items()}
+
+    def tearDown(self) -> None:
+        """
+        removes the temporary directory.
+        """
+        self.tmpdir.cleanup()
+
+    def test_codecs(self):
+        """
+        Tests that every codec gives the same members back, extracted one at a time.
+        """
+        for codec in CODECS:
+            if codec == 'zstd' and zstandard is None:
+                continue
+            with self.subTest(codec=codec):
+                path = os.path.join(self.tmpdir.name, f'reports_{codec}.zip')
+                create_archive(self.source, path, codec=codec, level=1, max_workers=2)
+
+                self.assertEqual(sorted(list_members(path)), sorted(self.files))
+                for name, content in self.files.items():
+                    with open_member(path, name) as member:
+                        self.assertEqual(member.read(), content)
+
+    def test_compressed_files_are_stored(self):
+        """
+        Tests that xlsx and pdf files are stored as they are, the others compressed.
+        """
+        path = os.path.join(self.tmpdir.name, 'reports.zip')
+        create_archive(self.source, path, codec='xz')
+
+        with zipfile.ZipFile(path) as zip_file:
+            self.assertIsNone(zip_file.testzip())
+            compress_types = {info.filename: info.compress_type for info in zip_file.infolist()}
+        self.assertEqual(compress_types['museum_data.xlsx'], zipfile.ZIP_STORED)
+        self.assertEqual(compress_types['museum_data.pdf'], zipfile.ZIP_STORED)
+        self.assertEqual(compress_types['museum_data.csv'], zipfile.ZIP_LZMA)
+
+    def test_extract_member(self):
+        """
+        Tests that a single member can be extracted, and nothing out of the directory.
+        """
+        path = os.path.join(self.tmpdir.name, 'reports.zip')
+        create_archive([os.path.join(self.source, 'museum_data.csv'),
+                        os.path.join(self.source, 'museum_data', 'manifest.json')], path)
+        self.assertEqual(list_members(path), ['museum_data.csv', 'manifest.json'])
+
+        target_dir = os.path.join(self.tmpdir.name, 'extracted')
+        extracted = extract_member(path, 'manifest.json', target_dir)
+        self.assertEqual(os.listdir(target_dir), ['manifest.json'])
+        with open(extracted, 'rb') as file_ptr:
+            self.assertEqual(file_ptr.read(), self.files['museum_data/manifest.json'])
+
+        self.assertEqual(len(extract_members(path, target_dir)), 2)
+        with self.assertRaises(ValueError):
+            extract_member(path, '../museum_data.csv', target_dir)
+
+    def test_archive_is_read_by_zipfile(self):
+        """
+        Tests that zipfile reads the names, dates and modes of the members, including
+        non-ascii names.
+        """
+        path = os.path.join(self.tmpdir.name, 'reports.zip')
+        source = os.path.join(self.source, 'museum_data.csv')
+        renamed = os.path.join(self.source, 'musée.csv')
+        os.rename(source, renamed)
+        os.chmod(renamed, 0o640)
+        os.utime(renamed, (1638316800, 1638316800))
+        create_archive([renamed], path)
+
+        with zipfile.ZipFile(path) as zip_file:
+            self.assertIsNone(zip_file.testzip())
+            info = zip_file.getinfo('musée.csv')
+            self.assertEqual(zip_file.read(info), self.files['museum_data.csv'])
+        self.assertEqual(info.date_time, time.localtime(1638316800)[:6])
+        self.assertEqual(info.external_attr >> 16 & 0o777, 0o640)
+
+    def test_zip64(self):
+        """
+        Tests that the members and the archive are written with the zip64 extensions once
+        their sizes, offsets or number of members need them.
+        """
+        path = os.path.join(self.tmpdir.name, 'reports.zip')
+        with patch('museum_api.archive.ZIP64_LIMIT', 1000), \
+                patch('museum_api.archive.ZIP64_COUNT_LIMIT', 2):
+            create_archive(self.source, path, codec='deflate')
+
+        with zipfile.ZipFile(path) as zip_file:
+            self.assertIsNone(zip_file.testzip())
+            self.assertEqual({info.filename: zip_file.read(info)
+                              for info in zip_file.infolist()}, self.files)
+        for name, content in self.files.items():
+            with open_member(path, name) as member:
+                self.assertEqual(member.read(), content)
+
+    def test_invalid_codec(self):
+        """
+        Tests that an unknown codec is refused, and no archive is left behind.
+        """
+        path = os.path.join(self.tmpdir.name, 'reports.zip')
+        with self.assertRaises(ValueError):
+            create_archive(self.source, path, codec='rar')
+        with self.assertRaises(FileNotFoundError):
+            create_archive([os.path.join(self.source, 'missing.csv')], path)
+        self.assertEqual(sorted(os.listdir(self.tmpdir.name)), ['reports'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+"""
+    Tests for asyncmuseumapi module.
+"""
+
+import asyncio
+import time
+import unittest
+
+from museum_api.asyncmuseumapi import AsyncMuseumAPI
+from museum_api.museumapi import MuseumAPI
+from museum_api.ratelimit import RetryPolicy
+from mock_server import MockMuseumServer
+
+
+class TestAsyncMuseumAPI(unittest.TestCase):
+    """
+    Tests functionality of AsyncMuseumAPI class against a local mock server.
+    """
+    @classmethod
+    def setUpClass(cls) -> None:
+        """
+        starts the mock server shared by all the test functions.
+        """
+        cls.server = MockMuseumServer(total=40, latency=0.05)
+        cls.server.__enter__()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """
+        stops the mock server.
+        """
+        cls.server.__exit__(None, None, None)
+
+    def test_getting_object_ids(self):
+        """
+        Tests that get_all_object_ids returns the same dictionary as MuseumAPI.
+        """
+        async def fetch():
+            async with AsyncMuseumAPI(base_url=self.server.base_url) as museum_api:
+                return await museum_api.get_all_object_ids()
+
+        with MuseumAPI(base_url=self.server.base_url) as museum_api:
+            expected = museum_api.get_all_object_ids()
+
+        self.assertDictEqual(asyncio.run(fetch()), expected)
+
+    def test_getting_object_when_response_is_not_ok(self):
+        """
+        Tests that get_object_for_id returns None when response is not ok.
+        """
+        async def fetch():
+            async with AsyncMuseumAPI(base_url=self.server.base_url) as museum_api:
+                return await museum_api.get_object_for_id(self.server.total + 1)
+
+        self.assertIsNone(asyncio.run(fetch()))
+
+    def test_fetch_objects_runs_requests_concurrently(self):
+        """
+        Tests that fetch_objects returns the same objects as the serial sync client, with
+        several requests in flight at once where the sync client has a single one.
+        """
+        object_ids = list(range(1, 21))
+
+        async def fetch():
+            async with AsyncMuseumAPI(base_url=server.base_url) as museum_api:
+                return [item async for item in museum_api.fetch_objects(object_ids,
+                                                                       concurrency=10)]
+
+        with MockMuseumServer(total=20, latency=0.05) as server:
+            with MuseumAPI(base_url=server.base_url) as museum_api:
+                sync_objects = {object_id: museum_api.get_object_for_id(object_id)
+                                for object_id in object_ids}
+            self.assertEqual(server.peak_in_flight, 1)
+
+            async_objects = dict(asyncio.run(fetch()))
+
+        self.assertDictEqual(async_objects, sync_objects)
+        self.assertGreater(server.peak_in_flight, 1)
+
+    def test_fetch_objects_stops_early(self):
+        """
+        Tests that breaking out of fetch_objects does not fetch the remaining ids.
+        """
+        async def fetch():
+            async with AsyncMuseumAPI(base_url=self.server.base_url) as museum_api:
+                async for object_id, data in museum_api.fetch_objects(range(1, 10 ** 6),
+                                                                      concurrency=2):
+                    return object_id, data
+            return None
+
+        request_count = self.server.request_count
+        object_id, data = asyncio.run(fetch())
+        self.assertEqual(data['objectID'], object_id)
+        self.assertLess(self.server.request_count - request_count, 10)
+
+    def test_retrying_unavailable_response(self):
+        """
+        Tests that 503 and 429 responses are retried after the delay asked by Retry-After.
+        """
+        server = MockMuseumServer(total=5, error_responses=[(503, {}),
+                                                             (429, {'Retry-After': '1'})])
+
+        async def fetch():
+            async with AsyncMuseumAPI(base_url=server.base_url,
+                                      retry=RetryPolicy(backoff_factor=0.01)) as museum_api:
+                return await museum_api.get_object_for_id(1)
+
+        with server:
+            start = time.perf_counter()
+            data = asyncio.run(fetch())
+            elapsed = time.perf_counter() - start
+
+        self.assertEqual(data, server.object_for_id(1))
+        self.assertEqual(server.request_count, 3)
+        self.assertGreaterEqual(elapsed, 1)
+
+    def test_fetch_objects_with_invalid_concurrency(self):
+        """
+        Tests failure of fetch_objects when concurrency is less than 1.
+        """
+        async def fetch():
+            async with AsyncMuseumAPI(base_url=self.server.base_url) as museum_api:
+                async for _ in museum_api.fetch_objects([1], concurrency=0):
+                    pass
+
+        with self.assertRaises(ValueError):
+            asyncio.run(fetch())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,314 @@
+"""
+    Tests for cache module.
+"""
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from museum_api.cache import MemoryCache, ResponseCache
+from museum_api.museumapi import MuseumAPI
+from mock_server import MockMuseumServer
+
+
+class TestResponseCache(unittest.TestCase):
+    """
+    Tests functionality of ResponseCache class.
+    """
+    def setUp(self) -> None:
+        """
+        creates a temporary directory for the cache database.
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'cache', 'responses.sqlite')
+
+    def tearDown(self) -> None:
+        """
+        removes the temporary directory.
+        """
+        self.tmpdir.cleanup()
+
+    def test_set_and_get(self):
+        """
+        Tests that a stored response is returned with its validators.
+        """
+        with ResponseCache(self.path) as cache:
+            cache.set('url', b'{"objectID": 1}', etag='"abc"', last_modified='yesterday')
+            entry = cache.get('url')
+
+            self.assertEqual(entry.body, b'{"objectID": 1}')
+            self.assertEqual(entry.validators(), {'If-None-Match': '"abc"',
+                                                  'If-Modified-Since': 'yesterday'})
+            self.assertIsNone(cache.get('other url'))
+            self.assertEqual(cache.stats()['hits'], 1)
+            self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_responses_persist_between_instances(self):
+        """
+        Tests that responses are read back after reopening the database.
+        """
+        with ResponseCache(self.path) as cache:
+            cache.set('url', b'body')
+
+        with ResponseCache(self.path) as cache:
+            self.assertEqual(cache.get('url').body, b'body')
+            self.assertEqual(cache.stats()['size'], 4)
+
+    def test_stale_entry_is_not_a_hit(self):
+        """
+        Tests that an entry older than ttl is returned stale and not counted as a hit.
+        """
+        with ResponseCache(self.path, ttl=0.05) as cache:
+            cache.set('url', b'body')
+            time.sleep(0.1)
+            entry = cache.get('url')
+
+            self.assertFalse(entry.is_fresh(cache.ttl))
+            self.assertEqual(cache.stats()['hits'], 0)
+
+            cache.revalidated('url')
+            self.assertTrue(cache.get('url').is_fresh(cache.ttl))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        """
+        Tests that the least recently used entries are evicted beyond max_size.
+        """
+        with ResponseCache(self.path, max_size=25) as cache:
+            cache.set('first', b'x' * 10)
+            cache.set('second', b'x' * 10)
+            cache.get('first')
+            cache.set('third', b'x' * 10)
+
+            self.assertIsNone(cache.get('second'))
+            self.assertIsNotNone(cache.get('first'))
+            self.assertIsNotNone(cache.get('third'))
+            self.assertEqual(cache.stats()['size'], 20)
+
+    def test_invalidate(self):
+        """
+        Tests removing one entry and clearing the cache.
+        """
+        with ResponseCache(self.path) as cache:
+            cache.set('first', b'body')
+            cache.set('second', b'body')
+
+            cache.invalidate('first')
+            self.assertIsNone(cache.get('first'))
+            self.assertEqual(cache.stats()['entries'], 1)
+
+            cache.invalidate()
+            self.assertEqual(cache.stats()['entries'], 0)
+            self.assertEqual(cache.stats()['size'], 0)
+
+
+class TestMemoryCache(unittest.TestCase):
+    """
+    Tests functionality of MemoryCache class.
+    """
+    def test_value_is_loaded_once(self):
+        """
+        Tests that the loader is only called on a miss.
+        """
+        cache = MemoryCache()
+        calls = []
+
+        def loader():
+            calls.append(1)
+            return {'objectID': 1}
+
+        self.assertEqual(cache.get_or_load('key', loader), {'objectID': 1})
+        self.assertEqual(cache.get_or_load('key', loader), {'objectID': 1})
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_cached_value_is_a_copy(self):
+        """
+        Tests that modifying a returned value does not modify the cached one.
+        """
+        cache = MemoryCache()
+        cache.get_or_load('key', lambda: {'tags': [1]})
+        cache.get_or_load('key', lambda: None)['tags'].append(2)
+        self.assertEqual(cache.get_or_load('key', lambda: None), {'tags': [1]})
+
+    def test_none_is_not_cached(self):
+        """
+        Tests that None returned by the loader is not cached.
+        """
+        cache = MemoryCache()
+        self.assertIsNone(cache.get_or_load('key', lambda: None))
+        self.assertEqual(cache.get_or_load('key', lambda: 1), 1)
+
+    def test_least_recently_used_values_are_evicted(self):
+        """
+        Tests eviction by number of entries and by size.
+        """
+        cache = MemoryCache(max_entries=2)
+        cache.get_or_load('first', lambda: 1)
+        cache.get_or_load('second', lambda: 2)
+        cache.get_or_load('first', lambda: None)
+        cache.get_or_load('third', lambda: 3)
+        self.assertEqual(cache.get_or_load('first', lambda: None), 1)
+        self.assertIsNone(cache.get_or_load('second', lambda: None))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+        cache = MemoryCache(max_bytes=10)
+        cache.get_or_load('first', lambda: 'x' * 5)
+        cache.get_or_load('second', lambda: 'x' * 5)
+        self.assertEqual(cache.stats()['entries'], 1)
+        self.assertEqual(cache.stats()['size'], 7)
+
+    def test_expired_value_is_loaded_again(self):
+        """
+        Tests that a value older than ttl is loaded again.
+        """
+        cache = MemoryCache(ttl=0.05)
+        cache.get_or_load('key', lambda: 1)
+        time.sleep(0.1)
+        self.assertEqual(cache.get_or_load('key', lambda: 2), 2)
+
+    def test_concurrent_loads_are_deduplicated(self):
+        """
+        Tests that concurrent callers of the same key share a single load.
+        """
+        cache = MemoryCache()
+        calls = []
+        started = threading.Event()
+
+        def loader():
+            calls.append(1)
+            started.set()
+            time.sleep(0.2)
+            return {'objectID': 1}
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            first = executor.submit(cache.get_or_load, 'key', loader)
+            started.wait()
+            others = [executor.submit(cache.get_or_load, 'key', loader) for _ in range(7)]
+            results = [first.result()] + [future.result() for future in others]
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [{'objectID': 1}] * 8)
+        self.assertEqual(cache.stats()['coalesced'], 7)
+
+    def test_load_error_is_raised_to_waiting_callers(self):
+        """
+        Tests that an error of the loader is raised to every caller waiting for it.
+        """
+        cache = MemoryCache()
+        started = threading.Event()
+
+        def loader():
+            started.set()
+            time.sleep(0.1)
+            raise ConnectionError('connection reset')
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            first = executor.submit(cache.get_or_load, 'key', loader)
+            started.wait()
+            second = executor.submit(cache.get_or_load, 'key', loader)
+            with self.assertRaises(ConnectionError):
+                first.result()
+            with self.assertRaises(ConnectionError):
+                second.result()
+
+        self.assertEqual(cache.get_or_load('key', lambda: 1), 1)
+
+    def test_invalidate(self):
+        """
+        Tests removing one value and clearing the cache.
+        """
+        cache = MemoryCache()
+        cache.get_or_load('first', lambda: 1)
+        cache.get_or_load('second', lambda: 2)
+
+        cache.invalidate('first')
+        self.assertEqual(cache.get_or_load('first', lambda: 3), 3)
+
+        cache.invalidate()
+        self.assertEqual(cache.stats()['entries'], 0)
+        self.assertEqual(cache.stats()['size'], 0)
+
+
+class TestMuseumAPIWithResponseCache(unittest.TestCase):
+    """
+    Tests MuseumAPI reading and revalidating responses through a ResponseCache.
+    """
+    def setUp(self) -> None:
+        """
+        starts a mock server and creates a temporary directory for the cache database.
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'responses.sqlite')
+        self.server = MockMuseumServer(total=5)
+        self.server.__enter__()
+
+    def tearDown(self) -> None:
+        """
+        stops the mock server and removes the temporary directory.
+        """
+        self.server.__exit__(None, None, None)
+        self.tmpdir.cleanup()
+
+    def test_fresh_responses_are_read_locally(self):
+        """
+        Tests that a repeated harvest does not send any request while responses are fresh.
+        """
+        with ResponseCache(self.path) as cache:
+            for _ in range(2):
+                with MuseumAPI(base_url=self.server.base_url, cache=cache) as museum_api:
+                    for object_id in range(1, 6):
+                        self.assertEqual(museum_api.get_object_for_id(object_id),
+                                         self.server.object_for_id(object_id))
+
+            self.assertEqual(self.server.request_count, 5)
+            self.assertEqual(cache.stats()['misses'], 5)
+            self.assertEqual(cache.stats()['hits'], 5)
+
+    def test_stale_responses_are_revalidated(self):
+        """
+        Tests that stale responses are revalidated with If-None-Match and reused on 304.
+        """
+        with ResponseCache(self.path, ttl=0) as cache:
+            with MuseumAPI(base_url=self.server.base_url, cache=cache) as museum_api:
+                first = museum_api.get_object_for_id(1)
+                second = museum_api.get_object_for_id(1)
+
+            self.assertEqual(first, second)
+            self.assertEqual(self.server.request_count, 2)
+            self.assertEqual(cache.stats()['revalidations'], 1)
+            self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_not_found_response_is_not_cached(self):
+        """
+        Tests that a response which is not ok is returned as None and not stored.
+        """
+        with ResponseCache(self.path) as cache:
+            with MuseumAPI(base_url=self.server.base_url, cache=cache) as museum_api:
+                self.assertIsNone(museum_api.get_object_for_id(100))
+
+            self.assertEqual(cache.stats()['entries'], 0)
+
+    def test_memory_cache_memoizes_objects(self):
+        """
+        Tests that the memory cache answers repeated lookups until the object is
+        invalidated.
+        """
+        memory_cache = MemoryCache()
+        with MuseumAPI(base_url=self.server.base_url, memory_cache=memory_cache) \
+                as museum_api:
+            for _ in range(3):
+                self.assertEqual(museum_api.get_object_for_id(1), self.server.object_for_id(1))
+            self.assertEqual(self.server.request_count, 1)
+
+            museum_api.invalidate(1)
+            museum_api.get_object_for_id(1)
+            self.assertEqual(self.server.request_count, 2)
+            self.assertEqual(memory_cache.stats()['hits'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
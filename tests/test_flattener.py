@@ -0,0 +1,116 @@
+"""
+    Tests for flattener module.
+"""
+
+import copy
+import json
+import unittest
+
+from museum_api.flattener import Flattener
+
+
+class TestFlattener(unittest.TestCase):
+    """
+    Tests functionality of Flattener class.
+    """
+    @classmethod
+    def setUpClass(cls) -> None:
+        """
+        function to build objects with several constituents, measurements and tags.
+        """
+        with open('tmp/object_resp.json', encoding='utf-8') as file_ptr:
+            obj = json.load(file_ptr)
+
+        cls.first = copy.deepcopy(obj)
+        cls.first['objectID'] = 1
+        cls.first['constituents'].append({'constituentID': 5, 'role': 'Maker',
+                                          'name': 'Anonymous'})
+        cls.first['measurements'] = [
+            {'elementName': 'Overall', 'elementDescription': None,
+             'elementMeasurements': {'Height': 118.4, 'Width': 47.6}},
+            {'elementName': 'Frame', 'elementMeasurements': {'Depth': 3}},
+        ]
+        cls.first['tags'] = [{'term': 'Birds'}, {'term': 'Men'}]
+
+        cls.second = copy.deepcopy(obj)
+        cls.second['objectID'] = 2
+        cls.second['constituents'] = None
+        cls.second['tags'] = [{'term': 'Flowers'}]
+
+        cls.objects = [cls.first, cls.second]
+
+    def test_path_mode(self):
+        """
+        Tests that every constituent, measurement and tag gets columns of its own.
+        """
+        dataframe = Flattener().flatten(self.objects)
+
+        self.assertEqual(dataframe['constituents.0.name'][0], 'James Barton Longacre')
+        self.assertTrue(dataframe['constituents.0.name'].isna()[1])
+        self.assertEqual(dataframe['constituents.1.name'][0], 'Anonymous')
+        self.assertEqual(dataframe['measurements.0.elementMeasurements.Height'][0], 118.4)
+        self.assertEqual(dataframe['measurements.1.elementMeasurements.Depth'][0], 3)
+        self.assertEqual(dataframe['tags.0.term'].tolist(), ['Birds', 'Flowers'])
+        self.assertEqual(dataframe['tags.1.term'][0], 'Men')
+        self.assertTrue(dataframe['tags.1.term'].isna()[1])
+        self.assertNotIn('constituents', dataframe.columns)
+        self.assertEqual(dataframe['title'].tolist(),
+                         [self.first['title'], self.second['title']])
+
+    def test_aggregate_mode(self):
+        """
+        Tests that the values of the lists are joined, keeping their positions aligned.
+        """
+        dataframe = Flattener(mode='aggregate', delimiter='; ').flatten(self.objects)
+
+        self.assertEqual(dataframe['constituents.constituentID'][0], '164292; 5')
+        self.assertEqual(dataframe['constituents.constituentULAN_URL'][0],
+                         'http://vocab.getty.edu/page/ulan/500011409; ')
+        self.assertEqual(dataframe['measurements.elementMeasurements.Depth'][0], '; 3')
+        self.assertEqual(dataframe['tags.term'].tolist(), ['Birds; Men', 'Flowers'])
+        self.assertTrue(dataframe['constituents.name'].isna()[1])
+
+    def test_explode_mode(self):
+        """
+        Tests that the lists become tables keyed by objectID and position.
+        """
+        tables = Flattener(mode='explode').flatten(iter(self.objects))
+
+        self.assertEqual(set(tables), {'objects', 'constituents', 'measurements', 'tags'})
+        self.assertEqual(len(tables['objects']), 2)
+        self.assertNotIn('tags', tables['objects'].columns)
+        self.assertEqual(tables['tags'][['objectID', 'position', 'term']].values.tolist(),
+                         [[1, 0, 'Birds'], [1, 1, 'Men'], [2, 0, 'Flowers']])
+        self.assertEqual(tables['constituents']['objectID'].tolist(), [1, 1])
+        self.assertEqual(tables['measurements']['elementMeasurements.Width'][0], 47.6)
+
+    def test_schema_gives_same_columns(self):
+        """
+        Tests that a compiled schema gives later batches the same columns.
+        """
+        flattener = Flattener()
+        schema = flattener.compile(self.objects)
+
+        columns = flattener.flatten(self.objects).columns.tolist()
+        self.assertEqual(flattener.flatten([self.second], schema).columns.tolist(), columns)
+
+    def test_flatten_does_not_modify_objects(self):
+        """
+        Tests that the objects are left as they are.
+        """
+        objects = copy.deepcopy(self.objects)
+        for mode in ('path', 'aggregate', 'explode'):
+            Flattener(mode=mode).flatten(objects)
+
+        self.assertEqual(objects, self.objects)
+
+    def test_invalid_mode(self):
+        """
+        Tests that an unknown mode is refused.
+        """
+        with self.assertRaises(ValueError):
+            Flattener(mode='merge')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+"""
+    Tests for harvest module.
+"""
+
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import date, datetime
+from unittest.mock import patch
+
+from museum_api.harvest import Harvester, HarvestStore, parse_shard
+from museum_api.museumapi import MuseumAPI
+from mock_server import MockMuseumServer
+
+
+class TestHarvester(unittest.TestCase):
+    """
+    Tests functionality of Harvester class against a local mock server.
+    """
+    def setUp(self) -> None:
+        """
+        starts a mock server and opens a store in a temporary directory.
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.server = MockMuseumServer(total=30, changed_ids=[3, 4, 31])
+        self.server.__enter__()
+        self.museum_api = MuseumAPI(base_url=self.server.base_url)
+        self.store = HarvestStore(os.path.join(self.tmpdir.name, 'harvest', 'harvest.sqlite'))
+
+    def tearDown(self) -> None:
+        """
+        stops the mock server and removes the temporary directory.
+        """
+        self.store.close()
+        self.museum_api.close()
+        self.server.__exit__(None, None, None)
+        self.tmpdir.cleanup()
+
+    def test_harvest_with_limit(self):
+        """
+        Tests that the first limit objects are fetched into the store.
+        """
+        summary = Harvester(self.museum_api, self.store, checkpoint_every=4).run(limit=10)
+
+        self.assertEqual(summary, {'fetched': 10, 'missing': 0, 'failed': 0, 'skipped': 0})
+        self.assertEqual([record['objectID'] for record in self.store.records()],
+                         list(range(1, 11)))
+
+    def test_interrupted_harvest_resumes(self):
+        """
+        Tests that objects fetched before a harvest died are kept and not fetched again.
+        """
+        harvester = Harvester(self.museum_api, self.store, max_workers=1, checkpoint_every=3)
+        get_objects_for_ids = self.museum_api.get_objects_for_ids
+
+        def dies_after_five(object_ids, **kwargs):
+            for index, result in enumerate(get_objects_for_ids(object_ids, **kwargs)):
+                if index == 5:
+                    raise KeyboardInterrupt
+                yield result
+
+        with patch.object(self.museum_api, 'get_objects_for_ids', side_effect=dies_after_five):
+            with self.assertRaises(KeyboardInterrupt):
+                harvester.run(limit=12)
+        self.assertEqual(len(self.store), 5)
+
+        request_count = self.server.request_count
+        summary = harvester.run(limit=12)
+
+        self.assertEqual(summary['fetched'], 7)
+        self.assertEqual(summary['skipped'], 5)
+        # the id list and the 7 remaining objects.
+        self.assertEqual(self.server.request_count - request_count, 8)
+        self.assertEqual(len(self.store), 12)
+
+    def test_failed_objects_are_retried_by_next_run(self):
+        """
+        Tests that objects which failed are not stored, and fetched by the next run.
+        """
+        harvester = Harvester(self.museum_api, self.store)
+        with patch.object(self.museum_api, 'get_object_for_id',
+                          side_effect=ConnectionError('connection reset')):
+            summary = harvester.run(limit=3)
+        self.assertEqual(summary['failed'], 3)
+
+        summary = harvester.run(limit=3)
+        self.assertEqual(summary['fetched'], 3)
+
+    def test_records_of_a_run(self):
+        """
+        Tests that records(object_ids) only yields the objects selected by a run, while
+        records() yields every object of the store.
+        """
+        harvester = Harvester(self.museum_api, self.store)
+        harvester.run(limit=10)
+
+        object_ids = harvester.object_ids(shard=(1, 3))
+        request_count = self.server.request_count
+        summary = harvester.run(object_ids=object_ids)
+
+        self.assertEqual(summary['skipped'], 4)
+        # the objects of the shard which were not fetched by the first run.
+        self.assertEqual(self.server.request_count - request_count, 6)
+        self.assertEqual([record['objectID'] for record in self.store.records(object_ids)],
+                         list(range(1, 31, 3)))
+        self.assertEqual(len(list(self.store.records())), 16)
+
+    def test_harvest_shard(self):
+        """
+        Tests that a shard only harvests its share of the objects.
+        """
+        Harvester(self.museum_api, self.store).run(shard=(1, 3))
+
+        self.assertEqual([record['objectID'] for record in self.store.records()],
+                         list(range(1, 31, 3)))
+
+    def test_harvest_since(self):
+        """
+        Tests that only the objects updated since the date are harvested, missing ones
+        being remembered.
+        """
+        summary = Harvester(self.museum_api, self.store).run(since=date(2021, 12, 1))
+
+        self.assertEqual(summary, {'fetched': 2, 'missing': 1, 'failed': 0, 'skipped': 0})
+        self.assertEqual(self.server.queries[0]['metadataDate'], ['2021-12-01'])
+
+        summary = Harvester(self.museum_api, self.store).run(since=date(2021, 12, 1))
+        self.assertEqual(summary['skipped'], 3)
+
+    def test_harvest_object_ids_since(self):
+        """
+        Tests that objects fetched before since are fetched again when the ids are given,
+        as main.py does.
+        """
+        harvester = Harvester(self.museum_api, self.store)
+        since = date(2021, 12, 1)
+        harvester.run(since=since)
+
+        # the objects were fetched before the date, and may have changed since.
+        with sqlite3.connect(self.store.path) as connection:
+            connection.execute('UPDATE records SET fetched_at = ?',
+                               (datetime(2021, 11, 1).timestamp(),))
+        connection.close()
+
+        summary = harvester.run(since=since, object_ids=harvester.object_ids(since=since))
+        self.assertEqual(summary, {'fetched': 2, 'missing': 1, 'failed': 0, 'skipped': 0})
+
+        summary = harvester.run(since=since, object_ids=harvester.object_ids(since=since))
+        self.assertEqual(summary['skipped'], 3)
+
+    def test_parse_shard(self):
+        """
+        Tests parsing shards given on the command line.
+        """
+        self.assertEqual(parse_shard('0/4'), (0, 4))
+        for value in ('4/4', 'a/4', '1'):
+            with self.assertRaises(ValueError):
+                parse_shard(value)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+"""
+    Tests for the email functions of utils module, against a local aiosmtpd server.
+"""
+
+import email
+import email.policy
+import os
+import socket
+import tempfile
+import unittest
+import zipfile
+
+from aiosmtpd.controller import Controller
+
+from utils import Mailer, close_mailers, mailer_pool, send_email
+
+
+class RecordingHandler:
+    """
+    aiosmtpd handler keeping the envelopes it receives, with the peer they came from.
+    """
+    def __init__(self):
+        self.envelopes = []
+
+    async def handle_DATA(self, server, session, envelope):
+        """
+        records the envelope.
+        """
+        self.envelopes.append((session.peer, envelope))
+        return '250 Message accepted for delivery'
+
+
+class TestMail(unittest.TestCase):
+    """
+    Tests functionality of Mailer class and send_email function.
+    """
+    @classmethod
+    def setUpClass(cls) -> None:
+        """
+        starts the SMTP server shared by all the test functions.
+        """
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            cls.port = sock.getsockname()[1]
+
+        cls.handler = RecordingHandler()
+        cls.controller = Controller(cls.handler, hostname='127.0.0.1', port=cls.port)
+        cls.controller.start()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        """
+        stops the SMTP server.
+        """
+        cls.controller.stop()
+
+    def setUp(self) -> None:
+        """
+        creates reports in a temporary directory.
+        """
+        self.handler.envelopes.clear()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.reports = {
+            'museum_data.csv': b'objectID,title\r\n1,.hidden dot\r\n' * 2000,
+            'museum_data.xlsx': os.urandom(100000),
+        }
+        self.paths = []
+        for name, content in self.reports.items():
+            path = os.path.join(self.tmpdir.name, name)
+            with open(path, 'wb') as file_ptr:
+                file_ptr.write(content)
+            self.paths.append(path)
+        self.mailer = Mailer('127.0.0.1', self.port, starttls=False)
+
+    def tearDown(self) -> None:
+        """
+        closes the connection and removes the temporary directory.
+        """
+        self.mailer.close()
+        self.tmpdir.cleanup()
+
+    def received(self, index=0):
+        """
+        :return: (peer, envelope, message) tuple of a received email
+        """
+        peer, envelope = self.handler.envelopes[index]
+        return peer, envelope, email.message_from_bytes(envelope.content,
+                                                        policy=email.policy.default)
+
+    def test_attachments(self):
+        """
+        Tests that the attachments are received unchanged.
+        """
+        self.mailer.send('sender@example.com', 'receiver@example.com', 'Museum API Reports',
+                         'Dear Krupa,\n.\nThanks', self.paths + ['missing.pdf'])
+
+        _, envelope, message = self.received()
+        self.assertEqual(envelope.rcpt_tos, ['receiver@example.com'])
+        self.assertEqual(message['Subject'], 'Museum API Reports')
+        parts = list(message.iter_parts())
+        self.assertEqual(parts[0].get_content(), 'Dear Krupa,\n.\nThanks')
+        self.assertEqual({part.get_filename(): part.get_payload(decode=True) for part in parts[1:]},
+                         self.reports)
+        self.assertEqual(parts[2].get_content_type(),
+                         'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
+    def test_bundle(self):
+        """
+        Tests that bundled reports are received as a single zip archive.
+        """
+        self.mailer.send('sender@example.com', 'receiver@example.com', 'Rapports – musée',
+                         '', self.paths, bundle=True)
+
+        _, _, message = self.received()
+        self.assertEqual(message['Subject'], 'Rapports – musée')
+        attachment = list(message.iter_attachments())
+        self.assertEqual([part.get_filename() for part in attachment], ['reports.zip'])
+
+        path = os.path.join(self.tmpdir.name, 'received.zip')
+        with open(path, 'wb') as file_ptr:
+            file_ptr.write(attachment[0].get_content())
+        with zipfile.ZipFile(path) as zip_file:
+            self.assertEqual({name: zip_file.read(name) for name in zip_file.namelist()},
+                             self.reports)
+
+    def test_connection_is_reused(self):
+        """
+        Tests that several emails and receivers are sent through one connection.
+        """
+        self.mailer.send('sender@example.com', ['first@example.com', 'second@example.com'],
+                         'first', 'body', self.paths)
+        self.mailer.send('sender@example.com', 'third@example.com', 'second', 'body')
+
+        self.assertEqual(self.mailer.connections, 1)
+        self.assertEqual(self.received(0)[0], self.received(1)[0])
+        self.assertEqual(self.received(0)[1].rcpt_tos,
+                         ['first@example.com', 'second@example.com'])
+
+    def test_reconnects_after_close(self):
+        """
+        Tests that a closed connection is opened again.
+        """
+        self.mailer.send('sender@example.com', 'receiver@example.com', 'first')
+        self.mailer.close()
+        self.mailer.send('sender@example.com', 'receiver@example.com', 'second')
+
+        self.assertEqual(self.mailer.connections, 2)
+        self.assertEqual(len(self.handler.envelopes), 2)
+
+    def test_send_email_with_mailer(self):
+        """
+        Tests that send_email sends through the Mailer given.
+        """
+        send_email('sender@example.com', 'receiver@example.com', None, 'Museum API Reports',
+                   'body', self.paths, bundle=True, mailer=self.mailer)
+
+        self.assertEqual(len(self.handler.envelopes), 1)
+
+
+    def test_close_mailers(self):
+        """
+        Tests that close_mailers terminates the sessions of the pooled Mailers.
+        """
+        mailer_pool[('127.0.0.1', self.port, None)] = self.mailer
+        self.mailer.send('sender@example.com', 'receiver@example.com', 'first')
+        close_mailers()
+
+        self.assertEqual(mailer_pool, {})
+        self.mailer.send('sender@example.com', 'receiver@example.com', 'second')
+        self.assertEqual(self.mailer.connections, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,195 @@
+"""
+    Tests for metrics module.
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from museum_api.asyncmuseumapi import AsyncMuseumAPI
+from museum_api.cache import ResponseCache
+from museum_api.metrics import Histogram, Metrics, default_metrics
+from museum_api.museumapi import MuseumAPI
+from museum_api.ratelimit import RetryPolicy
+from museum_api.utils import Converter, flatten_objects
+from mock_server import MockMuseumServer
+
+
+class TestMetrics(unittest.TestCase):
+    """
+    Tests functionality of Metrics and Histogram classes.
+    """
+    def test_histogram_percentiles(self):
+        """
+        Tests the percentiles and the summary of a histogram.
+        """
+        histogram = Histogram()
+        for value in range(1, 101):
+            histogram.observe(value / 100)
+
+        self.assertEqual(histogram.percentile(50), 0.5)
+        self.assertEqual(histogram.percentile(99), 0.99)
+        summary = histogram.summary()
+        self.assertEqual(summary['count'], 100)
+        self.assertEqual(summary['min'], 0.01)
+        self.assertEqual(summary['max'], 1)
+        self.assertAlmostEqual(summary['mean'], 0.505)
+        self.assertEqual(summary['p90'], 0.9)
+
+    def test_histogram_reservoir_is_bounded(self):
+        """
+        Tests that a histogram keeps at most reservoir_size values, while counting all of
+        them.
+        """
+        histogram = Histogram(reservoir_size=100)
+        for value in range(10000):
+            histogram.observe(value)
+
+        self.assertEqual(len(histogram.samples), 100)
+        self.assertEqual(histogram.count, 10000)
+        self.assertEqual(sum(histogram.bucket_counts), 10000)
+        self.assertLess(abs(histogram.percentile(50) - 5000), 1500)
+
+    def test_disabled_metrics_record_nothing(self):
+        """
+        Tests that nothing is recorded while the metrics are disabled.
+        """
+        metrics = Metrics(enabled=False)
+        metrics.increment('requests', status=200)
+        metrics.observe('request_seconds', 0.1)
+        with metrics.timer('export_seconds', format='csv'):
+            pass
+
+        summary = metrics.summary()
+        self.assertEqual(summary['counters'], {})
+        self.assertEqual(summary['histograms'], {})
+
+    def test_summary_and_json(self):
+        """
+        Tests that the series are keyed by their labels in the summary written as json.
+        """
+        metrics = Metrics()
+        metrics.increment('requests', status=200)
+        metrics.increment('requests', 2, status='200')
+        metrics.increment('requests', status=503)
+        metrics.set_gauge('objects_flattened_per_second', 1500.0)
+        with metrics.timer('export_seconds', format='csv') as timer:
+            pass
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'metrics.json')
+            metrics.write_json(path)
+            with open(path, encoding='utf-8') as file_ptr:
+                summary = json.load(file_ptr)
+
+        self.assertEqual(summary['counters'], {'requests{status="200"}': 3,
+                                               'requests{status="503"}': 1})
+        self.assertEqual(summary['gauges'], {'objects_flattened_per_second': 1500.0})
+        self.assertEqual(summary['histograms']['export_seconds{format="csv"}']['sum'],
+                         timer.elapsed)
+
+    def test_prometheus_format(self):
+        """
+        Tests the text exposition format of counters and histograms.
+        """
+        metrics = Metrics(buckets=(0.1, 1))
+        metrics.increment('retries')
+        metrics.increment('requests', status=200)
+        for value in (0.05, 0.5, 5):
+            metrics.observe('request_seconds', value)
+
+        self.assertEqual(metrics.to_prometheus(), (
+            '# TYPE museum_api_requests_total counter\n'
+            'museum_api_requests_total{status="200"} 1\n'
+            '# TYPE museum_api_retries_total counter\n'
+            'museum_api_retries_total 1\n'
+            '# TYPE museum_api_request_seconds histogram\n'
+            'museum_api_request_seconds_bucket{le="0.1"} 1\n'
+            'museum_api_request_seconds_bucket{le="1"} 2\n'
+            'museum_api_request_seconds_bucket{le="+Inf"} 3\n'
+            'museum_api_request_seconds_sum 5.55\n'
+            'museum_api_request_seconds_count 3\n'
+        ))
+
+
+class TestInstrumentation(unittest.TestCase):
+    """
+    Tests the metrics recorded by the clients and the converters.
+    """
+    def setUp(self) -> None:
+        """
+        starts a mock server answering the first request with 503.
+        """
+        self.server = MockMuseumServer(total=5, error_responses=[(503, {})])
+        self.server.__enter__()
+
+    def tearDown(self) -> None:
+        """
+        stops the mock server and disables default_metrics.
+        """
+        self.server.__exit__(None, None, None)
+        default_metrics.enabled = False
+        default_metrics.reset()
+
+    def test_museum_api_metrics(self):
+        """
+        Tests that requests, retries, bytes, latencies and cache lookups are recorded.
+        """
+        metrics = Metrics()
+        with tempfile.TemporaryDirectory() as tmpdir, \
+                ResponseCache(os.path.join(tmpdir, 'responses.sqlite')) as cache, \
+                MuseumAPI(base_url=self.server.base_url, cache=cache, metrics=metrics,
+                          retry=RetryPolicy(backoff_factor=0.01)) as museum_api:
+            for object_id in (1, 2, 1):
+                museum_api.get_object_for_id(object_id)
+
+        self.assertEqual(metrics.counter('requests', status=503), 1)
+        self.assertEqual(metrics.counter('requests', status=200), 2)
+        self.assertEqual(metrics.counter('retries'), 1)
+        self.assertEqual(metrics.counter('cache_lookups', cache='response', result='miss'), 2)
+        self.assertEqual(metrics.counter('cache_lookups', cache='response', result='hit'), 1)
+        self.assertEqual(metrics.histogram('request_seconds').count, 3)
+        self.assertGreater(metrics.counter('bytes_received'),
+                           2 * len(json.dumps(self.server.object_for_id(1))) - 100)
+
+    def test_async_museum_api_metrics(self):
+        """
+        Tests that AsyncMuseumAPI records the same requests and retries.
+        """
+        metrics = Metrics()
+
+        async def fetch():
+            async with AsyncMuseumAPI(base_url=self.server.base_url, metrics=metrics,
+                                      retry=RetryPolicy(backoff_factor=0.01)) as museum_api:
+                return await museum_api.get_object_for_id(1)
+
+        self.assertEqual(asyncio.run(fetch()), self.server.object_for_id(1))
+        self.assertEqual(metrics.counter('requests', status=503), 1)
+        self.assertEqual(metrics.counter('requests', status=200), 1)
+        self.assertEqual(metrics.counter('retries'), 1)
+        self.assertGreater(metrics.counter('bytes_received'), 0)
+
+    def test_flatten_and_export_metrics(self):
+        """
+        Tests that the objects flattened and the time of each export are recorded to
+        default_metrics once it is enabled.
+        """
+        objects = [self.server.object_for_id(object_id) for object_id in range(1, 6)]
+        flatten_objects(objects)
+        self.assertEqual(default_metrics.counter('objects_flattened'), 0)
+
+        default_metrics.enabled = True
+        dataframe = flatten_objects(objects, chunk_size=2)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            Converter.convert_to_csv(dataframe, os.path.join(tmpdir, 'museum_data.csv'))
+
+        self.assertEqual(default_metrics.counter('objects_flattened'), 5)
+        self.assertEqual(default_metrics.histogram('flatten_seconds').count, 3)
+        self.assertGreater(default_metrics.gauge('objects_flattened_per_second'), 0)
+        self.assertEqual(default_metrics.histogram('export_seconds', format='csv').count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
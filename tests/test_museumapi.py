@@ -9,8 +9,14 @@ import os
 import sys
 from unittest.mock import patch, Mock
 
+import requests
+
 from museum_api.museumapi import MuseumAPI
+from museum_api.objectids import ObjectIDs
+from museum_api.ratelimit import RateLimiter, RetryPolicy
 
+# the logs of the tests are written to logs/, which isn't part of the tree.
+os.makedirs('logs', exist_ok=True)
 logging.basicConfig(
      filename='logs/test_museumapi_error.log',
      level=logging.ERROR,
@@ -30,11 +36,11 @@ class TestMuseumAPI(unittest.TestCase):
         """
         cls.mAPIObj = MuseumAPI()
 
-    @patch('museum_api.museumapi.requests.get')
+    @patch('museum_api.museumapi.requests.Session.get')
     def test_getting_object_ids_when_response_is_ok(self, mock_get):
         """
         Tests getting object ids from museum API when response is ok.
-        :param mock_get: mocked method get of requests module.
+        :param mock_get: mocked method get of requests.Session.
         """
         actual_object_ids_data = None
         tmp_object_ids_data = None
@@ -65,11 +71,11 @@ class TestMuseumAPI(unittest.TestCase):
         # If the request is sent successfully, then I expect a response to be returned.
         self.assertDictEqual(mocked_object_ids_data, actual_object_ids_data)
 
-    @patch('museum_api.museumapi.requests.get')
+    @patch('museum_api.museumapi.requests.Session.get')
     def test_getting_object_ids_when_response_is_not_ok(self, mock_get):
         """
         Tests getting object ids from museum API when response is not ok.
-        :param mock_get: mocked method get of requests module.
+        :param mock_get: mocked method get of requests.Session.
         """
         # Configure the mock to not return a response with an OK status code.
         mock_get.return_value.ok = False
@@ -80,11 +86,11 @@ class TestMuseumAPI(unittest.TestCase):
         # If the response contains an error, I should get no todos.
         self.assertIsNone(object_ids_data)
 
-    @patch('museum_api.museumapi.requests.get')
+    @patch('museum_api.museumapi.requests.Session.get')
     def test_getting_object_when_response_is_ok(self, mock_get):
         """
         Tests getting object from museum API when response is ok.
-        :param mock_get: mocked method get of requests module.
+        :param mock_get: mocked method get of requests.Session.
         """
         mocked_object_data = None
         tmp_object_data = None
@@ -115,11 +121,11 @@ class TestMuseumAPI(unittest.TestCase):
         # If the request is sent successfully, then I expect a response to be returned.
         self.assertDictEqual(mocked_object_data, actual_object_data)
 
-    @patch('museum_api.museumapi.requests.get')
+    @patch('museum_api.museumapi.requests.Session.get')
     def test_getting_object_when_response_is_not_ok(self, mock_get):
         """
         Tests getting object from museum API when response is not ok.
-        :param mock_get: mocked method get of requests module.
+        :param mock_get: mocked method get of requests.Session.
         """
         # Configure the mock to not return a response with an OK status code.
         mock_get.return_value.ok = False
@@ -130,6 +136,163 @@ class TestMuseumAPI(unittest.TestCase):
         # If the response contains an error, It must return None.
         self.assertIsNone(object_data)
 
+    @patch('museum_api.museumapi.requests.Session.get')
+    def test_getting_compact_object_ids(self, mock_get):
+        """
+        Tests getting object ids as ObjectIDs.
+        :param mock_get: mocked method get of requests.Session.
+        """
+        mock_get.return_value = Mock(ok=True)
+        mock_get.return_value.json.return_value = {'total': 3, 'objectIDs': [1, 2, 5]}
+
+        object_ids_data = self.mAPIObj.get_all_object_ids(compact=True)
+
+        self.assertEqual(object_ids_data['total'], 3)
+        self.assertEqual(object_ids_data['objectIDs'], ObjectIDs([1, 2, 5]))
+
+    @patch('museum_api.museumapi.requests.Session.get')
+    def test_requests_reuse_session_with_timeout(self, mock_get):
+        """
+        Tests that every request goes through the same session with configured timeout.
+        :param mock_get: mocked method get of requests.Session.
+        """
+        mock_get.return_value = Mock(ok=True)
+        mock_get.return_value.json.return_value = {}
+
+        museum_api = MuseumAPI(timeout=5)
+        museum_api.get_object_for_id(1)
+        museum_api.get_object_for_id(2)
+
+        self.assertEqual(mock_get.call_count, 2)
+        for call in mock_get.call_args_list:
+            self.assertEqual(call.kwargs['timeout'], 5)
+
+    def test_session_pool_configuration(self):
+        """
+        Tests that the session mounts an adapter with configured pool size.
+        """
+        with MuseumAPI(pool_connections=2, pool_maxsize=7, pool_block=True) as museum_api:
+            adapter = museum_api.session.get_adapter(museum_api.base_url)
+            self.assertEqual(adapter._pool_connections, 2)
+            self.assertEqual(adapter._pool_maxsize, 7)
+            self.assertTrue(adapter._pool_block)
+
+    def test_context_manager_closes_owned_session(self):
+        """
+        Tests that leaving the context closes the session owned by MuseumAPI.
+        """
+        with patch('museum_api.museumapi.requests.Session.close') as mock_close:
+            with MuseumAPI():
+                pass
+            mock_close.assert_called_once()
+
+    def test_close_does_not_close_external_session(self):
+        """
+        Tests that a session passed by the caller is left open.
+        """
+        session = Mock()
+        with MuseumAPI(session=session) as museum_api:
+            self.assertIs(museum_api.session, session)
+        session.close.assert_not_called()
+
+    @patch('museum_api.museumapi.requests.Session.get')
+    def test_getting_objects_for_ids_in_order(self, mock_get):
+        """
+        Tests that get_objects_for_ids yields every object in the order of the ids.
+        :param mock_get: mocked method get of requests.Session.
+        """
+        def get(url, **kwargs):
+            response = Mock(ok=True)
+            response.json.return_value = {'objectID': int(url.rsplit('/', 1)[-1])}
+            return response
+        mock_get.side_effect = get
+
+        object_ids = list(range(1, 51))
+        results = list(self.mAPIObj.get_objects_for_ids(object_ids, max_workers=4))
+
+        self.assertEqual([object_id for object_id, _ in results], object_ids)
+        for object_id, data in results:
+            self.assertEqual(data, {'objectID': object_id})
+
+    @patch('museum_api.museumapi.requests.Session.get')
+    def test_getting_objects_for_ids_reports_failures(self, mock_get):
+        """
+        Tests that a failed request is reported for its id without aborting the batch.
+        :param mock_get: mocked method get of requests.Session.
+        """
+        def get(url, **kwargs):
+            object_id = int(url.rsplit('/', 1)[-1])
+            if object_id == 3:
+                raise requests.ConnectionError('connection reset')
+            response = Mock(ok=True)
+            response.json.return_value = {'objectID': object_id}
+            return response
+        mock_get.side_effect = get
+
+        museum_api = MuseumAPI(retry=RetryPolicy(max_retries=0))
+        results = dict(museum_api.get_objects_for_ids(range(1, 11), max_workers=3,
+                                                      ordered=False))
+
+        self.assertEqual(set(results), set(range(1, 11)))
+        self.assertIsInstance(results.pop(3), requests.ConnectionError)
+        for object_id, data in results.items():
+            self.assertEqual(data, {'objectID': object_id})
+
+    @patch('museum_api.museumapi.time.sleep')
+    @patch('museum_api.museumapi.requests.Session.get')
+    def test_retrying_throttled_request(self, mock_get, mock_sleep):
+        """
+        Tests that a 429 response is retried after the delay asked by Retry-After.
+        :param mock_get: mocked method get of requests.Session.
+        :param mock_sleep: mocked function sleep of time module.
+        """
+        throttled = Mock(ok=False, status_code=429, headers={'Retry-After': '7'})
+        succeeded = Mock(ok=True, status_code=200)
+        succeeded.json.return_value = {'objectID': 1}
+        mock_get.side_effect = [throttled, succeeded]
+
+        museum_api = MuseumAPI(rate_limiter=RateLimiter(rate=1000, burst=1000))
+        self.assertEqual(museum_api.get_object_for_id(1), {'objectID': 1})
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertGreaterEqual(mock_sleep.call_args_list[0].args[0], 7)
+        throttled.close.assert_called_once()
+
+    @patch('museum_api.museumapi.time.sleep')
+    @patch('museum_api.museumapi.requests.Session.get')
+    def test_retrying_connection_error_until_max_retries(self, mock_get, mock_sleep):
+        """
+        Tests that connection errors are retried, then raised once retries are exhausted.
+        :param mock_get: mocked method get of requests.Session.
+        :param mock_sleep: mocked function sleep of time module.
+        """
+        mock_get.side_effect = requests.ConnectionError('connection refused')
+
+        museum_api = MuseumAPI(retry=RetryPolicy(max_retries=2))
+        with self.assertRaises(requests.ConnectionError):
+            museum_api.get_object_for_id(1)
+        self.assertEqual(mock_get.call_count, 3)
+
+    @patch('museum_api.museumapi.time.sleep')
+    @patch('museum_api.museumapi.requests.Session.get')
+    def test_not_retrying_not_found(self, mock_get, mock_sleep):
+        """
+        Tests that a 404 response is not retried.
+        :param mock_get: mocked method get of requests.Session.
+        :param mock_sleep: mocked function sleep of time module.
+        """
+        mock_get.return_value = Mock(ok=False, status_code=404)
+
+        self.assertIsNone(self.mAPIObj.get_object_for_id(1))
+        self.assertEqual(mock_get.call_count, 1)
+        mock_sleep.assert_not_called()
+
+    def test_getting_objects_for_ids_with_invalid_max_workers(self):
+        """
+        Tests failure of get_objects_for_ids when max_workers is less than 1.
+        """
+        with self.assertRaises(ValueError):
+            list(self.mAPIObj.get_objects_for_ids([1], max_workers=0))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,152 @@
+"""
+    Tests for objectids module.
+"""
+
+import json
+import os
+import tempfile
+import unittest
+from array import array
+from itertools import chain
+
+import numpy as np
+
+from museum_api.museumapi import MuseumAPI
+from museum_api.objectids import ObjectIDs, iter_object_ids
+from mock_server import MockMuseumServer
+
+
+class TestObjectIDs(unittest.TestCase):
+    """
+    Tests functionality of ObjectIDs class.
+    """
+    def setUp(self) -> None:
+        """
+        sets up the ids used in all the test functions.
+        """
+        self.object_ids = ObjectIDs([1, 2, 3, 5, 8, 13, 21, 34])
+
+    def test_sequence_behaviour(self):
+        """
+        Tests length, indexing, slicing, iteration and membership.
+        """
+        self.assertEqual(len(self.object_ids), 8)
+        self.assertEqual(self.object_ids[4], 8)
+        self.assertIsInstance(self.object_ids[4], int)
+        self.assertEqual(self.object_ids[0:3].tolist(), [1, 2, 3])
+        self.assertEqual(list(self.object_ids[-2:]), [21, 34])
+        self.assertIn(13, self.object_ids)
+        self.assertNotIn(4, self.object_ids)
+
+    def test_iteration_in_chunks(self):
+        """
+        Tests that iterating yields every id as a python int, a chunk at a time.
+        """
+        object_ids = ObjectIDs(range(1, 10001))
+        iterator = iter(object_ids)
+        self.assertEqual(next(iterator), 1)
+        self.assertIsInstance(next(iterator), int)
+        self.assertEqual(list(iterator), list(range(3, 10001)))
+
+    def test_ids_take_four_bytes_each(self):
+        """
+        Tests that the ids are stored as uint32.
+        """
+        self.assertEqual(self.object_ids.array.dtype, np.uint32)
+        self.assertEqual(self.object_ids.nbytes, 8 * 4)
+        self.assertEqual(self.object_ids.to_array(), array('I', self.object_ids.tolist()))
+
+    def test_diff(self):
+        """
+        Tests finding the ids added and removed since a previous harvest.
+        """
+        added, removed = self.object_ids.diff([1, 2, 4, 5, 8, 13, 21])
+        self.assertEqual(added.tolist(), [3, 34])
+        self.assertEqual(removed.tolist(), [4])
+
+    def test_shard(self):
+        """
+        Tests that the shards of both methods partition the ids.
+        """
+        for method in ('modulo', 'range'):
+            shards = [self.object_ids.shard(index, 3, method) for index in range(3)]
+            self.assertEqual(sorted(sum((shard.tolist() for shard in shards), [])),
+                             self.object_ids.tolist())
+
+        self.assertEqual(self.object_ids.shard(1, 3).tolist(), [1, 13, 34])
+        self.assertEqual(self.object_ids.shard(0, 3, 'range').tolist(), [1, 2, 3])
+
+    def test_shard_with_invalid_arguments(self):
+        """
+        Tests failure of shard when index or method is invalid.
+        """
+        with self.assertRaises(ValueError):
+            self.object_ids.shard(3, 3)
+        with self.assertRaises(ValueError):
+            self.object_ids.shard(0, 3, 'hash')
+
+    def test_save_and_load(self):
+        """
+        Tests that saved ids are loaded back unchanged.
+        """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'ids.npy')
+            self.object_ids.save(path)
+            self.assertEqual(ObjectIDs.load(path), self.object_ids)
+
+
+class TestIterObjectIDs(unittest.TestCase):
+    """
+    Tests functionality of iter_object_ids function.
+    """
+    @staticmethod
+    def split(body, size):
+        """
+        :param body: bytes to split
+        :param size: size of the pieces
+        :return: list of pieces of body
+        """
+        return [body[index:index + size] for index in range(0, len(body), size)]
+
+    def test_ids_split_across_chunks(self):
+        """
+        Tests parsing a body received a few bytes at a time, whatever the boundaries.
+        """
+        object_ids = list(range(1, 2500, 7))
+        body = json.dumps({'total': len(object_ids), 'objectIDs': object_ids}).encode()
+        for size in (1, 3, 16, 1000, len(body)):
+            chunks = list(iter_object_ids(self.split(body, size), chunk_size=100))
+            self.assertEqual(list(chain.from_iterable(chunks)), object_ids)
+            self.assertTrue(all(len(chunk) <= 100 for chunk in chunks))
+
+    def test_keys_in_any_order(self):
+        """
+        Tests parsing a body where total comes after objectIDs, with whitespace.
+        """
+        body = b'{ "objectIDs" : [ 4 ,\n 5 , 6 ] , "total" : 3 }'
+        chunks = list(iter_object_ids(self.split(body, 2)))
+        self.assertEqual(list(chain.from_iterable(chunks)), [4, 5, 6])
+
+    def test_no_matching_object(self):
+        """
+        Tests parsing a body where objectIDs is null.
+        """
+        self.assertEqual(list(iter_object_ids([b'{"total":0,"objectIDs":null}'])), [])
+        self.assertEqual(list(iter_object_ids([b'{"total":0,"objectIDs":[]}'])), [])
+
+    def test_streaming_object_ids_from_server(self):
+        """
+        Tests that MuseumAPI.iter_all_object_ids streams the same ids as
+        get_all_object_ids.
+        """
+        with MockMuseumServer(total=1234) as server, \
+                MuseumAPI(base_url=server.base_url) as museum_api:
+            chunks = list(museum_api.iter_all_object_ids(chunk_size=500))
+            expected = museum_api.get_all_object_ids()['objectIDs']
+
+        self.assertEqual([len(chunk) for chunk in chunks], [500, 500, 234])
+        self.assertEqual(list(chain.from_iterable(chunks)), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+"""
+    Tests for ratelimit module.
+"""
+
+import asyncio
+import time
+import unittest
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+from museum_api.ratelimit import RateLimiter, RetryPolicy, parse_retry_after
+
+
+class TestRateLimiter(unittest.TestCase):
+    """
+    Tests functionality of RateLimiter class.
+    """
+    def test_burst_is_not_delayed(self):
+        """
+        Tests that up to burst requests are allowed at once.
+        """
+        rate_limiter = RateLimiter(rate=1, burst=5)
+        start = time.monotonic()
+        for _ in range(5):
+            rate_limiter.acquire()
+        self.assertLess(time.monotonic() - start, 0.1)
+
+    def test_requests_are_paced_at_rate(self):
+        """
+        Tests that requests beyond the burst are spaced by 1 / rate seconds.
+        """
+        rate_limiter = RateLimiter(rate=50, burst=1)
+        start = time.monotonic()
+        for _ in range(11):
+            rate_limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+
+    def test_async_requests_are_paced_at_rate(self):
+        """
+        Tests that acquire_async paces concurrent coroutines together.
+        """
+        rate_limiter = RateLimiter(rate=50, burst=1)
+
+        async def acquire_all():
+            await asyncio.gather(*(rate_limiter.acquire_async() for _ in range(11)))
+
+        start = time.monotonic()
+        asyncio.run(acquire_all())
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+
+    def test_pause_holds_back_requests(self):
+        """
+        Tests that no request is allowed while the limiter is paused.
+        """
+        rate_limiter = RateLimiter(rate=1000, burst=10)
+        rate_limiter.pause(0.2)
+        start = time.monotonic()
+        rate_limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+
+    def test_invalid_arguments(self):
+        """
+        Tests failure of RateLimiter when rate or burst is invalid.
+        """
+        with self.assertRaises(ValueError):
+            RateLimiter(rate=0)
+        with self.assertRaises(ValueError):
+            RateLimiter(burst=0)
+
+
+class TestRetryPolicy(unittest.TestCase):
+    """
+    Tests functionality of RetryPolicy class.
+    """
+    def test_should_retry_status(self):
+        """
+        Tests that only retryable statuses are retried, up to max_retries times.
+        """
+        retry = RetryPolicy(max_retries=2)
+        self.assertTrue(retry.should_retry_status(429, 0))
+        self.assertTrue(retry.should_retry_status(503, 1))
+        self.assertFalse(retry.should_retry_status(503, 2))
+        self.assertFalse(retry.should_retry_status(404, 0))
+
+    def test_backoff_is_bounded(self):
+        """
+        Tests that the jittered backoff never exceeds its exponential bound.
+        """
+        retry = RetryPolicy(backoff_factor=0.5, max_backoff=3)
+        for attempt in range(10):
+            delay = retry.backoff(attempt)
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, min(3, 0.5 * 2 ** attempt))
+
+    def test_backoff_honours_retry_after(self):
+        """
+        Tests that Retry-After takes precedence over the computed backoff.
+        """
+        retry = RetryPolicy(backoff_factor=0.5, max_backoff=10)
+        delay = retry.backoff(0, '7')
+        self.assertGreaterEqual(delay, 7)
+        self.assertLessEqual(delay, 7.5)
+
+    def test_retry_after_is_bounded(self):
+        """
+        Tests that a Retry-After longer than max_backoff is cut to max_backoff.
+        """
+        retry = RetryPolicy(backoff_factor=0.5, max_backoff=1)
+        self.assertEqual(retry.backoff(0, '3600'), 1)
+
+
+class TestParseRetryAfter(unittest.TestCase):
+    """
+    Tests functionality of parse_retry_after function.
+    """
+    def test_parse_seconds(self):
+        """
+        Tests parsing of a delay in seconds.
+        """
+        self.assertEqual(parse_retry_after('120'), 120)
+
+    def test_parse_http_date(self):
+        """
+        Tests parsing of an http date.
+        """
+        retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+        delay = parse_retry_after(format_datetime(retry_at, usegmt=True))
+        self.assertAlmostEqual(delay, 30, delta=2)
+
+    def test_parse_invalid_value(self):
+        """
+        Tests that missing or invalid values are ignored.
+        """
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after('soon'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+"""
+    Tests for report module.
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+from museum_api.report import HTMLReportWriter, write_html_report
+
+
+def generate_records():
+    """
+    generates records of several departments, the last ones having a key more.
+    """
+    for object_id in range(1, 8):
+        record = {'objectID': object_id, 'title': f'<title {object_id}>',
+                  'department': 'Asian Art' if object_id % 2 else 'The American Wing',
+                  'classification': float('nan') if object_id == 1 else 'Coins'}
+        if object_id > 5:
+            record['constituentID'] = object_id * 10
+        yield record
+
+
+class TestHTMLReportWriter(unittest.TestCase):
+    """
+    Tests functionality of HTMLReportWriter class.
+    """
+    def setUp(self) -> None:
+        """
+        creates a temporary directory for the reports.
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'museum_data')
+
+    def tearDown(self) -> None:
+        """
+        removes the temporary directory.
+        """
+        self.tmpdir.cleanup()
+
+    def read_json(self, name):
+        """
+        :return: content of the json file name of the report
+        """
+        with open(os.path.join(self.path, name), encoding='utf-8') as file_ptr:
+            return json.load(file_ptr)
+
+    def test_report_files(self):
+        """
+        Tests that the rows are split into shards of page_size rows, listed by the
+        manifest with the columns and indexes.
+        """
+        self.assertEqual(write_html_report(generate_records(), self.path, page_size=3), 7)
+
+        manifest = self.read_json('manifest.json')
+        self.assertEqual(manifest['columns'],
+                         ['objectID', 'title', 'department', 'classification',
+                          'constituentID'])
+        self.assertEqual(manifest['count'], 7)
+        self.assertEqual(manifest['pageSize'], 3)
+        self.assertEqual(manifest['shards'],
+                         ['shards/00000.json', 'shards/00001.json', 'shards/00002.json'])
+        self.assertEqual(manifest['indexes']['department'],
+                         {'Asian Art': [0, 2, 4, 6], 'The American Wing': [1, 3, 5]})
+        self.assertEqual(manifest['indexes']['classification'],
+                         {'': [0], 'Coins': [1, 2, 3, 4, 5, 6]})
+
+        self.assertEqual(self.read_json('shards/00000.json')[0],
+                         [1, '<title 1>', 'Asian Art', None])
+        self.assertEqual(self.read_json('shards/00002.json'),
+                         [[7, '<title 7>', 'Asian Art', 'Coins', 70]])
+        self.assertEqual(sorted(os.listdir(self.tmpdir.name)), ['museum_data'])
+
+    def test_writes_keep_pages_in_one_shard(self):
+        """
+        Tests that rows written by several calls are still sharded by page.
+        """
+        records = list(generate_records())
+        with HTMLReportWriter(self.path, page_size=3) as writer:
+            writer.write(records[:2])
+            writer.write(records[2:4])
+            writer.write(records[4:])
+
+        self.assertEqual([len(self.read_json(shard))
+                          for shard in self.read_json('manifest.json')['shards']], [3, 3, 1])
+
+    def test_index_page(self):
+        """
+        Tests that the page escapes its title and loads the manifest.
+        """
+        with HTMLReportWriter(self.path, title='Coins & Medals') as writer:
+            writer.write(generate_records())
+
+        with open(os.path.join(self.path, 'index.html'), encoding='utf-8') as file_ptr:
+            page = file_ptr.read()
+        self.assertIn('<title>Coins &amp; Medals</title>', page)
+        self.assertIn("fetch('manifest.json')", page)
+        # "all" is null, so that the rows without a value, keyed by '', can be selected.
+        self.assertIn('if (value === null) continue;', page)
+        self.assertEqual(self.read_json('manifest.json')['indexes']['classification'][''],
+                         [0])
+
+    def test_report_is_replaced(self):
+        """
+        Tests that a report written again replaces the previous one, and that a failed
+        report leaves the previous one as it was.
+        """
+        write_html_report(generate_records(), self.path, page_size=2)
+        write_html_report(generate_records(), self.path, page_size=4)
+        self.assertEqual(len(os.listdir(os.path.join(self.path, 'shards'))), 2)
+
+        def failing_records():
+            yield {'objectID': 1}
+            raise ConnectionError('connection reset')
+
+        with self.assertRaises(ConnectionError):
+            write_html_report(failing_records(), self.path, page_size=1)
+        self.assertEqual(self.read_json('manifest.json')['count'], 7)
+        self.assertEqual(sorted(os.listdir(self.tmpdir.name)), ['museum_data'])
+
+    def test_path_with_trailing_slash(self):
+        """
+        Tests that a report whose path ends with a slash replaces the previous one, its
+        temporary directory being a sibling of the report.
+        """
+        write_html_report(generate_records(), self.path + os.sep, page_size=2)
+        write_html_report(generate_records(), self.path + os.sep, page_size=4)
+
+        self.assertEqual(len(os.listdir(os.path.join(self.path, 'shards'))), 2)
+        self.assertEqual(self.read_json('manifest.json')['count'], 7)
+        self.assertEqual(sorted(os.listdir(self.tmpdir.name)), ['museum_data'])
+
+    def test_path_is_a_file(self):
+        """
+        Tests that a report is refused when its path is an existing file, which is kept
+        and nothing else is written.
+        """
+        with open(self.path, 'w', encoding='utf-8') as file_ptr:
+            file_ptr.write('data')
+
+        with self.assertRaises(NotADirectoryError):
+            write_html_report(generate_records(), self.path)
+        self.assertEqual(sorted(os.listdir(self.tmpdir.name)), ['museum_data'])
+        self.assertTrue(os.path.isfile(self.path))
+
+
+if __name__ == '__main__':
+    unittest.main()
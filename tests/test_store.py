@@ -0,0 +1,147 @@
+"""
+    Tests for store module.
+"""
+
+import copy
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from museum_api.store import ObjectStore
+from museum_api.utils import Converter
+
+
+class TestObjectStore(unittest.TestCase):
+    """
+    Tests functionality of ObjectStore class.
+    """
+    @classmethod
+    def setUpClass(cls) -> None:
+        """
+        function to build objects of several departments and dates from the object
+        response.
+        """
+        with open('tmp/object_resp.json', encoding='utf-8') as file_ptr:
+            obj = json.load(file_ptr)
+
+        cls.objects = []
+        for object_id in range(1, 21):
+            new_obj = copy.deepcopy(obj)
+            new_obj['objectID'] = object_id
+            new_obj['department'] = 'Asian Art' if object_id % 2 else 'The American Wing'
+            new_obj['classification'] = 'Paintings' if object_id % 4 in (1, 2) else 'Coins'
+            new_obj['isPublicDomain'] = object_id % 5 != 0
+            new_obj['objectBeginDate'] = 1500 + object_id * 10
+            new_obj['objectEndDate'] = 1520 + object_id * 10
+            cls.objects.append(new_obj)
+
+    def setUp(self) -> None:
+        """
+        creates a store in a temporary directory.
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = ObjectStore(os.path.join(self.tmpdir.name, 'objects.sqlite'),
+                                 batch_size=7)
+        self.store.upsert(iter(self.objects))
+
+    def tearDown(self) -> None:
+        """
+        closes the store and removes the temporary directory.
+        """
+        self.store.close()
+        self.tmpdir.cleanup()
+
+    def test_query(self):
+        """
+        Tests that only the objects matching every condition are returned.
+        """
+        objects = list(self.store.query(department='Asian Art', classification='Paintings',
+                                        isPublicDomain=True, date_range=(1600, 1700)))
+
+        self.assertEqual([obj['objectID'] for obj in objects], [13, 17])
+        self.assertEqual(objects[0], self.objects[12])
+        self.assertEqual(self.store.count(department='Asian Art', classification='Paintings',
+                                          isPublicDomain=True, date_range=(1600, 1700)), 2)
+
+    def test_query_with_several_values(self):
+        """
+        Tests that a list of values matches any of them, and None missing values.
+        """
+        self.assertEqual(self.store.count(classification=['Paintings', 'Coins']), 20)
+        self.assertEqual(self.store.count(culture=None), 20)
+        self.assertEqual(self.store.count(isPublicDomain=False, date_range=(None, 1600)), 1)
+        self.assertEqual([obj['objectID'] for obj in self.store.query(limit=3)], [1, 2, 3])
+
+    def test_query_uses_indexes(self):
+        """
+        Tests that the fields are looked up through their index.
+        """
+        connection = sqlite3.connect(self.store.path)
+        for field in ('department', 'culture', 'objectBeginDate', 'artistDisplayName'):
+            plan = connection.execute(
+                f'EXPLAIN QUERY PLAN SELECT data FROM objects WHERE {field} = ?', (1,)
+            ).fetchall()
+            self.assertIn(f'INDEX objects_{field}', plan[0][-1])
+        connection.close()
+
+    def test_query_when_field_is_not_indexed(self):
+        """
+        Tests that conditions on fields which are not indexed are refused.
+        """
+        with self.assertRaises(ValueError):
+            self.store.count(title='Quail and Millet')
+
+    def test_upsert_replaces_objects(self):
+        """
+        Tests that an object stored again replaces the previous one.
+        """
+        obj = copy.deepcopy(self.objects[0])
+        obj['department'] = 'Arms and Armor'
+        self.assertEqual(self.store.upsert([obj, None, ConnectionError()]), 1)
+
+        self.assertEqual(len(self.store), 20)
+        self.assertEqual(self.store.get(1)['department'], 'Arms and Armor')
+        self.assertEqual(self.store.count(department='Arms and Armor'), 1)
+
+        self.store.delete([1, 2])
+        self.assertIsNone(self.store.get(1))
+        self.assertEqual(len(self.store), 18)
+
+    def test_concurrent_upserts(self):
+        """
+        Tests that threads can upsert into the same store while it is queried.
+        """
+        def upsert(offset):
+            objects = copy.deepcopy(self.objects)
+            for obj in objects:
+                obj['objectID'] += offset
+            self.store.upsert(objects)
+
+        threads = [threading.Thread(target=upsert, args=(offset,))
+                   for offset in range(100, 500, 100)]
+        for thread in threads:
+            thread.start()
+        list(self.store.query(department='Asian Art'))
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.store), 100)
+
+    def test_dataframe_feeds_converter(self):
+        """
+        Tests that the DataFrame of a query can be exported by Converter.
+        """
+        dataframe = self.store.dataframe(department='The American Wing')
+        self.assertEqual(dataframe['objectID'].tolist(), list(range(2, 21, 2)))
+
+        path = os.path.join(self.tmpdir.name, 'museum_data.csv')
+        Converter.convert_to_csv(dataframe, path)
+        with open(path, encoding='utf-8') as file_ptr:
+            self.assertEqual(len(file_ptr.readlines()), 11)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,238 @@
+"""
+    Tests for streaming module.
+"""
+
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import openpyxl
+
+from lxml import etree
+
+from museum_api.streaming import (CSVStreamWriter, JSONLStreamWriter, XLSXStreamWriter,
+                                  XMLStreamWriter, iter_chunks, write_csv, write_jsonl,
+                                  write_xlsx, write_xml)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def generate_records():
+    """
+    generates records whose keys change halfway, like objects with and without
+    constituents.
+    """
+    for object_id in range(1, 6):
+        record = {'objectID': object_id, 'title': f'title, "{object_id}"'}
+        if object_id > 3:
+            record['name'] = f'artist\n{object_id}'
+        yield record
+
+
+class TestStreamWriters(unittest.TestCase):
+    """
+    Tests functionality of the streaming writers.
+    """
+    def setUp(self) -> None:
+        """
+        creates a temporary directory for the exported files.
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self) -> None:
+        """
+        removes the temporary directory.
+        """
+        self.tmpdir.cleanup()
+
+    def read_csv(self, file_ptr):
+        """
+        :return: list of the rows of the csv file
+        """
+        return list(csv.reader(file_ptr))
+
+    def test_csv_header_grows(self):
+        """
+        Tests that a key appearing later adds a column, the rows before it being padded.
+        """
+        path = os.path.join(self.tmpdir.name, 'museum_data.csv')
+        self.assertEqual(write_csv(generate_records(), path, chunk_size=2), 5)
+
+        with open(path, encoding='utf-8', newline='') as file_ptr:
+            rows = self.read_csv(file_ptr)
+
+        self.assertEqual(rows[0], ['objectID', 'title', 'name'])
+        self.assertEqual(rows[1], ['1', 'title, "1"', ''])
+        self.assertEqual(rows[5], ['5', 'title, "5"', 'artist\n5'])
+        self.assertFalse(os.path.exists(path + '.tmp'))
+
+    def test_csv_with_fieldnames(self):
+        """
+        Tests that fieldnames are the first columns.
+        """
+        path = os.path.join(self.tmpdir.name, 'museum_data.csv')
+        write_csv(generate_records(), path, fieldnames=['name', 'objectID'])
+
+        with open(path, encoding='utf-8', newline='') as file_ptr:
+            self.assertEqual(self.read_csv(file_ptr)[0], ['name', 'objectID', 'title'])
+
+    def test_gzip_compression(self):
+        """
+        Tests that gzip compressed files hold the same lines.
+        """
+        path = os.path.join(self.tmpdir.name, 'museum_data.jsonl')
+        write_jsonl(generate_records(), path)
+        write_jsonl(generate_records(), path + '.gz', compression='gzip')
+
+        with open(path, encoding='utf-8') as file_ptr, \
+                gzip.open(path + '.gz', 'rt', encoding='utf-8') as gzip_file_ptr:
+            self.assertEqual(file_ptr.read(), gzip_file_ptr.read())
+
+    @unittest.skipIf(zstandard is None, 'zstandard is not installed')
+    def test_zstd_compression(self):
+        """
+        Tests that zstd compressed files hold the same rows.
+        """
+        path = os.path.join(self.tmpdir.name, 'museum_data.csv.zst')
+        write_csv(generate_records(), path, compression='zstd')
+
+        with open(path, 'rb') as file_ptr:
+            data = zstandard.ZstdDecompressor().stream_reader(file_ptr).read()
+        rows = self.read_csv(io.StringIO(data.decode('utf-8'), newline=''))
+        self.assertEqual(len(rows), 6)
+
+    def test_jsonl_keys_keep_column_order(self):
+        """
+        Tests that every line has the keys seen so far, in the same order.
+        """
+        path = os.path.join(self.tmpdir.name, 'museum_data.jsonl')
+        with JSONLStreamWriter(path, chunk_size=2) as writer:
+            writer.write(generate_records())
+            writer.write([{'title': 'last', 'objectID': 6}])
+
+        with open(path, encoding='utf-8') as file_ptr:
+            records = [json.loads(line) for line in file_ptr]
+
+        self.assertEqual(len(records), 6)
+        self.assertEqual(list(records[0]), ['objectID', 'title'])
+        self.assertEqual(records[3]['name'], 'artist\n4')
+        self.assertEqual(records[5], {'objectID': 6, 'title': 'last', 'name': None})
+
+    def test_failed_export_leaves_no_file(self):
+        """
+        Tests that nothing is left behind when the records fail halfway.
+        """
+        def failing_records():
+            yield {'objectID': 1}
+            raise ConnectionError('connection reset')
+
+        for writer_class in (CSVStreamWriter, JSONLStreamWriter, XLSXStreamWriter,
+                             XMLStreamWriter):
+            path = os.path.join(self.tmpdir.name, 'museum_data')
+            with self.assertRaises(ConnectionError):
+                with writer_class(path, chunk_size=1) as writer:
+                    writer.write(failing_records())
+            self.assertEqual(os.listdir(self.tmpdir.name), [])
+
+    def test_xlsx_sheet_rollover(self):
+        """
+        Tests that a full sheet is continued on a new sheet, with the header repeated and
+        the values keeping their types.
+        """
+        path = os.path.join(self.tmpdir.name, 'museum_data.xlsx')
+        self.assertEqual(write_xlsx(generate_records(), path, chunk_size=2, max_rows=3), 5)
+
+        workbook = openpyxl.load_workbook(path)
+        self.assertEqual(workbook.sheetnames, ['Sheet1', 'Sheet2', 'Sheet3'])
+        rows = [list(sheet.values) for sheet in workbook]
+        self.assertEqual(rows[0][0], ('objectID', 'title', 'name'))
+        self.assertEqual(rows[0][1], (1, 'title, "1"', None))
+        self.assertEqual(rows[2], [('objectID', 'title', 'name'), (5, 'title, "5"', 'artist\n5')])
+        self.assertFalse(workbook['Sheet1']['A1'].font.b)
+
+    def test_xlsx_styled_header(self):
+        """
+        Tests that styled writes a bold header, and lists are written as text.
+        """
+        path = os.path.join(self.tmpdir.name, 'museum_data.xlsx')
+        write_xlsx([{'objectID': 1, 'tags': ['Birds'], 'height': float('nan')}], path,
+                   styled=True)
+
+        sheet = openpyxl.load_workbook(path)['Sheet1']
+        self.assertTrue(sheet['A1'].font.b)
+        self.assertEqual(list(sheet.values)[1], (1, "['Birds']", None))
+
+    def test_xml_matches_to_xml(self):
+        """
+        Tests that the xml has the layout of DataFrame.to_xml, the integers of a column
+        with missing values being written as floats.
+        """
+        path = os.path.join(self.tmpdir.name, 'museum_data.xml.gz')
+        records = [{'objectID': 1, 'title': 'a < b', 'constituentID': 5, 'tags': []},
+                   {'objectID': 2, 'title': '', 'height': 1.5}]
+        self.assertEqual(write_xml(iter(records), path, compression='gzip', chunk_size=1), 2)
+
+        with gzip.open(path, 'rt', encoding='utf-8') as file_ptr:
+            self.assertEqual(file_ptr.read(), (
+                "<?xml version='1.0' encoding='utf-8'?>\n"
+                "<data>\n"
+                "  <row>\n"
+                "    <objectID>1</objectID>\n"
+                "    <title>a &lt; b</title>\n"
+                "    <constituentID>5.0</constituentID>\n"
+                "    <tags>[]</tags>\n"
+                "    <height/>\n"
+                "  </row>\n"
+                "  <row>\n"
+                "    <objectID>2</objectID>\n"
+                "    <title/>\n"
+                "    <constituentID/>\n"
+                "    <tags/>\n"
+                "    <height>1.5</height>\n"
+                "  </row>\n"
+                "</data>\n"
+            ))
+
+    def test_xml_nested(self):
+        """
+        Tests that with nested, lists and dictionaries become child elements.
+        """
+        path = os.path.join(self.tmpdir.name, 'museum_data.xml')
+        write_xml([{'objectID': 1,
+                    'constituents': [{'constituentID': 5, 'name': 'Anonymous'}],
+                    'measurements': [{'elementMeasurements': {'Height': 118.4}}],
+                    'additionalImages': ['a.jpg', 'b.jpg']}], path, nested=True)
+
+        row = etree.parse(path).getroot()[0]
+        self.assertEqual(row.findtext('constituents/constituent/name'), 'Anonymous')
+        self.assertEqual(row.findtext('measurements/measurement/elementMeasurements/Height'),
+                         '118.4')
+        self.assertEqual([image.text for image in row.find('additionalImages')],
+                         ['a.jpg', 'b.jpg'])
+        self.assertEqual(row.find('additionalImages')[0].tag, 'additionalImage')
+
+    def test_invalid_compression(self):
+        """
+        Tests that an unknown compression is refused.
+        """
+        with self.assertRaises(ValueError):
+            write_csv([], os.path.join(self.tmpdir.name, 'museum_data.csv'),
+                      compression='bz2')
+
+    def test_iter_chunks(self):
+        """
+        Tests that records are split into chunks of at most chunk_size records.
+        """
+        self.assertEqual([len(chunk) for chunk in iter_chunks(generate_records(), 2)],
+                         [2, 2, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+"""
+    Tests for sync module.
+"""
+
+import os
+import tempfile
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+from museum_api.museumapi import MuseumAPI, object_ids_endpoint
+from museum_api.sync import IncrementalSync, SyncState
+from mock_server import MockMuseumServer
+
+
+class TestIncrementalSync(unittest.TestCase):
+    """
+    Tests functionality of IncrementalSync class against a local mock server.
+    """
+    def setUp(self) -> None:
+        """
+        starts a mock server where objects 2 and 4 changed since the last sync, and
+        object 7 was deleted.
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.state_path = os.path.join(self.tmpdir.name, 'state', 'sync.json')
+        self.server = MockMuseumServer(total=6, changed_ids=[2, 4, 7])
+        self.server.__enter__()
+        self.museum_api = MuseumAPI(base_url=self.server.base_url)
+
+    def tearDown(self) -> None:
+        """
+        stops the mock server and removes the temporary directory.
+        """
+        self.museum_api.close()
+        self.server.__exit__(None, None, None)
+        self.tmpdir.cleanup()
+
+    def test_first_sync_fetches_every_object(self):
+        """
+        Tests that the first sync fetches every object and saves the watermark.
+        """
+        sync = IncrementalSync(self.museum_api, self.state_path)
+        changes = dict(sync.run())
+
+        self.assertEqual(sorted(changes), [1, 2, 3, 4, 5, 6])
+        self.assertNotIn('metadataDate', self.server.queries[0])
+        self.assertEqual(SyncState(self.state_path).load(), date.today())
+
+    def test_next_sync_only_fetches_changed_objects(self):
+        """
+        Tests that a sync after a previous one only fetches the changed objects.
+        """
+        SyncState(self.state_path).save(date(2021, 12, 1))
+        sync = IncrementalSync(self.museum_api, self.state_path)
+        changes = dict(sync.run())
+
+        self.assertEqual(changes, {2: self.server.object_for_id(2),
+                                   4: self.server.object_for_id(4),
+                                   7: None})
+        self.assertEqual(self.server.queries[0]['metadataDate'], ['2021-12-01'])
+        self.assertEqual(SyncState(self.state_path).load(), date.today())
+
+    def test_failed_sync_keeps_watermark(self):
+        """
+        Tests that the watermark does not move when an object could not be fetched.
+        """
+        SyncState(self.state_path).save(date(2021, 12, 1))
+        sync = IncrementalSync(self.museum_api, self.state_path)
+        with patch.object(self.museum_api, 'get_object_for_id',
+                          side_effect=ConnectionError('connection reset')):
+            changes = dict(sync.run())
+
+        self.assertIsInstance(changes[2], ConnectionError)
+        self.assertEqual(SyncState(self.state_path).load(), date(2021, 12, 1))
+
+    def test_object_ids_endpoint(self):
+        """
+        Tests building the query string of the object ids endpoint.
+        """
+        self.assertEqual(object_ids_endpoint(), '/public/collection/v1/objects')
+        self.assertEqual(object_ids_endpoint(date(2021, 12, 1), [1, 3]),
+                         '/public/collection/v1/objects'
+                         '?metadataDate=2021-12-01&departmentIds=1%7C3')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,9 +8,21 @@ import logging
 import unittest
 import os
 import json
+import shutil
+import copy
+import io
+import tempfile
+import threading
+from unittest import mock
 
-from museum_api.utils import Converter
+import pandas as pd
+from pypdf import PdfReader, PdfWriter
 
+from museum_api.utils import (Converter, flatten, flatten_objects, merge_objects, setup_logger,
+                              stop_logger, FLATTEN_KEYS)
+
+# the logs of the tests are written to logs/, which isn't part of the tree.
+os.makedirs('logs', exist_ok=True)
 logging.basicConfig(
      filename='logs/test_utils_error.log',
      level=logging.ERROR,
@@ -103,6 +115,24 @@ class TestConverter(unittest.TestCase):
             logging.error('File not found : %s', fn_fe.args[-1])
             sys.exit(1)
 
+    def test_convert_to_html_paginated(self):
+        """
+        function to test that the paginated report holds every row,
+        from the list or the DataFrame alike.
+        """
+        new_report_path = os.path.join(self.tmpdir, 'museum_data_report')
+        for list_of_dicts in (self.data, pd.DataFrame(self.data)):
+            Converter.convert_to_html(list_of_dicts, new_report_path, paginated=True,
+                                      page_size=4)
+
+            with open(os.path.join(new_report_path, 'manifest.json'), encoding='utf-8') \
+                    as file_ptr:
+                manifest = json.load(file_ptr)
+            self.assertEqual(manifest['count'], len(self.data))
+            self.assertEqual(len(manifest['shards']), 4)
+            self.assertTrue(os.path.exists(os.path.join(new_report_path, 'index.html')))
+        shutil.rmtree(new_report_path)
+
     def test_convert_to_html_when_list_of_dicts_is_invalid(self):
         """
         test failure of convert_to_html function when list_of_dicts
@@ -145,6 +175,21 @@ class TestConverter(unittest.TestCase):
             logging.error('File not found : %s', fn_fe.args[-1])
             sys.exit(1)
 
+    def test_convert_to_xml_from_dataframe(self):
+        """
+        function to test that a DataFrame converts to the same xml as
+        the list of dictionaries.
+        """
+        new_xml_file_path = os.path.join(self.tmpdir, 'museum_data_dataframe.xml')
+        Converter.convert_to_xml(pd.DataFrame(self.data), new_xml_file_path)
+
+        with open(os.path.join(os.path.abspath(os.path.dirname(__file__)),
+                               'correct_data/museum_data.xml'), 'r', encoding='utf-8') \
+                as old_xml, \
+                open(new_xml_file_path, 'r', encoding='utf-8') as newly_converted_xml:
+            self.assertEqual(old_xml.read(), newly_converted_xml.read())
+        os.remove(new_xml_file_path)
+
     def test_convert_to_xml_when_list_of_dicts_is_invalid(self):
         """
         test failure of convert_to_xml function when list_of_dicts
@@ -254,6 +299,393 @@ class TestConverter(unittest.TestCase):
         with self.assertRaises(FileNotFoundError):
             Converter.convert_to_pdf(self.data, new_pdf_file_path)
 
+    def test_convert_to_pdf_pages(self):
+        """
+        function to test that the rows are rendered a page at a time
+        from memory, and the pages merged in order.
+        """
+        rendered = []
+        threads = set()
+        # each page waits for a page rendered by the other worker, which times out if
+        # the pages are rendered one at a time.
+        barrier = threading.Barrier(2, timeout=10)
+
+        def from_string(html, output_path, options):
+            # the pages keep the width of the table of every column.
+            self.assertEqual(options['page-width'], '1270')
+            rendered.append(html)
+            threads.add(threading.get_ident())
+            barrier.wait()
+            writer = PdfWriter()
+            writer.add_blank_page(width=100, height=100 + html.count('<tr>'))
+            document = io.BytesIO()
+            writer.write(document)
+            return document.getvalue()
+
+        new_pdf_file_path = os.path.join(self.tmpdir, 'museum_data_pages.pdf')
+        files = os.listdir()
+        with mock.patch('museum_api.utils.pdfkit.from_string', side_effect=from_string):
+            Converter.convert_to_pdf(self.data, new_pdf_file_path, rows_per_page=4,
+                                     max_workers=2)
+
+        # the height of each blank page is the number of rows rendered on it.
+        heights = [int(page.mediabox.height) - 100
+                   for page in PdfReader(new_pdf_file_path).pages]
+        self.assertEqual(heights, [4, 4, 4, 3])
+        self.assertEqual(len(rendered), 4)
+        self.assertEqual(len(threads), 2)
+        self.assertIn(f"<td>{self.data[-1]['title']}</td>", ''.join(rendered))
+        self.assertEqual(os.listdir(), files)
+        os.remove(new_pdf_file_path)
+
+    def test_convert_to_excel_write_only(self):
+        """
+        function to test that the write-only workbook holds the same
+        values as the default one.
+        """
+        new_xlsx_file_path = os.path.join(self.tmpdir, 'museum_data.xlsx')
+        write_only_xlsx_file_path = os.path.join(self.tmpdir, 'museum_data_write_only.xlsx')
+        Converter.convert_to_excel(self.data, new_xlsx_file_path)
+        Converter.convert_to_excel(self.data, write_only_xlsx_file_path, write_only=True)
+
+        pd.testing.assert_frame_equal(pd.read_excel(write_only_xlsx_file_path),
+                                      pd.read_excel(new_xlsx_file_path))
+        os.remove(new_xlsx_file_path)
+        os.remove(write_only_xlsx_file_path)
+
+    def test_convert_to_parquet(self):
+        """
+        function to test that parquet keeps the values with the types
+        given to the fields.
+        """
+        new_parquet_file_path = os.path.join(self.tmpdir, 'museum_data.parquet')
+        Converter.convert_to_parquet(self.data, new_parquet_file_path)
+
+        dataframe = pd.read_parquet(new_parquet_file_path)
+        self.assertEqual(len(dataframe), len(self.data))
+        self.assertEqual(str(dataframe['objectBeginDate'].dtype), 'Int64')
+        self.assertEqual(str(dataframe['isPublicDomain'].dtype), 'boolean')
+        self.assertEqual(str(dataframe['department'].dtype), 'category')
+        self.assertEqual(str(dataframe['metadataDate'].dtype.tz), 'UTC')
+        self.assertEqual(dataframe['objectID'].tolist(),
+                         [obj['objectID'] for obj in self.data])
+        os.remove(new_parquet_file_path)
+
+    def test_convert_to_parquet_partitioned(self):
+        """
+        function to test that partitioning by department writes a
+        directory per department, which can be read back filtered.
+        """
+        new_parquet_dir_path = os.path.join(self.tmpdir, 'museum_data_partitioned')
+        Converter.convert_to_parquet(self.data, new_parquet_dir_path,
+                                     partition_cols=['department'])
+
+        departments = {obj['department'] for obj in self.data}
+        self.assertEqual(len(os.listdir(new_parquet_dir_path)), len(departments))
+        department = self.data[0]['department']
+        dataframe = pd.read_parquet(new_parquet_dir_path,
+                                    filters=[('department', '=', department)])
+        self.assertEqual(len(dataframe),
+                         sum(obj['department'] == department for obj in self.data))
+
+        for name in os.listdir(new_parquet_dir_path):
+            for file_name in os.listdir(os.path.join(new_parquet_dir_path, name)):
+                os.remove(os.path.join(new_parquet_dir_path, name, file_name))
+            os.rmdir(os.path.join(new_parquet_dir_path, name))
+        os.rmdir(new_parquet_dir_path)
+
+    def test_convert_to_feather(self):
+        """
+        function to test that feather keeps the values with the types
+        given to the fields.
+        """
+        new_feather_file_path = os.path.join(self.tmpdir, 'museum_data.feather')
+        Converter.convert_to_feather(self.data, new_feather_file_path)
+
+        dataframe = pd.read_feather(new_feather_file_path)
+        self.assertEqual(str(dataframe['classification'].dtype), 'category')
+        self.assertEqual(str(dataframe['isHighlight'].dtype), 'boolean')
+        self.assertEqual(dataframe['title'].tolist(), [obj['title'] for obj in self.data])
+        os.remove(new_feather_file_path)
+
+    def test_convert_to_parquet_when_path_is_invalid(self):
+        """
+        test failure of convert_to_parquet function when path is None.
+        """
+        with self.assertRaises(TypeError):
+            Converter.convert_to_parquet(self.data, None)
+
+    def test_export(self):
+        """
+        function to test that export writes every format like the
+        convert functions do.
+        """
+        for use_processes in (False, True):
+            with self.subTest(use_processes=use_processes):
+                paths = {'csv': os.path.join(self.tmpdir, 'museum_data_export.csv'),
+                         'html': os.path.join(self.tmpdir, 'museum_data_export.html')}
+                Converter.export(self.data, paths, use_processes=use_processes)
+
+                for file_format, path in paths.items():
+                    with open(os.path.join(os.path.abspath(os.path.dirname(__file__)),
+                                           f'correct_data/museum_data.{file_format}'), 'r',
+                              encoding='utf-8') as old_file, \
+                            open(path, 'r', encoding='utf-8') as exported_file:
+                        self.assertEqual(old_file.read(), exported_file.read())
+                    os.remove(path)
+
+    def test_export_when_format_is_invalid(self):
+        """
+        test failure of export function when an unknown format is
+        specified.
+        """
+        with self.assertRaises(ValueError):
+            Converter.export(self.data, {'docx': os.path.join(self.tmpdir, 'museum_data.docx')})
+
+    def test_export_when_path_is_invalid(self):
+        """
+        test that export raises the error of a writer once the others
+        have finished.
+        """
+        csv_path = os.path.join(self.tmpdir, 'museum_data_export.csv')
+        with self.assertRaises(FileNotFoundError):
+            Converter.export(self.data, {'csv': csv_path,
+                                         'pdf': os.path.join('abc', 'museum_data.pdf')})
+        self.assertTrue(os.path.exists(csv_path))
+        os.remove(csv_path)
+
+
+class TestFlattenObjects(unittest.TestCase):
+    """
+    Tests functionality of flatten_objects function.
+    """
+    @classmethod
+    def setUpClass(cls) -> None:
+        """
+        function to build objects of different shapes from the object response.
+        """
+        with open('tmp/object_resp.json', encoding='utf-8') as file_ptr:
+            obj = json.load(file_ptr)
+
+        cls.objects = []
+        for object_id in range(1, 13):
+            new_obj = copy.deepcopy(obj)
+            new_obj['objectID'] = object_id
+            if object_id % 3 == 0:
+                new_obj['constituents'] = [] if object_id % 2 else None
+            if object_id % 4 == 1:
+                new_obj['tags'] = [{'term': 'Birds'}, {'term': 'Men', 'department': 'Tags'}]
+            if object_id == 5:
+                new_obj['objectBeginDate'] = None
+                new_obj['newField'] = 'new'
+            cls.objects.append(new_obj)
+
+    def test_flatten_objects_is_same_as_flatten(self):
+        """
+        Tests that the DataFrame is the same as the one built from the objects flattened
+        one by one, whatever the chunk size.
+        """
+        expected = pd.DataFrame([flatten(copy.deepcopy(obj), FLATTEN_KEYS)
+                                 for obj in self.objects])
+
+        for chunk_size in (1, 5, 100):
+            with self.subTest(chunk_size=chunk_size):
+                dataframe = flatten_objects(iter(self.objects), chunk_size=chunk_size)
+                pd.testing.assert_frame_equal(dataframe, expected)
+
+    def test_flatten_objects_does_not_modify_objects(self):
+        """
+        Tests that the objects are left as they are.
+        """
+        objects = copy.deepcopy(self.objects)
+        flatten_objects(objects)
+
+        self.assertEqual(objects, self.objects)
+
+    def test_flatten_objects_with_dtypes(self):
+        """
+        Tests that dtypes are applied to the columns of the DataFrame.
+        """
+        dataframe = flatten_objects(self.objects, dtypes={'objectBeginDate': 'Int64',
+                                                          'missingField': 'Int64'})
+
+        self.assertEqual(dataframe['objectBeginDate'].dtype, pd.Int64Dtype())
+        self.assertNotIn('missingField', dataframe.columns)
+
+    def test_flatten_objects_when_there_is_no_object(self):
+        """
+        Tests that no object gives an empty DataFrame.
+        """
+        self.assertTrue(flatten_objects([]).empty)
+
+    def test_converting_dataframe(self):
+        """
+        Tests that Converter gives the same csv for the DataFrame as for the list.
+        """
+        data_path = os.path.join('/tmp', 'museum_data_from_list.csv')
+        dataframe_path = os.path.join('/tmp', 'museum_data_from_dataframe.csv')
+        objects = [flatten(copy.deepcopy(obj), FLATTEN_KEYS) for obj in self.objects]
+        Converter.convert_to_csv(objects, data_path)
+        Converter.convert_to_csv(flatten_objects(self.objects), dataframe_path)
+
+        with open(data_path, encoding='utf-8') as data_csv, \
+                open(dataframe_path, encoding='utf-8') as dataframe_csv:
+            self.assertEqual(data_csv.read(), dataframe_csv.read())
+
+
+class TestMergeObjects(unittest.TestCase):
+    """
+    Tests functionality of merge_objects function.
+    """
+    def test_merge_objects(self):
+        """
+        Tests that changed objects are replaced, new ones appended and deleted ones removed.
+        """
+        existing = [{'objectID': 1, 'title': 'a'},
+                    {'objectID': 2, 'title': 'b'},
+                    {'objectID': 3, 'title': 'c'}]
+        changes = [(2, {'objectID': 2, 'title': 'B'}),
+                   (3, None),
+                   (4, {'objectID': 4, 'title': 'd'}),
+                   (1, ConnectionError())]
+
+        self.assertEqual(merge_objects(existing, changes),
+                         [{'objectID': 1, 'title': 'a'},
+                          {'objectID': 2, 'title': 'B'},
+                          {'objectID': 4, 'title': 'd'}])
+
+
+class TestSetupLogger(unittest.TestCase):
+    """
+    Tests functionality of setup_logger.
+    """
+    def setUp(self) -> None:
+        """
+        creates a temporary directory for the logs.
+        """
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.log_file = os.path.join(self.tmpdir.name, 'error.log')
+        # name of the logger of the test, so that only its handler is removed.
+        self.name = f'test_utils.{self._testMethodName}'
+
+    def tearDown(self) -> None:
+        """
+        removes the handler of the logger of the test and the temporary directory.
+        """
+        stop_logger(self.name)
+        self.tmpdir.cleanup()
+
+    def read_lines(self):
+        """
+        :return: list of the lines of the log file
+        """
+        with open(self.log_file, encoding='utf-8') as file_ptr:
+            return file_ptr.read().splitlines()
+
+    def test_setup_logger_is_idempotent(self):
+        """
+        Tests that setting up a logger again doesn't add a handler writing records twice.
+        """
+        for _ in range(3):
+            logger = setup_logger(self.name, self.log_file)
+        logger.error('fetch failed')
+        self.assertEqual(len(logger.handlers), 1)
+
+        logger = setup_logger(self.name, self.log_file, queued=True)
+        logger.error('fetch failed again')
+        stop_logger(self.name)
+
+        self.assertEqual(len(logger.handlers), 0)
+        self.assertEqual([line.split(' ', 3)[3] for line in self.read_lines()],
+                         ['fetch failed', 'fetch failed again'])
+
+    def test_setup_logger_creates_directory(self):
+        """
+        Tests that the directory of the log file is created if it doesn't exist.
+        """
+        self.log_file = os.path.join(self.tmpdir.name, 'logs', 'error.log')
+        logger = setup_logger(self.name, self.log_file)
+        logger.error('fetch failed')
+        stop_logger(self.name)
+
+        self.assertEqual([line.split(' ', 3)[3] for line in self.read_lines()],
+                         ['fetch failed'])
+
+    def test_queued_logger_under_concurrency(self):
+        """
+        Tests that every record logged by several threads is written once.
+        """
+        logger = setup_logger(self.name, self.log_file, queued=True)
+
+        def log(thread):
+            for number in range(500):
+                logger.info('thread %d record %d', thread, number)
+
+        threads = [threading.Thread(target=log, args=(thread,)) for thread in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stop_logger(self.name)
+
+        lines = self.read_lines()
+        self.assertEqual(len(lines), 4000)
+        self.assertEqual(len(set(line.split(' ', 3)[3] for line in lines)), 4000)
+
+    def test_json_format(self):
+        """
+        Tests that json lines hold the extra fields and the traceback.
+        """
+        logger = setup_logger(self.name, self.log_file, queued=True, json_format=True)
+        try:
+            raise ConnectionError('connection reset')
+        except ConnectionError:
+            logger.exception('fetch of %d failed', 436535, extra={'objectID': 436535})
+        stop_logger(self.name)
+
+        record = json.loads(self.read_lines()[0])
+        self.assertEqual(record['level'], 'ERROR')
+        self.assertEqual(record['logger'], self.name)
+        self.assertEqual(record['message'], 'fetch of 436535 failed')
+        self.assertEqual(record['objectID'], 436535)
+        self.assertIn('ConnectionError: connection reset', record['exception'])
+
+    def test_rotation(self):
+        """
+        Tests that the file is rotated at max_bytes, keeping backup_count files.
+        """
+        logger = setup_logger(self.name, self.log_file, queued=True, max_bytes=200,
+                              backup_count=2)
+        for number in range(50):
+            logger.info('record %d', number)
+        stop_logger(self.name)
+
+        self.assertEqual(sorted(os.listdir(self.tmpdir.name)),
+                         ['error.log', 'error.log.1', 'error.log.2'])
+        self.assertIn('record 49', self.read_lines()[-1])
+
+    def test_stop_logger_keeps_other_loggers(self):
+        """
+        Tests that stopping a logger leaves the handlers of the other loggers.
+        """
+        other_name = self.name + '.other'
+        other = setup_logger(other_name, os.path.join(self.tmpdir.name, 'other.log'),
+                             queued=True)
+        try:
+            setup_logger(self.name, self.log_file, queued=True)
+            stop_logger(self.name)
+            self.assertEqual(len(other.handlers), 1)
+        finally:
+            stop_logger(other_name)
+        self.assertEqual(len(other.handlers), 0)
+
+    def test_rotation_at_size_and_time(self):
+        """
+        Tests that max_bytes and when are refused together.
+        """
+        with self.assertRaises(ValueError):
+            setup_logger(self.name, self.log_file, max_bytes=200, when='midnight')
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,128 +1,356 @@
+import atexit
+import base64
 import logging
 import smtplib
 import socket
-import zipfile
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from email.mime.base import MIMEBase
-from email import encoders
+import tempfile
+import threading
+import uuid
+from email.header import Header
+from email.utils import encode_rfc2231, formatdate, make_msgid
 import mimetypes
 import os
+from museum_api.archive import DEFAULT_CODEC, create_archive, extract_members
 from museum_api.utils import setup_logger
-import shutil
 from dotenv import load_dotenv
 
 load_dotenv()
 
-error_logger = setup_logger('mail', 'logs/mail_error.log', level=logging.ERROR)
+error_logger = setup_logger('mail', 'logs/mail_error.log', level=logging.ERROR, queued=True)
 
+# SMTP server the emails are sent through.
+SMTP_HOST = 'smtp.gmail.com'
+SMTP_PORT = 587
+# number of bytes of an attachment base64 encoded at once, a multiple of the 57 bytes
+# encoded on each line, so that the lines of every chunk are complete.
+ATTACHMENT_CHUNK_SIZE = 57 * 1024
+# number of bytes of the message sent to the SMTP server at once.
+SEND_CHUNK_SIZE = 64 * 1024
+# name of the archive the reports are bundled into.
+BUNDLE_NAME = 'reports.zip'
 
-def send_email(from_email, to_email, password, subject='', body='', attachment_file_paths=None):
+# Mailers of send_email, by SMTP server and user, so its connections are reused.
+mailer_pool = {}
+mailer_pool_lock = threading.Lock()
+
+
+def write_message(file_ptr, from_email, to_emails, subject='', body='',
+                  attachment_file_paths=None):
     """
-    function to send an email to specified email address.
+    writes a MIME message to a binary file, the attachments being read a chunk at a
+    time and base64 encoded as they are read, so they are never held in memory.
 
+    :param file_ptr: binary file the message is written to
     :param from_email: sender email address.
-    :param to_email: receiver email address.
-    :param password: sender password.
+    :param to_emails: list of receiver email addresses.
     :param subject: subject of the email.
     :param body: body of the email.
     :param attachment_file_paths: list of file paths of the files to be sent as an attachment.
     """
-    # instance of MIMEMultipart
-    msg = MIMEMultipart()
+    boundary = f'=============={uuid.uuid4().hex}=='
+    headers = [
+        f'From: {from_email}',
+        f'To: {", ".join(to_emails)}',
+        f'Subject: {subject if subject.isascii() else Header(subject, "utf-8").encode()}',
+        f'Date: {formatdate(localtime=True)}',
+        f'Message-ID: {make_msgid()}',
+        'MIME-Version: 1.0',
+        f'Content-Type: multipart/mixed; boundary="{boundary}"',
+    ]
+    file_ptr.write(('\r\n'.join(headers) + '\r\n\r\n').encode('ascii'))
+
+    # the body is base64 encoded as well, so its lines never need to be escaped.
+    file_ptr.write(f'--{boundary}\r\n'
+                   'Content-Type: text/plain; charset="utf-8"\r\n'
+                   'Content-Transfer-Encoding: base64\r\n\r\n'.encode('ascii'))
+    file_ptr.write(base64.encodebytes(body.encode('utf-8')).replace(b'\n', b'\r\n'))
+
+    for attachment_file_path in attachment_file_paths or ():
+        try:
+            attachment = open(attachment_file_path, 'rb')
+        except FileNotFoundError as fn_fe:
+            error_logger.error(
+                "Error opening file %s %s",
+                attachment_file_path,
+                fn_fe.args[-1]
+            )
+            continue
+
+        with attachment:
+            mime_type = mimetypes.guess_type(attachment_file_path)[0]
+            file_name = os.path.basename(attachment_file_path)
+            if file_name.isascii():
+                disposition = f'attachment; filename="{file_name}"'
+            else:
+                disposition = f"attachment; filename*={encode_rfc2231(file_name, 'utf-8')}"
+            file_ptr.write(f'--{boundary}\r\n'
+                           f'Content-Type: {mime_type or "application/octet-stream"}\r\n'
+                           'Content-Transfer-Encoding: base64\r\n'
+                           f'Content-Disposition: {disposition}\r\n\r\n'.encode('ascii'))
+            for chunk in iter(lambda: attachment.read(ATTACHMENT_CHUNK_SIZE), b''):
+                file_ptr.write(base64.encodebytes(chunk).replace(b'\n', b'\r\n'))
 
-    # storing the senders email address
-    msg['From'] = from_email
+    file_ptr.write(f'--{boundary}--\r\n'.encode('ascii'))
 
-    # storing the receivers email address
-    msg['To'] = to_email
 
-    # storing the subject
-    msg['Subject'] = subject
+def bundle_files(file_paths, target_path):
+    """
+    compresses files into a zip archive, in parallel, the files which are already
+    compressed being stored as they are.
 
-    # attach the body with the msg instance
-    msg.attach(MIMEText(body, 'plain'))
+    :param file_paths: list of paths of the files, missing files being left out.
+    :param target_path: path of the zip archive.
+    """
+    existing_paths = []
+    for file_path in file_paths:
+        if os.path.exists(file_path):
+            existing_paths.append(file_path)
+        else:
+            error_logger.error("Error opening file %s", file_path)
+    create_archive(existing_paths, target_path)
 
-    if attachment_file_paths is not None:
-        for attachment_file_path in attachment_file_paths:
 
-            # mime = MimeTypes()
-            # url = pathlib.Path(attachment_file_path).as_uri()
-            mime_type = str(mimetypes.guess_type(attachment_file_path)[0])
-            main_type, sub_type = mime_type.split('/')
+class Mailer:
+    """
+    Sends emails through an SMTP connection which is kept open between sends, instead
+    of opening a new session, with its STARTTLS and login, for every email. A connection
+    closed by the server is opened again. Mailer can be shared between threads::
 
-            # instance of MIMEBase and named as p
-            p = MIMEBase(main_type, sub_type)
+        with Mailer(username=sender, password=password) as mailer:
+            for to_email in to_emails:
+                mailer.send(sender, to_email, 'Museum API Reports', body, REPORTS, bundle=True)
+    """
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, username=None, password=None,
+                 starttls=True, timeout=60):
+        """
+        :param host: host of the SMTP server.
+        :param port: port of the SMTP server.
+        :param username: user to log in as.
+        :param password: password of the user, no login is done if None.
+        :param starttls: whether to secure the connection with STARTTLS.
+        :param timeout: seconds to wait for the SMTP server.
+        """
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        # number of connections opened, the connection being reused if it stays at 1.
+        self.connections = 0
+
+        self.__smtp = None
+        self.__lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        terminates the SMTP session.
+        """
+        with self.__lock:
+            if self.__smtp is not None:
+                try:
+                    self.__smtp.quit()
+                except (smtplib.SMTPException, OSError):
+                    self.__smtp.close()
+                self.__smtp = None
+
+    def send(self, from_email, to_emails, subject='', body='', attachment_file_paths=None,
+             bundle=False):
+        """
+        sends an email to one or several receivers.
+
+        :param from_email: sender email address.
+        :param to_emails: receiver email address, or list of them.
+        :param subject: subject of the email.
+        :param body: body of the email.
+        :param attachment_file_paths: list of file paths of the files to be sent as an attachment.
+        :param bundle: if True, the files are compressed into a single zip attachment.
+        :return: dictionary of the refused receivers, as smtplib.SMTP.sendmail
+        """
+        if isinstance(to_emails, str):
+            to_emails = [to_emails]
+
+        # the message is written to a temporary file rather than built in memory.
+        with tempfile.TemporaryDirectory() as tmpdir, tempfile.TemporaryFile() as message:
+            if bundle and attachment_file_paths:
+                bundle_path = os.path.join(tmpdir, BUNDLE_NAME)
+                bundle_files(attachment_file_paths, bundle_path)
+                attachment_file_paths = [bundle_path]
+            write_message(message, from_email, to_emails, subject, body, attachment_file_paths)
+
+            with self.__lock:
+                try:
+                    return self.__send(self.__connection(), from_email, to_emails, message)
+                except smtplib.SMTPServerDisconnected:
+                    # the server closed the connection between the check and the send.
+                    self.__smtp = None
+                    return self.__send(self.__connection(), from_email, to_emails, message)
+
+    def __connection(self):
+        """
+        :return: the open SMTP connection, opened again if the server closed it
+        """
+        if self.__smtp is not None:
             try:
-                with open(attachment_file_path, 'r', encoding='utf-8') as file:
-                    p.set_payload(file.read())
-            except FileNotFoundError as fn_fe:
-                error_logger.error(
-                    "Error opening file %s %s",
-                    attachment_file_path,
-                    fn_fe.args[-1]
-                )
-            except UnicodeDecodeError:
-                with open(attachment_file_path, 'rb') as file:
-                    p.set_payload(file.read())
-
-            # encode into base64
-            encoders.encode_base64(p)
-
-            file_name = os.path.basename(attachment_file_path)
+                if self.__smtp.noop()[0] != 250:
+                    self.__smtp.close()
+                    self.__smtp = None
+            except smtplib.SMTPServerDisconnected:
+                self.__smtp = None
+
+        if self.__smtp is None:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            try:
+                if self.starttls:
+                    smtp.starttls()
+                if self.password is not None:
+                    smtp.login(self.username, self.password)
+            except Exception:
+                smtp.close()
+                raise
+            self.__smtp = smtp
+            self.connections += 1
+        return self.__smtp
+
+    @staticmethod
+    def __send(smtp, from_email, to_emails, message):
+        """
+        sends the message of a binary file, a chunk at a time, with the DATA command.
+
+        :return: dictionary of the refused receivers
+        """
+        smtp.ehlo_or_helo_if_needed()
+        code, response = smtp.mail(from_email)
+        if code != 250:
+            smtp.rset()
+            raise smtplib.SMTPSenderRefused(code, response, from_email)
+
+        refused = {}
+        for to_email in to_emails:
+            code, response = smtp.rcpt(to_email)
+            if code not in (250, 251):
+                refused[to_email] = (code, response)
+        if len(refused) == len(to_emails):
+            smtp.rset()
+            raise smtplib.SMTPRecipientsRefused(refused)
+
+        smtp.putcmd('data')
+        code, response = smtp.getreply()
+        if code != 354:
+            smtp.rset()
+            raise smtplib.SMTPDataError(code, response)
+
+        message.seek(0)
+        chunk = []
+        size = 0
+        for line in message:
+            # lines starting with a dot are escaped by doubling it.
+            if line.startswith(b'.'):
+                line = b'.' + line
+            chunk.append(line)
+            size += len(line)
+            if size >= SEND_CHUNK_SIZE:
+                smtp.send(b''.join(chunk))
+                chunk = []
+                size = 0
+        chunk.append(b'.\r\n')
+        smtp.send(b''.join(chunk))
+
+        code, response = smtp.getreply()
+        if code != 250:
+            smtp.rset()
+            raise smtplib.SMTPDataError(code, response)
+        return refused
+
+
+def get_mailer(host, port, username, password):
+    """
+    :return: the Mailer of mailer_pool for the SMTP server and user, created if needed.
+    """
+    with mailer_pool_lock:
+        key = (host, port, username)
+        if key not in mailer_pool or mailer_pool[key].password != password:
+            if key in mailer_pool:
+                mailer_pool[key].close()
+            mailer_pool[key] = Mailer(host, port, username, password)
+        return mailer_pool[key]
 
-            p.add_header('Content-Disposition', "attachment; filename= %s" % file_name)
 
-            # attach the instance 'p' to instance 'msg'
-            msg.attach(p)
+def close_mailers():
+    """
+    terminates the SMTP sessions of the Mailers of mailer_pool. Called when the
+    interpreter exits.
+    """
+    with mailer_pool_lock:
+        for mailer in mailer_pool.values():
+            mailer.close()
+        mailer_pool.clear()
 
-    try:
-        # creates SMTP session
-        s = smtplib.SMTP('smtp.gmail.com', 587)
 
-        # start TLS for security
-        s.starttls()
+atexit.register(close_mailers)
 
-        # Authentication
-        s.login(from_email, password)
 
-        # Converts the Multipart msg into a string
-        text = msg.as_string()
+def send_email(from_email, to_email, password, subject='', body='', attachment_file_paths=None,
+               bundle=False, mailer=None):
+    """
+    function to send an email to specified email address. The attachments are read once,
+    a chunk at a time, and the SMTP connection is reused by the next emails.
 
-        # sending the mail
-        s.sendmail(from_email, to_email, text)
+    :param from_email: sender email address.
+    :param to_email: receiver email address, or list of them.
+    :param password: sender password.
+    :param subject: subject of the email.
+    :param body: body of the email.
+    :param attachment_file_paths: list of file paths of the files to be sent as an attachment.
+    :param bundle: if True, the files are compressed into a single zip attachment.
+    :param mailer: Mailer the email is sent with, by default the Mailer of mailer_pool
+        for smtp.gmail.com and from_email.
+    """
+    if mailer is None:
+        mailer = get_mailer(SMTP_HOST, SMTP_PORT, from_email, password)
 
-        # terminating the session
-        s.quit()
+    try:
+        mailer.send(from_email, to_email, subject, body, attachment_file_paths, bundle)
     except socket.gaierror as e:
         logging.error("%s while sending email to %s", e.args[-1], from_email)
 
 
-def generate_zip(source_dir, target_path):
+def generate_zip(source_dir, target_path, codec=DEFAULT_CODEC, level=None, max_workers=None):
     """
-    Generates a zip file from a given directory.
+    Generates a zip file from a given directory, compressing its files in parallel.
 
     :param source_dir: path of source directory.
-    :param target_path: path where the new zip file must be generated
+    :param target_path: path where the new zip file must be generated, without the .zip
+        extension.
+    :param codec: 'store', 'deflate', 'bzip2', 'xz' or 'zstd'. Files which are already
+        compressed, like .xlsx and .pdf, are stored as they are whatever the codec.
+    :param level: compression level, the default of the codec if None.
+    :param max_workers: maximum number of files compressed at once.
     """
 
     if os.path.exists(source_dir):
         if os.path.isdir(source_dir):
-            shutil.make_archive(target_path, 'zip', source_dir)
+            create_archive(source_dir, target_path + '.zip', codec, level, max_workers)
 
 
-def unzip_file(source_file, target_dir):
+def unzip_file(source_file, target_dir, members=None):
     """
-    function to unzip a given file.
+    function to unzip a given file, one member at a time.
 
     :param source_file: path of the zip file.
     :param target_dir: path where the file must be unzipped.
+    :param members: names of the members to extract, all of them if None.
     """
 
     if os.path.exists(source_file) and os.path.exists(target_dir):
         if os.path.isdir(target_dir):
-            with zipfile.ZipFile(source_file, 'r') as zip_ref:
-                zip_ref.extractall(target_dir)
+            extract_members(source_file, target_dir, members)
 
 
 # generate_zipfile(os.path.join(os.getcwd(), 'reports'), os.path.join(os.getcwd(), 'reports'))